@@ -30,6 +30,11 @@ DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1"
 LLM_QUERY_MODEL = os.getenv("LLM_QUERY_MODEL", "deepseek-chat")
 LLM_RESUME_MODEL = os.getenv("LLM_RESUME_MODEL", "deepseek-chat")
 LLM_SUMMARY_MODEL = os.getenv("LLM_SUMMARY_MODEL", "deepseek-chat")
+LLM_RATE_LIMIT_PER_SEC = float(os.getenv("LLM_RATE_LIMIT_PER_SEC", 5)) # 发往 LLM API 的请求速率上限 (次/秒)，0 表示不限流
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", 32)) # 整个进程同时在途的 LLM 请求数上限
+LLM_RESUME_MAX_CHARS = int(os.getenv("LLM_RESUME_MAX_CHARS", 12000)) # 发送给 LLM 的单份简历字符上限 (约 6000 token)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.db") # LLM 响应缓存 (SQLite) 路径
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
 
 # MongoDB 配置
 MONGO_URI = os.getenv("MONGO_URI")
@@ -55,12 +60,15 @@ STATE_CACHE_MAXSIZE = int(os.getenv("STATE_CACHE_MAXSIZE", 1024)) # 添加MAXSIZ
 INITIAL_CANDIDATE_POOL_SIZE = int(os.getenv("INITIAL_CANDIDATE_POOL_SIZE", 30))
 TOP_N_CANDIDATES = int(os.getenv("TOP_N_CANDIDATES", 5))
 WECOM_CORE_PROCESSOR_MAX_WORKERS = int(os.getenv("WECOM_CORE_PROCESSOR_MAX_WORKERS", 5)) # 添加MAX_WORKERS配置
+WECOM_MESSAGE_QUEUE_MAXSIZE = int(os.getenv("WECOM_MESSAGE_QUEUE_MAXSIZE", 1024)) # 待处理回调消息队列上限，超出时丢弃新消息
 
 # 外部联系人同步功能配置
 TAG_ID_SYNC_SUCCESS = os.getenv("TAG_ID_SYNC_SUCCESS")
 _sync_hr_userids_str = os.getenv("SYNC_HR_USERIDS", "")
 SYNC_HR_USERIDS = [uid.strip() for uid in _sync_hr_userids_str.split(',') if uid.strip()]
 SYNC_SCHEDULE_CRON = os.getenv("SYNC_SCHEDULE_CRON")
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", 16)) # 同步时同时处理的外部联系人数上限 (DB 匹配 + 打标签)
+SYNC_PAGE_RATE_LIMIT_PER_SEC = float(os.getenv("SYNC_PAGE_RATE_LIMIT_PER_SEC", 5)) # 分页获取外部联系人 API 的调用速率上限 (次/秒，进程内所有 HR 共享)，0 表示不限流
 
 def validate_config():
     """校验关键配置是否存在"""
@@ -272,9 +272,9 @@ class CoreProcessor:
             # Optionally send a polite 'I didn't get that' message
             return
 
-        # 3. TODO: 提交任务到线程池进行异步处理
+        # 3. 提交任务到线程池处理，并等待其完成 (调用方据此控制同时处理的消息数)
         loop = asyncio.get_running_loop() # Prefer get_running_loop if sure one is running (e.g., in FastAPI)
-        loop.run_in_executor(self.thread_pool, self._process_message_task_sync_wrapper, user_id, content, msg_data)
+        await loop.run_in_executor(self.thread_pool, self._process_message_task_sync_wrapper, user_id, content, msg_data)
         logger.info(f"用户 {user_id} 的消息 '{content}' 已提交到线程池处理。")
 
     def _process_message_task_sync_wrapper(self, user_id: str, text_content: str, original_msg_data: Dict[str, Any]):
@@ -780,6 +780,7 @@ class CoreProcessor:
         """
         logger.info("CoreProcessor 正在关闭...")
         self.thread_pool.shutdown(wait=True)
+        await self.sync_processor.aclose()
         if hasattr(self.ew_service, 'close') and callable(getattr(self.ew_service, 'close')):
             await self.ew_service.close()
         if hasattr(self.db_interface, 'close_connection') and callable(getattr(self.db_interface, 'close_connection')):
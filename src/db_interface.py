@@ -1,5 +1,5 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 
@@ -70,7 +70,8 @@ class DBInterface:
             # 单独的 name 和 phone 索引不再需要，因为复合索引的前缀可用于 name 查询
             # 如果 phone 需要高性能独立查询，可以考虑保留 phone 索引，但通常复合唯一性更重要
             # self._collection.create_index([("name", 1)], background=True)
-            # self._collection.create_index([("phone", 1)], background=True)
+            # 外部联系人同步按手机号 ($in) 批量匹配候选人，phone 不是复合索引的前缀，需要单独索引
+            self._collection.create_index([("phone", 1)], name='phone_idx', background=True)
             # 为 query_tags 中的字段创建索引 (保留 background=True)
             self._collection.create_index([("query_tags.positions", 1)], name='positions_idx', background=True)
             self._collection.create_index([("query_tags.min_experience_years", 1)], name='experience_idx', background=True)
@@ -131,6 +132,49 @@ class DBInterface:
             logger.error(f"Upsert 候选人时发生未知错误: {e}", exc_info=True)
             return False
 
+    def bulk_upsert_candidates(self, candidates_data: List[Dict[str, Any]]) -> List[bool]:
+        """
+        批量插入或更新候选人记录 (与 upsert_candidate 相同的姓名+手机号匹配规则)，一次 bulk_write 完成。
+
+        Args:
+            candidates_data (List[Dict[str, Any]]): 候选人字典列表，调用方需保证每条都有姓名和手机号，且批内不重复。
+
+        Returns:
+            List[bool]: 与输入一一对应的写入结果。
+        """
+        if not candidates_data:
+            return []
+        if not self.is_connected():
+            logger.error("数据库未连接，无法批量 upsert 候选人。")
+            return [False] * len(candidates_data)
+
+        now = datetime.now()
+        operations = []
+        for candidate_data in candidates_data:
+            candidate_data["last_processed_time"] = now
+            operations.append(UpdateOne(
+                {"name": candidate_data["name"], "phone": candidate_data["phone"]},
+                {"$set": candidate_data},
+                upsert=True
+            ))
+
+        results = [True] * len(candidates_data)
+        try:
+            # ordered=False: 单条失败不影响批内其余写入
+            result = self._collection.bulk_write(operations, ordered=False)
+            logger.info(f"批量 upsert 候选人完成: 插入 {result.upserted_count}，匹配 {result.matched_count}，修改 {result.modified_count}。")
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                results[write_error["index"]] = False
+                logger.error(f"批量 upsert 候选人 {candidates_data[write_error['index']].get('name')} 失败: {write_error.get('errmsg')}")
+        except OperationFailure as e:
+            logger.error(f"批量 upsert 候选人失败: {e}")
+            return [False] * len(candidates_data)
+        except Exception as e:
+            logger.error(f"批量 upsert 候选人时发生未知错误: {e}", exc_info=True)
+            return [False] * len(candidates_data)
+        return results
+
     def find_candidates(self, query: Dict[str, Any], limit: int = 10, offset: int = 0) -> List[Candidate]:
         """
         根据查询条件查找候选人。
@@ -211,6 +255,38 @@ class DBInterface:
             logger.error(f"按手机号 {phone_number} 查找候选人时出错: {e}", exc_info=True)
             return None
 
+    def find_candidates_by_phones(self, phone_numbers: List[str],
+                                  projection: Optional[Dict[str, int]] = None) -> Dict[str, Candidate]:
+        """
+        通过一次 $in 查询批量查找多个手机号对应的候选人。
+        projection: (可选) 只返回指定字段 (phone 字段总会返回)，调用方只读少数字段时可省去传输与解码整份简历信息。
+
+        Returns:
+            Dict[str, Candidate]: 手机号 -> 候选人 (同一手机号有多条记录时取第一条，与 find_candidate_by_phone 一致)。
+                                  未找到的手机号不在结果中；出错时返回空字典。
+        """
+        if not self.is_connected():
+            logger.error("数据库未连接，无法按手机号批量查找候选人。")
+            return {}
+
+        unique_phones = list({p for p in phone_numbers if p and isinstance(p, str)})
+        if not unique_phones:
+            return {}
+
+        try:
+            if projection is not None:
+                projection = {**projection, "phone": 1}
+            phone_map: Dict[str, Candidate] = {}
+            for doc in self._collection.find({"phone": {"$in": unique_phones}}, projection):
+                phone = doc.get("phone")
+                if phone not in phone_map:
+                    phone_map[phone] = Candidate.from_dict(doc)
+            logger.info(f"按手机号批量查找候选人: 查询 {len(unique_phones)} 个手机号，找到 {len(phone_map)} 个。")
+            return phone_map
+        except Exception as e:
+            logger.error(f"按手机号批量查找候选人时出错: {e}", exc_info=True)
+            return {}
+
     def update_candidate_by_id(self, candidate_doc_id: str, update_fields: Dict[str, Any]) -> bool:
         """
         通过 MongoDB ObjectId 更新单个候选人记录的指定字段。
@@ -3,7 +3,8 @@ import time
 import logging
 import os
 import threading
-from typing import Optional, List, Dict, Any
+import asyncio
+from typing import Optional, List, Dict, Any, Tuple
 
 from src import config_ew # Assuming config_ew.py is in src and loads .env
 
@@ -350,7 +351,8 @@ class EnterpriseWeChatService:
         operator_userid: str, 
         external_userid: str, 
         add_tag_ids: Optional[List[str]] = None, 
-        remove_tag_ids: Optional[List[str]] = None
+        remove_tag_ids: Optional[List[str]] = None,
+        client: Optional[httpx.AsyncClient] = None
     ) -> bool:
         """
         编辑客户的企业标签。
@@ -361,6 +363,7 @@ class EnterpriseWeChatService:
             external_userid: 外部联系人的userid。
             add_tag_ids: 要为客户添加的标签id列表。
             remove_tag_ids: 要为客户移除的标签id列表。
+            client: (可选) 复用的 AsyncClient，批量调用时共用连接池；不传则本次调用使用独立的 AsyncClient。
 
         Returns:
             bool: 操作是否成功。
@@ -386,8 +389,11 @@ class EnterpriseWeChatService:
         
         logger.debug(f"编辑外部联系人标签。URL: {url}, Payload: {payload}")
         try:
-            async with httpx.AsyncClient() as client:
+            if client is not None:
                 response = await client.post(url, json=payload)
+            else:
+                async with httpx.AsyncClient() as own_client:
+                    response = await own_client.post(url, json=payload)
             response.raise_for_status()
             data = response.json()
             if data.get("errcode") == 0:
@@ -403,9 +409,39 @@ class EnterpriseWeChatService:
             logger.exception(f"编辑外部联系人 {external_userid} 标签时发生异常")
             return False
 
+    async def mark_external_contact_tags_many(
+        self,
+        operator_userid: str,
+        jobs: List[Tuple[str, List[str]]],
+        max_connections: int = 32
+    ) -> List[bool]:
+        """
+        批量为多个外部联系人添加企业标签。mark_tag 接口只支持单个客户，这里并发发出各次调用，
+        并在本批次内共用一个 AsyncClient (连接池 + keep-alive)，省去逐个调用的建连/TLS 握手。
+
+        Args:
+            operator_userid: 执行操作的成员UserID。
+            jobs: (external_userid, add_tag_ids) 列表。
+            max_connections: 本批次同时在途的连接数上限。
+
+        Returns:
+            List[bool]: 与 jobs 一一对应的操作结果。
+        """
+        if not jobs:
+            return []
+        # 先取一次 token，避免并发调用在 token 过期时同时刷新
+        if not await self.get_access_token():
+            return [False] * len(jobs)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        # 与其他方法一致，按批次创建 AsyncClient 而非使用 self.client，避免跨事件循环复用连接
+        async with httpx.AsyncClient(limits=limits) as client:
+            return list(await asyncio.gather(*(
+                self.mark_external_contact_tags(operator_userid, external_userid, add_tag_ids=tag_ids, client=client)
+                for external_userid, tag_ids in jobs
+            )))
+
 # Example usage (for testing, typically this would be in your main app logic)
 if __name__ == '__main__':
-    import asyncio
     import logging
     logging.basicConfig(level=logging.DEBUG, 
                         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
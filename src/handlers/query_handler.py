@@ -3,6 +3,7 @@ import os # Add os import at the top if not already present
 import logging # Import logging
 import re # v1.2.1 Import re for regex escaping
 import asyncio  # 导入异步支持
+from dataclasses import fields
 
 from src.logger import logger # Use absolute import
 # from ..db_interface import db_interface # Relative
@@ -26,40 +27,95 @@ from wcferry import Wcf, WxMsg  # 导入类型，解决类型注解未定义
 
 ew_service = EnterpriseWeChatService()  # 企业微信服务实例
 
+# --- Outbound Messages ---
+OUTBOUND_RETRY_DELAY = 1.0
+
+# 保存后台发送任务的强引用，避免任务在完成前被垃圾回收 (与 selection_handler 相同)
+_pending_tasks: set[asyncio.Task] = set()
+
+def _spawn(coro) -> asyncio.Task:
+    """创建后台任务并在完成前持有其引用。"""
+    task = asyncio.create_task(coro)
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+    return task
+
+async def _send_with_retry(content: str, user_ids: List[str], tag_ids: Optional[List[str]] = None) -> None:
+    """发送一条文本消息，失败时重试一次。"""
+    for attempt in range(2):
+        try:
+            if await ew_service.send_text_message(content=content, user_ids=user_ids, tag_ids=tag_ids):
+                return
+        except Exception as e:
+            logger.error(f"发送消息给 {user_ids} 时发生异常: {e}", exc_info=True)
+        if attempt == 0:
+            await asyncio.sleep(OUTBOUND_RETRY_DELAY)
+    logger.error(f"消息发送给 {user_ids} 重试后仍失败。")
+
+def _send_text(content: str, user_ids: List[str], tag_ids: Optional[List[str]] = None) -> None:
+    """在后台发送文本消息 (处理函数为同步函数，无法直接 await)。"""
+    _spawn(_send_with_retry(content, user_ids, tag_ids))
+# --- End Outbound Messages ---
+
+# --- Regex Escape Helper ---
+# 技能/证书关键词绝大多数不含正则元字符 (中文、字母数字)，此时无需 re.escape。
+_META_RE = re.compile(r"[.\^\$\*\+\?\(\)\[\]\{\}\|\\]")
+
+def _fast_escape(s: str) -> str:
+    """仅在字符串包含正则元字符时才调用 re.escape。"""
+    return s if _META_RE.search(s) is None else re.escape(s)
+# --- End Regex Escape Helper ---
+
 # --- v1.2.2 Skill Synonyms Definition ---
 SKILL_SYNONYMS = [
     {"cad", "autocad", "cad制图"},
     # {"python", "py"}, # Add more synonym groups here as needed
 ]
+# 技能 -> 所属同义词组 的索引，模块加载时构建一次，查询时 O(1) 查找
+_SKILL_SYNONYM_INDEX: Dict[str, frozenset] = {
+    skill: frozenset(group) for group in SKILL_SYNONYMS for skill in group
+}
 # --- End Skill Synonyms Definition ---
 
+# --- Education Level Synonyms ---
+# 学历同义词双向扩展表 (本科<->学士, 硕士<->研究生)
+_EDUCATION_SYNONYMS: Dict[str, str] = {
+    "本科": "学士",
+    "学士": "本科",
+    "硕士": "研究生",
+    "研究生": "硕士",
+}
+# --- End Education Level Synonyms ---
+
 # 简单的状态键常量
 # STATE_KEY = "state"
 STATE_KEY = "state"
 RESULTS_KEY = "last_query_results"
 
+# --- Input Normalization Helpers ---
+def _clean_str(value: Any) -> str:
+    """字符串去除首尾空白；非字符串返回空串。"""
+    return value.strip() if isinstance(value, str) else ""
+
+def _clean_str_list(values: Any) -> List[str]:
+    """保留列表中的非空字符串并去除首尾空白；非列表返回空列表。"""
+    if not isinstance(values, list):
+        return []
+    return [v for v in (_clean_str(item) for item in values) if v]
+# --- End Input Normalization Helpers ---
+
 # --- v1.2.2 Helper function for skill expansion ---
 def _expand_skills(skills: List[str]) -> List[str]:
-    """将技能列表根据 SKILL_SYNONYMS 进行扩展。"""
+    """将 (已清洗的) 技能列表根据 SKILL_SYNONYMS 进行扩展。"""
     if not skills:
         return []
-    
+
     expanded_set = set()
-    normalized_input_skills = {skill.strip().lower() for skill in skills if isinstance(skill, str) and skill.strip()}
-    
-    found_in_group = set()
-    for skill in normalized_input_skills:
-        matched_group = False
-        for group in SKILL_SYNONYMS:
-            if skill in group:
-                expanded_set.update(group) # Add all synonyms from the matched group
-                found_in_group.add(skill) # Mark this skill as processed via group
-                matched_group = True
-                break # Move to the next skill once a group is found
-        # If the skill wasn't part of any synonym group, add it directly
-        if not matched_group:
-            expanded_set.add(skill)
-            
+    for skill in skills:
+        normalized = skill.lower()
+        # 属于同义词组则加入整组，否则加入技能本身
+        expanded_set.update(_SKILL_SYNONYM_INDEX.get(normalized, (normalized,)))
+
     final_list = list(expanded_set)
     logger.debug(f"原始技能: {skills}, 扩展后技能: {final_list}")
     return final_list
@@ -70,6 +126,13 @@ def _build_mongo_query(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
     query = {}
     filters = []
 
+    # 入口处统一清洗字符串字段，后续各分支不再重复 strip / isinstance
+    skills = _clean_str_list(parsed_data.get("skills"))
+    location = _clean_str(parsed_data.get("location"))
+    education_levels = _clean_str_list(parsed_data.get("education_levels"))
+    previous_companies = _clean_str_list(parsed_data.get("previous_companies"))
+    position = _clean_str(parsed_data.get("position"))
+
     # --- Handle Experience, Skills, Location, Education, Previous Companies FIRST ---
     # ... (代码与之前相同，处理经验、技能、地点、学历、曾任职公司) ...
     # 处理工作年限条件
@@ -88,15 +151,14 @@ def _build_mongo_query(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         filters.append({"query_tags.min_experience_years": exp_filter})
 
     # 处理技能
-    skills = parsed_data.get("skills")
-    if skills and isinstance(skills, list) and len(skills) > 0:
+    if skills:
         expanded_skills = _expand_skills(skills) # Expand synonyms
         if expanded_skills:
             skill_or_conditions = []
             for skill in expanded_skills:
                 try:
                     # Escape potential regex special characters in the skill name
-                    escaped_skill = re.escape(skill)
+                    escaped_skill = _fast_escape(skill)
                     # Use regex for case-insensitive substring matching within the array elements
                     skill_or_conditions.append({
                         "query_tags.skills_normalized": {"$regex": escaped_skill, "$options": "i"}
@@ -109,55 +171,32 @@ def _build_mongo_query(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
                 logger.info(f"添加扩展/模糊技能查询条件 ($or): {expanded_skills}")
 
     # 处理地点
-    location = parsed_data.get("location")
-    if location and isinstance(location, str) and location.strip():
-         filters.append({"query_tags.location": {"$regex": location.strip(), "$options": "i"}})
-         logger.debug(f"添加地点查询条件: {location.strip()}")
+    if location:
+         filters.append({"query_tags.location": {"$regex": location, "$options": "i"}})
+         logger.debug(f"添加地点查询条件: {location}")
 
     # 处理学历 (使用 education_levels 列表和 $in 操作符，并扩展同义词)
-    education_levels = parsed_data.get("education_levels") # Get the list
-    if education_levels and isinstance(education_levels, list) and len(education_levels) > 0:
-        # Ensure all items in the list are valid strings and strip whitespace
-        valid_levels = [level.strip() for level in education_levels if isinstance(level, str) and level.strip()]
-        if valid_levels:
-            # --- Query Expansion for synonyms ---
-            expanded_levels = set(valid_levels) # Use a set to handle potential duplicates easily
-            if "本科" in expanded_levels:
-                expanded_levels.add("学士")
-                logger.debug("检测到'本科'，自动扩展查询包含'学士'。")
-            if "学士" in expanded_levels:
-                expanded_levels.add("本科")
-                logger.debug("检测到'学士'，自动扩展查询包含'本科'。")
-            # Add more synonyms here if needed
-            # e.g., master/graduate student?
-            if "硕士" in expanded_levels:
-                expanded_levels.add("研究生")
-                logger.debug("检测到'硕士'，自动扩展查询包含'研究生'。")
-            if "研究生" in expanded_levels:
-                expanded_levels.add("硕士")
-                logger.debug("检测到'研究生'，自动扩展查询包含'硕士'。")
-            
-            
-
-            final_levels_list = list(expanded_levels)
-            # --- End Query Expansion ---
-
-            # Use $in operator with the expanded list
-            if final_levels_list: # Ensure the list is not empty after potential expansion/filtering
-                filters.append({"query_tags.degrees": {"$in": final_levels_list}})
-                logger.debug(f"添加学历查询条件 ($in 匹配，扩展同义词后): {final_levels_list}")
-            else:
-                 logger.debug("扩展同义词后，有效的学历等级列表为空。")
-        else:
-            logger.debug("LLM 返回的 education_levels 列表为空或无效。")
+    if education_levels:
+        # --- Query Expansion for synonyms ---
+        expanded_levels = set(education_levels) # Use a set to handle potential duplicates easily
+        for level in education_levels:
+            if synonym := _EDUCATION_SYNONYMS.get(level):
+                expanded_levels.add(synonym)
+                logger.debug(f"检测到'{level}'，自动扩展查询包含'{synonym}'。")
+        final_levels_list = list(expanded_levels)
+        # --- End Query Expansion ---
+
+        # Use $in operator with the expanded list
+        filters.append({"query_tags.degrees": {"$in": final_levels_list}})
+        logger.debug(f"添加学历查询条件 ($in 匹配，扩展同义词后): {final_levels_list}")
+    else:
+        logger.debug("LLM 返回的 education_levels 列表为空或无效。")
 
     # 处理曾任职公司
-    previous_companies = parsed_data.get("previous_companies")
-    company_filters = []
-    if previous_companies and isinstance(previous_companies, list) and len(previous_companies) > 0:
-        for company in previous_companies:
-            if isinstance(company, str) and company.strip():
-                company_filters.append({"extracted_info.experience.company": {"$regex": company.strip(), "$options": "i"}})
+    company_filters = [
+        {"extracted_info.experience.company": {"$regex": company, "$options": "i"}}
+        for company in previous_companies
+    ]
     if company_filters:
         if len(company_filters) > 1:
             filters.append({"$or": company_filters})
@@ -168,14 +207,13 @@ def _build_mongo_query(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
 
     # --- NOW Handle Position and Certifications (Simplified Ambiguity Handling) ---
     # --- v1.2 Update: Modify Certifications handling using ranking_data ---
-    position = parsed_data.get("position")
     certifications_data = parsed_data.get("certifications", []) # Expect list of dicts: [{'name': '...', 'modifier': '...'}]
     generic_level_keywords = [] # Store keywords from generic title queries
 
     # 1. Handle Position: Always use $or to search in positions OR certifications
     #    (Keep this logic for now, might handle ambiguous terms)
-    if position and isinstance(position, str) and position.strip():
-        pos_term = position.strip()
+    if position:
+        pos_term = position
         filters.append({
             "$or": [
                 {"query_tags.positions": {"$regex": pos_term, "$options": "i"}},
@@ -248,7 +286,7 @@ def _build_mongo_query(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         # final_terms_for_regex is already a unique list from the set operation
         # v1.2.1 Change from $in to $regex with OR pattern for fuzzy matching
         # Escape special regex characters in each certificate name
-        escaped_terms = [re.escape(term) for term in final_terms_for_regex]
+        escaped_terms = [_fast_escape(term) for term in final_terms_for_regex]
         # Create the OR pattern
         regex_pattern = "|".join(escaped_terms)
         # --- DEBUG LOG --- 
@@ -276,6 +314,27 @@ def _build_mongo_query(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
     logger.info(f"构建的 MongoDB 查询: {query}")
     return query
 
+# 结果消息末尾的固定指令说明 (模块加载时拼接一次)
+_INSTRUCTIONS = (
+    "\n--- 指令示例 ---\n"
+    "- 获取简历: 简历 1 (可指定多个)\n"
+    "- 获取详细信息: 信息 2 (可指定多个)\n"
+    "- 联系候选人: 联系 1 (只能指定一个)\n"
+    "- 查看更多匹配: A (按评分排序)\n" # Clarify pagination order
+    "- 都不满意/放弃: B"
+)
+
+def _format_candidate_line(index: int, candidate: Candidate) -> str:
+    """格式化单个候选人的展示行 (index 为 1 起的相对序号)。"""
+    experience = candidate.query_tags.get("min_experience_years")
+    skills = candidate.extracted_info.get("skills", [])
+    skills_display = f" (技能: {', '.join(skills[:3])}{'...' if len(skills) > 3 else ''})" if skills else ""
+    return (
+        f"{index}. {candidate.name or '未知姓名'}"
+        f" - {(candidate.query_tags.get('positions') or ['未知职位'])[0]}"
+        f" - {f'{experience}年经验' if experience is not None else '经验未知'}{skills_display}"
+    )
+
 # Modified _format_results_message to accept summary
 def _format_results_message(results: list[Candidate], summary: Optional[str] = None, original_pool_size: Optional[int] = None) -> str:
     """将候选人列表格式化为发送给用户的消息，并可选地附加摘要。
@@ -290,41 +349,15 @@ def _format_results_message(results: list[Candidate], summary: Optional[str] = N
         return "抱歉，未找到符合条件的候选人。"
 
     display_count = len(results)
-    # message_lines = [f"以下是 {len(results)} 位符合条件的候选人。请使用以下指令操作："]
-    # More concise intro:
     if original_pool_size and original_pool_size > display_count:
-        message_lines = [f"从 {original_pool_size} 位初步匹配者中，为您筛选出评分最高的 {display_count} 位候选人:"]
+        header = f"从 {original_pool_size} 位初步匹配者中，为您筛选出评分最高的 {display_count} 位候选人:"
     else:
-        message_lines = [f"找到 {display_count} 位符合条件的候选人:"]
-
-    for i, candidate in enumerate(results):
-        name = candidate.name or "未知姓名"
-        position = (candidate.query_tags.get("positions") or ["未知职位"])[0]
-        experience = candidate.query_tags.get("min_experience_years")
-        exp_str = f"{experience}年经验" if experience is not None else "经验未知"
-        skills = candidate.extracted_info.get("skills", [])
-        skills_str = ", ".join(skills[:3]) + ("..." if len(skills) > 3 else "")
-        skills_display = f" (技能: {skills_str})" if skills_str else ""
-        # Use relative index (1-based) for display
-        message_lines.append(f"{i + 1}. {name} - {position} - {exp_str}{skills_display}")
-        # Optionally display score for debugging:
-        # if 'match_score' in candidate.__dict__: # Check if score attribute exists (may need conversion to dict)
-        #     message_lines[-1] += f" (Score: {candidate.match_score:.2f})"
-
-    # Append the summary if provided
-    if summary:
-        message_lines.append("\n--- 简要分析 ---")
-        message_lines.append(summary)
-
-    # Append instructions
-    message_lines.append("\n--- 指令示例 ---")
-    message_lines.append("- 获取简历: 简历 1 (可指定多个)")
-    message_lines.append("- 获取详细信息: 信息 2 (可指定多个)")
-    message_lines.append("- 联系候选人: 联系 1 (只能指定一个)")
-    message_lines.append("- 查看更多匹配: A (按评分排序)") # Clarify pagination order
-    message_lines.append("- 都不满意/放弃: B")
-
-    return "\n".join(message_lines)
+        header = f"找到 {display_count} 位符合条件的候选人:"
+
+    body = "\n".join(_format_candidate_line(i + 1, candidate) for i, candidate in enumerate(results))
+    summary_block = f"\n\n--- 简要分析 ---\n{summary}" if summary else ""
+
+    return f"{header}\n{body}{summary_block}\n{_INSTRUCTIONS}"
 
 # --- New Reusable Function --- 
 def _fetch_and_send_candidates(
@@ -384,22 +417,17 @@ def _fetch_and_send_candidates(
     except Exception as e:
         logger.error(f"数据库查询失败 (上下文: {context_key}, query={query_criteria}, offset={fetch_offset}): {e}", exc_info=True)
         # 使用企业微信服务发送错误提示
-        asyncio.create_task(
-            ew_service.send_text_message(
-                content="抱歉，查询候选人时遇到数据库错误，请稍后再试。",
-                user_ids=[receiver_id]
-            )
-        )
+        _send_text("抱歉，查询候选人时遇到数据库错误，请稍后再试。", [receiver_id])
         state_manager.clear_state(context_key)
         return False
 
     # --- Scoring and Sorting (if enabled and candidates found) ---
     scored_and_sorted_candidates: List[Candidate] = candidates_pool_models
     if perform_scoring and candidates_pool_models:
-        logger.info(f"开始为 {total_found_in_db} 位候选人进行评分 (上下文: {context_key})...")
+        logger.info(f"开始为 {len(candidates_pool_models)} 位候选人进行评分 (上下文: {context_key})...")
         dimensions_config = scoring_config.get('dimensions', {})
-        candidate_scores = {}
-        for candidate in candidates_pool_models:
+        scores = [0.0] * len(candidates_pool_models) # 与候选人池按位置一一对应
+        for pos, candidate in enumerate(candidates_pool_models):
             total_score = 0.0
             # Use candidate.__dict__ or a custom to_dict method if needed for path access
             try:
@@ -411,7 +439,7 @@ def _fetch_and_send_candidates(
                  # For now, we might need to adjust how _safe_get_value works or pass candidate directly
                  # Let's assume to_dict exists for now based on previous implementation assumption.
                  # If this fails, scoring logic needs rework or Candidate model needs update.
-                 candidate_dict = candidate.__dict__ # Less safe fallback
+                 candidate_dict = {f.name: getattr(candidate, f.name) for f in fields(candidate)} # Candidate 为 slots 类，没有 __dict__
 
             for dim_name, dim_config in dimensions_config.items():
                 if dim_config.get('enabled', False):
@@ -421,25 +449,13 @@ def _fetch_and_send_candidates(
                         # logger.debug(f" Cand {candidate.name}, Dim '{dim_name}', Score: {dim_score:.2f}")
                     except Exception as e:
                         logger.error(f"计算维度 '{dim_name}' 分数时出错 for candidate {candidate.name if hasattr(candidate, 'name') else 'Unknown'}: {e}", exc_info=True)
-            # Store score directly on the object (if mutable) or in a separate map
-            # candidate.match_score = total_score # Requires adding attribute to Candidate model or using setattr
-            # Use candidate._id (MongoDB default ID field name) and convert to string for dict key
-            if hasattr(candidate, '_id') and candidate._id:
-                 candidate_scores[str(candidate._id)] = total_score # Use str(_id) as key
-                 logger.debug(f"候选人 {candidate.name} (ID: {candidate._id}) 总分: {total_score:.2f}")
-            else:
-                 logger.warning(f"候选人 {candidate.name if hasattr(candidate, 'name') else 'Unknown'} 缺少 _id 属性，无法存储分数。")
-
-        # Sort the original list based on scores from the map
-        scored_and_sorted_candidates = sorted(
-            candidates_pool_models,
-            # Use str(_id) to get the key from the map
-            key=lambda c: candidate_scores.get(str(c._id), 0) if hasattr(c, '_id') else 0,
-            reverse=True
-        )
+            scores[pos] = total_score
+            logger.debug(f"候选人 {candidate.name} (ID: {getattr(candidate, '_id', None)}) 总分: {total_score:.2f}")
+
+        # 按分数对位置索引排序，再按索引取出候选人 (sorted 稳定，同分保持数据库返回顺序)
+        order = sorted(range(len(candidates_pool_models)), key=scores.__getitem__, reverse=True)
+        scored_and_sorted_candidates = [candidates_pool_models[i] for i in order]
         logger.info(f"候选人评分和排序完成 (上下文: {context_key}).")
-        # Clear score map if not needed
-        del candidate_scores
 
     # --- Pagination of Scored/Sorted List --- 
     # Now apply the pagination offset and limit to the *scored_and_sorted_candidates* list
@@ -456,7 +472,8 @@ def _fetch_and_send_candidates(
             {
                 "index": i + 1, # Relative index for this page
                 "name": cand.name,
-                "extracted_info": cand.extracted_info
+                "extracted_info": cand.extracted_info,
+                "experience_years": (cand.query_tags or {}).get("min_experience_years"),
             }
             for i, cand in enumerate(candidates_to_display) # Use the final list
         ]
@@ -474,14 +491,8 @@ def _fetch_and_send_candidates(
         response_message = _format_results_message(candidates_to_display, summary_text, original_pool_size_info)
         logger.info(f"准备向目标 [{receiver_id}] (来自上下文: {context_key}) 发送结果消息 (第 {offset // display_limit + 1} 页)..." )
         # 异步发送结果消息
-        asyncio.create_task(
-            ew_service.send_text_message(
-                content=response_message,
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
-            )
-        )
-        # 省略同步结果检查与错误回退，假定异步发送成功
+        _send_text(response_message, [receiver_id], [at_user_id] if at_user_id else None)
+        # 发送失败由出站队列统一重试与记录
         
         # Prepare results for caching (using relative index for *this page*)
         cached_results = [
@@ -520,13 +531,7 @@ def _fetch_and_send_candidates(
         if offset == 0:
              # If it was the first page, means no candidates matched at all
              logger.info(f"在数据库查询 {query_criteria} 后，未找到任何候选人。")
-             asyncio.create_task(
-                 ew_service.send_text_message(
-                     content="抱歉，未找到符合条件的候选人。",
-                     user_ids=[receiver_id],
-                     tag_ids=[at_user_id] if at_user_id else None
-                 )
-             )
+             _send_text("抱歉，未找到符合条件的候选人。", [receiver_id], [at_user_id] if at_user_id else None)
              state_manager.clear_state(context_key)
              return False # Indicate no candidates found initially
         else:
@@ -553,12 +558,7 @@ def process_query(wcf: Wcf, msg: WxMsg, parsed_data: Dict[str, Any], state_manag
     if not mongo_query.get("$and"):
         logger.warning(f"无法从解析数据 {parsed_data} 构建有效的查询条件。")
         # 使用企业微信服务发送错误提示
-        asyncio.create_task(
-            ew_service.send_text_message(
-                content="抱歉，我无法根据您的描述构建有效的查询。请提供更具体的职位、经验或技能要求。",
-                user_ids=[receiver_id]
-            )
-        )
+        _send_text("抱歉，我无法根据您的描述构建有效的查询。请提供更具体的职位、经验或技能要求。", [receiver_id])
         state_manager.clear_state(context_key)
         return
     
@@ -588,12 +588,7 @@ def process_query(wcf: Wcf, msg: WxMsg, parsed_data: Dict[str, Any], state_manag
     except Exception as e:
         logger.critical(f"处理查询时发生意外错误 (上下文: {context_key}): {e}", exc_info=True)
         # 异常时发送通用错误提示
-        asyncio.create_task(
-            ew_service.send_text_message(
-                content="处理您的查询时发生内部错误，请稍后重试。",
-                user_ids=[receiver_id]
-            )
-        )
+        _send_text("处理您的查询时发生内部错误，请稍后重试。", [receiver_id])
         state_manager.clear_state(context_key)
 
 if __name__ == '__main__':
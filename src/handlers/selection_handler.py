@@ -1,7 +1,11 @@
 import re
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import asyncio  # 异步支持
+import threading
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from cachetools import TTLCache
 from wcferry import Wcf, WxMsg  # 导入类型，解决类型注解未定义
 
 # 已移除对 wcferry 的依赖，由企业微信服务替代
@@ -10,7 +14,7 @@ from wcferry import Wcf, WxMsg  # 导入类型，解决类型注解未定义
 from src.logger import logger
 from src.config import get_message_template
 # 导入 state_manager 单例 和状态常量
-from src.utils.state_manager import state_manager, STATE_WAITING_SELECTION, STATE_IDLE
+from src.utils.state_manager import state_manager, STATE_IDLE
 # 导入 db_interface 和 query_handler (用于 'A' 选项)
 from src.db_interface import db_interface
 # from src.handlers.query_handler import process_query # Check if this needs refactoring or direct call - Removed direct import, handle 'A' locally for now
@@ -21,190 +25,266 @@ from src.llm_client import llm_client
 from src.enterprise_wechat_service import EnterpriseWeChatService  # 引入企业微信服务
 ew_service = EnterpriseWeChatService()  # 初始化企业微信服务实例
 
+# --- Background Tasks ---
+# 保存后台发送任务的强引用，避免任务在完成前被垃圾回收
+_pending_tasks: set[asyncio.Task] = set()
+
+def _spawn(coro) -> asyncio.Task:
+    """创建后台任务并在完成前持有其引用。"""
+    task = asyncio.create_task(coro)
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+    return task
+# --- End Background Tasks ---
+
+# --- Command Patterns (模块加载时编译一次) ---
+# 一次匹配 "简历 X,Y" / "信息 X" / "联系 X"，序号之间可用空格或逗号分隔
+_RE_CMD = re.compile(r"^(?P<cmd>简历|信息|联系)\s*(?P<idx>[\d\s,，]+)$", re.IGNORECASE)
+_RE_IDX_SEP = re.compile(r"[\s,，]+")
+
 # --- Helper Functions ---
 
+@dataclass(slots=True, frozen=True)
+class MsgCtx:
+    """一条消息的回复上下文，入口处计算一次后传给各处理函数。"""
+    sender: str             # 发送者 ID
+    room_id: Optional[str]  # 群聊 ID，私聊为 None
+    receiver: str           # 回复目标 (群聊则为群 ID)
+    at_user: Optional[str]  # 群聊中需要 @ 的用户
+    key: str                # 状态管理器中的上下文键
+
+def _ctx(msg: WxMsg) -> MsgCtx:
+    """从消息构建回复上下文。"""
+    sender = msg.sender
+    room_id = msg.roomid if msg.from_group() else None
+    return MsgCtx(
+        sender=sender,
+        room_id=room_id,
+        receiver=room_id if room_id else sender,
+        at_user=sender if room_id else None,
+        key=f"{sender}_{room_id}" if room_id else sender,
+    )
+
+def _refresh_ttl(context_key: str, after: str):
+    """刷新上下文状态的 TTL (不改动缓存的结果和查询条件)。"""
+    if state_manager.refresh_ttl(context_key):
+        logger.debug(f"TTL refreshed for {context_key} after {after} without data loss.")
+    else:
+        # This case means state likely expired *during* the operation, which is rare.
+        logger.warning(f"Tried to refresh TTL for {context_key} after {after}, but user data not found (likely expired). State won't be refreshed.")
+
+def _refresh_ttl_on_exit(fn):
+    """装饰器：处理函数返回 (或抛出异常) 后刷新该上下文状态的 TTL。被装饰函数须接受 ctx 关键字参数。"""
+    @wraps(fn)
+    def wrapper(wcf: Wcf, msg: WxMsg, *args, ctx: Optional[MsgCtx] = None, **kwargs):
+        ctx = ctx or _ctx(msg)
+        try:
+            return fn(wcf, msg, *args, ctx=ctx, **kwargs)
+        finally:
+            _refresh_ttl(ctx.key, fn.__name__)
+    return wrapper
+
 def _validate_indices(indices: List[int], max_index: int) -> bool:
     """校验用户输入的序号列表是否都在有效范围内。"""
-    if not indices: # 列表不能为空
-        return False
-    for index in indices:
-        if not (1 <= index <= max_index):
-            return False
-    return True
+    # 列表不能为空；只需检查最小值和最大值是否落在范围内
+    return bool(indices) and min(indices) >= 1 and max(indices) <= max_index
 
 def _get_candidates_by_indices(indices: List[int], cached_results: List[Dict]) -> List[Dict]:
-    """根据序号列表从缓存中获取对应的候选人信息列表。"""
-    selected = []
-    indices_set = set(indices) # 提高查找效率
-    for result in cached_results:
-        if result.get("index") in indices_set:
-            selected.append(result)
-    # 按输入序号排序 (可选, 但可能更好)
-    selected.sort(key=lambda x: indices.index(x.get("index")))
-    return selected
-
-def _format_greeting_message(template: str, candidate_name: str | None, position: str | None) -> str:
+    """根据序号列表从缓存中获取对应的候选人信息列表 (保持用户输入顺序，重复序号只取一次)。"""
+    by_idx = {result.get("index"): result for result in cached_results}
+    return [by_idx[i] for i in dict.fromkeys(indices) if i in by_idx]
+
+# 与候选人和职位无关的固定占位符
+# TODO: Replace placeholders with actual data from config or user context
+_GREETING_FIXED_SUBS = {
+    "[你的名字/公司名]": "我们的招聘团队",
+    "[平台/渠道]": "内部推荐",
+    "[简要职责]": "该职位的职责",
+    "[招聘人员姓名]": "HR",
+    "([招聘人员联系方式])": "", # Remove if empty
+}
+# 所有问候语占位符的单一正则，一次扫描完成全部替换
+_GREET_RE = re.compile("|".join(re.escape(p) for p in ("[候选人姓名]", "[职位名称]", *_GREETING_FIXED_SUBS)))
+
+def _render_placeholders(template: str, subs: Dict[str, str]) -> str:
+    """单次扫描替换模板中的占位符，subs 中没有的占位符保持原样。"""
+    return _GREET_RE.sub(lambda m: subs.get(m.group(0), m.group(0)), template)
+
+@lru_cache(maxsize=16)
+def _cached_template(template_name: str) -> str:
+    """缓存消息模板，并预先替换固定占位符，每次联系时只需替换姓名和职位。"""
+    return _render_placeholders(get_message_template(template_name), _GREETING_FIXED_SUBS)
+
+@lru_cache(maxsize=256)
+def _greeting_for(position: str | None) -> str:
+    """按职位预渲染问候语，除候选人姓名外的占位符均已替换；模板为空时返回空串。"""
+    template = _cached_template("greeting")
+    if not template:
+        return ""
+    return _render_placeholders(template, {"[职位名称]": position or "相关"}) # Default
+
+def _format_greeting_message(candidate_name: str | None, position: str | None) -> str:
     """格式化发送给候选人的初步沟通消息。"""
+    template = _greeting_for(position if isinstance(position, str) else None) # 缓存键须可哈希
     if not template: return "你好！" # Fallback
     if candidate_name:
         template = template.replace("[候选人姓名]", candidate_name)
-    if position:
-        template = template.replace("[职位名称]", position)
-    else:
-        template = template.replace("[职位名称]", "相关") # Default
-
-    # TODO: Replace placeholders with actual data from config or user context
-    template = template.replace("[你的名字/公司名]", "我们的招聘团队")
-    template = template.replace("[平台/渠道]", "内部推荐")
-    template = template.replace("[简要职责]", "该职位的职责")
-    template = template.replace("[招聘人员姓名]", "HR")
-    template = template.replace("([招聘人员联系方式])", "") # Remove if empty
-    
     return template
 
 # --- Action Placeholder Functions ---
 
-def _get_resume(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager):
-    """处理获取简历的请求。(任务 1.5 实现)"""
-    sender_wxid = msg.sender
-    # 文件只能发送给私聊用户
-    if msg.from_group():
-        logger.warning(f"用户 [{sender_wxid}] 在群聊中请求简历，不支持。")
-        room_id = msg.roomid
-        # 使用企业微信服务发送错误提示
-        asyncio.create_task(
-            ew_service.send_text_message(
-                content="抱歉，无法在群聊中直接发送简历文件。",
-                user_ids=[room_id],
-                tag_ids=[sender_wxid]
-            )
-        )
-        return
-    # 私聊可以直接发送
-    user_wxid = sender_wxid
-    logger.info(f"用户 [{user_wxid}] 请求获取候选人简历: {[c.get('name') for c in candidates]}")
-
-    files_sent_count = 0
-    files_not_found_count = 0
-    files_path_missing_count = 0
-    files_send_failed_count = 0
+RESUME_UPLOAD_CONCURRENCY = 4 # 同时进行的简历上传数上限
 
-    for candidate in candidates:
-        resume_path = candidate.get("resume_path")
-        name = candidate.get("name", "未知姓名")
+# 已上传简历的 media_id 缓存，键为 (绝对路径, 修改时间)，文件变更后自然失效。
+# 企业微信临时素材有效期为 3 天，缓存时间取 2 天留出余量。
+MEDIA_ID_CACHE_TTL = 2 * 24 * 3600
+_media_id_cache: TTLCache = TTLCache(maxsize=128, ttl=MEDIA_ID_CACHE_TTL)
+_media_id_cache_lock = threading.Lock() # 各工作线程的事件循环共享此缓存
 
-        if resume_path and isinstance(resume_path, str):
-            # Ensure the path uses the correct separator for the OS
-            normalized_path = os.path.normpath(resume_path)
-            abs_resume_path = os.path.abspath(normalized_path)
-            if os.path.exists(abs_resume_path):
-                logger.info(f"尝试发送简历 {abs_resume_path} 给用户 {user_wxid}")
-                try:
-                    # 异步上传并发送文件
-                    async def send_resume():
-                        media_id = await ew_service.upload_temporary_media(file_path=abs_resume_path)
-                        if media_id:
-                            await ew_service.send_file_message(media_id=media_id, user_ids=[user_wxid])
-                        else:
-                            await ew_service.send_text_message(
-                                content=f"抱歉，发送候选人 {name} 的简历时失败了。",
-                                user_ids=[user_wxid]
-                            )
-                    asyncio.create_task(send_resume())
-                    # 记录发送成功
-                    logger.info(f"已异步开始发送简历 {abs_resume_path} 给用户 {user_wxid}。")
-                    files_sent_count += 1
-                except Exception as e:
-                    logger.error(f"发送简历 {abs_resume_path} 给用户 {user_wxid} 时发生异常: {e}", exc_info=True)
-                    files_send_failed_count += 1
-                    # 使用接口发送文本
-                    asyncio.create_task(
-                        ew_service.send_text_message(
-                            content=f"抱歉，发送候选人 {name} 的简历时发生程序错误。",
-                            user_ids=[user_wxid]
-                        )
-                    )
-            else:
-                logger.warning(f"候选人 {name} 的简历文件不存在: {abs_resume_path} (原始路径: {resume_path})。")
-                files_not_found_count += 1
-                # 使用接口发送文本
-                asyncio.create_task(
-                    ew_service.send_text_message(
-                        content=f"抱歉，找不到候选人 {name} 的简历文件 ({os.path.basename(abs_resume_path)})。",
-                        user_ids=[user_wxid]
-                    )
-                )
+def _resolve_resume_path(resume_path: str) -> tuple[str, float | None]:
+    """规范化简历路径并获取文件修改时间，文件不存在时为 None (含文件系统调用，需在线程中执行)。"""
+    # Ensure the path uses the correct separator for the OS
+    abs_resume_path = os.path.abspath(os.path.normpath(resume_path))
+    try:
+        return abs_resume_path, os.path.getmtime(abs_resume_path)
+    except OSError:
+        return abs_resume_path, None
+
+async def _upload_and_send_one(abs_resume_path: str, mtime: float, user_wxid: str, semaphore: asyncio.Semaphore) -> bool:
+    """上传单份简历 (命中缓存则复用 media_id) 并以文件消息发送，成功返回 True。"""
+    cache_key = (abs_resume_path, mtime)
+    async with semaphore:
+        with _media_id_cache_lock:
+            media_id = _media_id_cache.get(cache_key)
+        if media_id:
+            logger.debug(f"复用已上传简历的 media_id: {abs_resume_path}")
         else:
-            logger.warning(f"候选人 {name} 没有记录简历文件路径。")
-            files_path_missing_count += 1
-            # 使用接口发送文本
-            asyncio.create_task(
-                ew_service.send_text_message(
-                    content=f"抱歉，候选人 {name} 没有记录简历文件。",
-                    user_ids=[user_wxid]
-                )
-            )
+            media_id = await ew_service.upload_temporary_media(file_path=abs_resume_path)
+            if not media_id:
+                return False
+            with _media_id_cache_lock:
+                _media_id_cache[cache_key] = media_id
+        return await ew_service.send_file_message(media_id=media_id, user_ids=[user_wxid])
+
+# 单个候选人简历处理结果状态
+RESUME_SENT = "sent"
+RESUME_SEND_FAILED = "send_failed"
+RESUME_NOT_FOUND = "not_found"
+RESUME_PATH_MISSING = "path_missing"
+
+async def _handle_one_resume(
+    candidate: Dict,
+    user_wxid: str,
+    semaphore: asyncio.Semaphore,
+    inflight: Dict[str, asyncio.Task]
+) -> tuple[str, str, Optional[str]]:
+    """处理单个候选人的简历发送，返回 (状态, 姓名, 错误提示或 None)。
+
+    inflight 在同一次选择内共享：简历文件相同的候选人等待同一个上传任务，不重复上传/发送。
+    """
+    resume_path = candidate.get("resume_path")
+    name = candidate.get("name", "未知姓名")
+
+    if not (resume_path and isinstance(resume_path, str)):
+        logger.warning(f"候选人 {name} 没有记录简历文件路径。")
+        return RESUME_PATH_MISSING, name, f"抱歉，候选人 {name} 没有记录简历文件。"
+
+    # 路径检查可能访问慢速/网络文件系统，放到线程中以免阻塞事件循环
+    abs_resume_path, resume_mtime = await asyncio.to_thread(_resolve_resume_path, resume_path)
+    if resume_mtime is None:
+        logger.warning(f"候选人 {name} 的简历文件不存在: {abs_resume_path} (原始路径: {resume_path})。")
+        return RESUME_NOT_FOUND, name, f"抱歉，找不到候选人 {name} 的简历文件 ({os.path.basename(abs_resume_path)})。"
+
+    task = inflight.get(abs_resume_path)
+    if task is None:
+        logger.info(f"尝试发送简历 {abs_resume_path} 给用户 {user_wxid}")
+        task = inflight[abs_resume_path] = asyncio.ensure_future(
+            _upload_and_send_one(abs_resume_path, resume_mtime, user_wxid, semaphore)
+        )
+    else:
+        logger.info(f"候选人 {name} 的简历 {abs_resume_path} 与本次已选的其他候选人相同，不重复发送。")
+
+    try:
+        sent = await task
+    except Exception as e:
+        logger.error(f"发送简历 {abs_resume_path} 给用户 {user_wxid} 时发生异常: {e}", exc_info=True)
+        return RESUME_SEND_FAILED, name, f"抱歉，发送候选人 {name} 的简历时发生程序错误。"
+    if not sent:
+        logger.error(f"发送简历 {abs_resume_path} 给用户 {user_wxid} 失败。")
+        return RESUME_SEND_FAILED, name, f"抱歉，发送候选人 {name} 的简历时失败了。"
+    logger.info(f"已发送简历 {abs_resume_path} 给用户 {user_wxid}。")
+    return RESUME_SENT, name, None
+
+def _build_resume_summary(outcomes: List[tuple[str, str, Optional[str]]]) -> Optional[str]:
+    """将逐个候选人的错误提示与计数汇总合并为一条消息，无可汇总内容时返回 None。"""
+    counts = {RESUME_SENT: 0, RESUME_SEND_FAILED: 0, RESUME_NOT_FOUND: 0, RESUME_PATH_MISSING: 0}
+    error_lines = []
+    for status, _, error in outcomes:
+        counts[status] += 1
+        if error:
+            error_lines.append(error)
 
-    # Send a summary message after attempting all files
     summary_parts = []
-    if files_sent_count > 0:
-        summary_parts.append(f"成功发送 {files_sent_count} 份简历。")
-    if files_send_failed_count > 0:
-        summary_parts.append(f"{files_send_failed_count} 份发送失败。")
-    if files_not_found_count > 0:
-        summary_parts.append(f"{files_not_found_count} 份文件未找到。")
-    if files_path_missing_count > 0:
-        summary_parts.append(f"{files_path_missing_count} 位候选人无简历记录。")
-
-    if summary_parts:
-        asyncio.create_task(
-            ew_service.send_text_message(
-                content=" ".join(summary_parts),
-                user_ids=[user_wxid]
-            )
-        )
-    elif not candidates:
+    if counts[RESUME_SENT] > 0:
+        summary_parts.append(f"成功发送 {counts[RESUME_SENT]} 份简历。")
+    if counts[RESUME_SEND_FAILED] > 0:
+        summary_parts.append(f"{counts[RESUME_SEND_FAILED]} 份发送失败。")
+    if counts[RESUME_NOT_FOUND] > 0:
+        summary_parts.append(f"{counts[RESUME_NOT_FOUND]} 份文件未找到。")
+    if counts[RESUME_PATH_MISSING] > 0:
+        summary_parts.append(f"{counts[RESUME_PATH_MISSING]} 位候选人无简历记录。")
+
+    if not summary_parts:
+        return None
+    return "\n".join(error_lines + [" ".join(summary_parts)])
+
+async def _get_resume_async(user_wxid: str, candidates: List[Dict]):
+    """并发处理所选候选人的简历 (路径检查、上传、发送)，全部完成后只发送一条汇总消息。"""
+    if not candidates:
         # Should not happen if called correctly, but handle edge case
         logger.warning(f"_get_resume called for user {user_wxid} with empty candidate list.")
-    else:
+        return
+
+    semaphore = asyncio.Semaphore(RESUME_UPLOAD_CONCURRENCY)
+    inflight: Dict[str, asyncio.Task] = {}
+    outcomes = await asyncio.gather(
+        *(_handle_one_resume(candidate, user_wxid, semaphore, inflight) for candidate in candidates)
+    )
+
+    summary = _build_resume_summary(outcomes)
+    if summary is None:
         # All candidates processed but none resulted in a countable outcome?
         logger.warning(f"_get_resume processed {len(candidates)} candidates for user {user_wxid} but no summary generated.")
-        asyncio.create_task(
+        summary = "简历请求处理完毕。"
+    await ew_service.send_text_message(content=summary, user_ids=[user_wxid])
+
+@_refresh_ttl_on_exit
+def _get_resume(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager, ctx: Optional[MsgCtx] = None):
+    """处理获取简历的请求。(任务 1.5 实现)"""
+    # 文件只能发送给私聊用户
+    if ctx.room_id:
+        logger.warning(f"用户 [{ctx.sender}] 在群聊中请求简历，不支持。")
+        # 使用企业微信服务发送错误提示
+        _spawn(
             ew_service.send_text_message(
-                content="简历请求处理完毕。",
-                user_ids=[user_wxid]
+                content="抱歉，无法在群聊中直接发送简历文件。",
+                user_ids=[ctx.room_id],
+                tag_ids=[ctx.sender]
             )
         )
+        return
+    # 私聊可以直接发送
+    user_wxid = ctx.sender
+    logger.info(f"用户 [{user_wxid}] 请求获取候选人简历: {[c.get('name') for c in candidates]}")
+    # 上传与发送在单个任务中并发进行，汇总结果后统一回复
+    _spawn(_get_resume_async(user_wxid, candidates))
 
-    # --- Refresh TTL Safely --- 
-    context_key = msg.sender # Assuming private chat for resume
-    existing_data = state_manager._get_user_data(context_key) # Use internal getter
-    if existing_data:
-        # Call update_state_and_cache_results passing all existing data to prevent reset
-        state_manager.update_state_and_cache_results(
-            user_id=context_key,
-            state=STATE_WAITING_SELECTION, # Ensure state remains waiting
-            results=existing_data.get("last_results"),
-            query_criteria=existing_data.get("query_criteria"),
-            parsed_query_data=existing_data.get("parsed_query_data"),
-            current_offset=existing_data.get("query_offset"),
-            has_more=existing_data.get("has_more")
-        )
-        logger.debug(f"TTL refreshed for {context_key} after _get_resume without data loss.")
-    else:
-        # This case means state likely expired *during* the operation, which is rare.
-        logger.warning(f"Tried to refresh TTL for {context_key} after _get_resume, but user data not found (likely expired). State won't be refreshed.")
-
-def _get_details(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager):
+@_refresh_ttl_on_exit
+def _get_details(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager, ctx: Optional[MsgCtx] = None):
     """处理获取详细信息的请求。(任务 1.4 实现)"""
-    sender_wxid = msg.sender
-    room_id = msg.roomid if msg.from_group() else None
-    receiver_id = room_id if room_id else sender_wxid
-    at_user_id = sender_wxid if room_id else None
+    logger.info(f"用户 [{ctx.sender}] (来自: {ctx.receiver}) 请求获取候选人详细信息: {[c.get('name') for c in candidates]}")
 
-    logger.info(f"用户 [{sender_wxid}] (来自: {receiver_id}) 请求获取候选人详细信息: {[c.get('name') for c in candidates]}")
-
-    full_details_message = []
+    lines = [] # 所有候选人的详细信息行，候选人之间以空行分隔，最后只 join 一次
     for candidate in candidates:
         details_message = []
         name = candidate.get("name", "未知姓名")
@@ -212,6 +292,7 @@ def _get_details(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager):
         details_message.append(f"--- {name} 的详细信息 ---")
 
         if isinstance(info, dict):
+            pre_len = len(details_message) # 之后若没有任何条目追加，说明未提取到详细信息
             location = info.get('current_location', None)
             if location: details_message.append(f"📍 当前地点: {location}")
 
@@ -274,68 +355,48 @@ def _get_details(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager):
                      else:
                          logger.warning(f"教育条目格式不正确: {edu}")
 
-            if not location and not summary and not skills and not certs and not experience and not education:
+            if len(details_message) == pre_len:
                  details_message.append("(未提取到详细信息)")
 
         else:
             details_message.append("无法获取详细信息或信息格式错误。")
 
-        full_details_message.append("\n".join(details_message))
+        if lines:
+            lines.append("")
+        lines.extend(details_message)
 
-    if full_details_message:
+    if lines:
         # 使用企业微信服务异步发送详细信息
-        asyncio.create_task(
+        _spawn(
             ew_service.send_text_message(
-                content="\n\n".join(full_details_message),
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                content="\n".join(lines),
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
     else:
         # 应急：未生成详细信息
-        logger.warning(f"尝试为用户 [{sender_wxid}] 获取详细信息，但未能生成任何内容。")
-        asyncio.create_task(
+        logger.warning(f"尝试为用户 [{ctx.sender}] 获取详细信息，但未能生成任何内容。")
+        _spawn(
             ew_service.send_text_message(
                 content="无法生成所选候选人的详细信息。",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
 
-    # --- Refresh TTL Safely --- 
-    context_key = f"{sender_wxid}_{room_id}" if room_id else sender_wxid
-    existing_data = state_manager._get_user_data(context_key) # Use internal getter
-    if existing_data:
-        # Call update_state_and_cache_results passing all existing data to prevent reset
-        state_manager.update_state_and_cache_results(
-            user_id=context_key,
-            state=STATE_WAITING_SELECTION, # Ensure state remains waiting
-            results=existing_data.get("last_results"),
-            query_criteria=existing_data.get("query_criteria"),
-            parsed_query_data=existing_data.get("parsed_query_data"),
-            current_offset=existing_data.get("query_offset"),
-            has_more=existing_data.get("has_more")
-        )
-        logger.debug(f"TTL refreshed for {context_key} after _get_details without data loss.")
-    else:
-        logger.warning(f"Tried to refresh TTL for {context_key} after _get_details, but user data not found (likely expired). State won't be refreshed.")
-
-def _contact_candidate(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager):
+def _contact_candidate(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manager, ctx: Optional[MsgCtx] = None):
     """处理联系候选人的请求。(任务 1.6 实现)"""
-    sender_wxid = msg.sender
-    room_id = msg.roomid if msg.from_group() else None
-    receiver_id = room_id if room_id else sender_wxid
-    at_user_id = sender_wxid if room_id else None
-    context_key = f"{sender_wxid}_{room_id}" if room_id else sender_wxid # 状态键
+    ctx = ctx or _ctx(msg)
 
     if len(candidates) != 1:
         logger.error(f"联系候选人逻辑错误：收到 {len(candidates)} 个候选人，应为 1 个。")
         # 异步发送内部错误提示
-        asyncio.create_task(
+        _spawn(
             ew_service.send_text_message(
                 content="内部错误：联系候选人时出现问题。",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
         return
@@ -343,103 +404,99 @@ def _contact_candidate(wcf: Wcf, msg: WxMsg, candidates: List[Dict], state_manag
     candidate = candidates[0]
     candidate_wxid = candidate.get("wxid")
     candidate_name = candidate.get("name", "该候选人")
-    logger.info(f"上下文 [{context_key}] 请求联系候选人: {candidate_name} ({candidate_wxid})")
+    logger.info(f"上下文 [{ctx.key}] 请求联系候选人: {candidate_name} ({candidate_wxid})")
 
     if candidate_wxid:
         # Format greeting message
-        greeting_template = get_message_template("greeting")
         # Try to get position from the query context if available
-        parsed_data = state_manager.get_parsed_query_data(context_key)
+        parsed_data = state_manager.get_parsed_query_data(ctx.key)
         position = parsed_data.get('position') if parsed_data else "相关职位"
 
-        greeting_message = _format_greeting_message(greeting_template, candidate_name, position)
+        greeting_message = _format_greeting_message(candidate_name, position)
 
         logger.info(f"尝试向候选人 [{candidate_wxid}] 发送初步沟通消息: {greeting_message}")
         try:
             # 异步创建向外部联系人发送消息任务
-            asyncio.create_task(
+            _spawn(
                 ew_service.send_message_to_external_contact(
-                    sender_userid=sender_wxid,
+                    sender_userid=ctx.sender,
                     external_user_id=candidate_wxid,
                     message_text=greeting_message
                 )
             )
             logger.info(f"已创建联系候选人消息任务，external_userid={candidate_wxid}")
-            asyncio.create_task(
+            _spawn(
                 ew_service.send_text_message(
                     content=f"已尝试向候选人 {candidate_name} 发送初步沟通消息。",
-                    user_ids=[receiver_id],
-                    tag_ids=[at_user_id] if at_user_id else None
+                    user_ids=[ctx.receiver],
+                    tag_ids=[ctx.at_user] if ctx.at_user else None
                 )
             )
-            state_manager.clear_state(context_key)
-            logger.info(f"用户 [{context_key}] 完成联系操作，状态已清除。")
+            state_manager.clear_state(ctx.key)
+            logger.info(f"用户 [{ctx.key}] 完成联系操作，状态已清除。")
         except Exception as e:
             logger.error(f"向候选人 [{candidate_wxid}] 发送消息时发生异常: {e}", exc_info=True)
-            asyncio.create_task(
+            _spawn(
                 ew_service.send_text_message(
                     content=f"抱歉，尝试联系候选人 {candidate_name} 时发生程序错误。",
-                    user_ids=[receiver_id],
-                    tag_ids=[at_user_id] if at_user_id else None
+                    user_ids=[ctx.receiver],
+                    tag_ids=[ctx.at_user] if ctx.at_user else None
                 )
             )
-            state_manager.update_state_and_cache_results(user_id=context_key, state=STATE_WAITING_SELECTION)
+            state_manager.refresh_ttl(ctx.key)
             return
     else:
         logger.warning(f"无法联系候选人 {candidate_name}，因为缺少 wxid。")
-        asyncio.create_task(
+        _spawn(
             ew_service.send_text_message(
                 content=f"抱歉，无法联系候选人 {candidate_name}，缺少联系方式 (wxid)。",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
-        state_manager.update_state_and_cache_results(user_id=context_key, state=STATE_WAITING_SELECTION)
+        state_manager.refresh_ttl(ctx.key)
         return
 
-def _handle_more_results(wcf: Wcf, msg: WxMsg, state_manager):
+def _handle_more_results(wcf: Wcf, msg: WxMsg, state_manager, ctx: Optional[MsgCtx] = None):
     """处理用户请求查看更多结果 ('A') 的逻辑。(任务 1.7 更新)"""
-    sender_wxid = msg.sender
-    room_id = msg.roomid if msg.from_group() else None
-    receiver_id = room_id if room_id else sender_wxid
-    at_user_id = sender_wxid if room_id else None
-    context_key = f"{sender_wxid}_{room_id}" if room_id else sender_wxid
+    ctx = ctx or _ctx(msg)
 
-    logger.info(f"用户 [{context_key}] 请求查看更多结果 ('A')。")
+    logger.info(f"用户 [{ctx.key}] 请求查看更多结果 ('A')。")
 
     # Get necessary info from state
-    query_criteria = state_manager.get_query_criteria(context_key)
-    next_offset = state_manager.get_query_offset(context_key)
-    parsed_query_data = state_manager.get_parsed_query_data(context_key)
-    has_more = state_manager.get_has_more(context_key)
+    pagination = state_manager.get_pagination_context(ctx.key) # 单次加锁读取全部翻页字段
+    query_criteria = pagination["query_criteria"]
+    next_offset = pagination["query_offset"]
+    parsed_query_data = pagination["parsed_query_data"]
+    has_more = pagination["has_more"]
 
     if not query_criteria or not parsed_query_data:
-        logger.warning(f"无法为用户 [{context_key}] 处理 'A' 请求：缺少查询条件或解析数据缓存。")
+        logger.warning(f"无法为用户 [{ctx.key}] 处理 'A' 请求：缺少查询条件或解析数据缓存。")
         # 使用企业微信服务发送提示
-        asyncio.create_task(
+        _spawn(
             ew_service.send_text_message(
                 content="抱歉，无法获取您之前的查询信息来查找更多结果。请重新发起查询。",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
-        state_manager.clear_state(context_key)
+        state_manager.clear_state(ctx.key)
         return
 
     if not has_more:
-         logger.info(f"用户 [{context_key}] 请求 'A'，但缓存标记已无更多结果。")
+         logger.info(f"用户 [{ctx.key}] 请求 'A'，但缓存标记已无更多结果。")
          # 使用企业微信服务发送无更多提示
-         asyncio.create_task(
+         _spawn(
              ew_service.send_text_message(
                  content="根据您之前的查询，没有更多符合条件的候选人了。",
-                 user_ids=[receiver_id],
-                 tag_ids=[at_user_id] if at_user_id else None
+                 user_ids=[ctx.receiver],
+                 tag_ids=[ctx.at_user] if ctx.at_user else None
              )
          )
-         state_manager.clear_state(context_key) # Clear state as there are no more pages
+         state_manager.clear_state(ctx.key) # Clear state as there are no more pages
          return
 
-    logger.info(f"尝试为用户 [{context_key}] 获取下一页结果 (offset={next_offset})。")
+    logger.info(f"尝试为用户 [{ctx.key}] 获取下一页结果 (offset={next_offset})。")
     # limit = 5 # Display limit per page
     try:
         # Call the updated function from query_handler
@@ -455,45 +512,54 @@ def _handle_more_results(wcf: Wcf, msg: WxMsg, state_manager):
 
         if not candidates_found_next_page:
             # _fetch_and_send_candidates handles sending "no more found" now if offset > 0
-            logger.info(f"为用户 [{context_key}] 调用 _fetch_and_send_candidates 后未找到更多结果 (offset={next_offset})。状态已清除。")
+            logger.info(f"为用户 [{ctx.key}] 调用 _fetch_and_send_candidates 后未找到更多结果 (offset={next_offset})。状态已清除。")
             # Ensure state is cleared if needed (it should be by the called function)
-            if state_manager.get_state(context_key) != STATE_IDLE:
-                 state_manager.clear_state(context_key)
+            if state_manager.get_state(ctx.key) != STATE_IDLE:
+                 state_manager.clear_state(ctx.key)
         else:
-             logger.info(f"成功为用户 [{context_key}] 发送了下一页结果。")
+             logger.info(f"成功为用户 [{ctx.key}] 发送了下一页结果。")
 
     except Exception as e:
-        logger.error(f"处理用户 [{context_key}] 的 'A' 请求时发生错误: {e}", exc_info=True)
+        logger.error(f"处理用户 [{ctx.key}] 的 'A' 请求时发生错误: {e}", exc_info=True)
         # 异步发送错误提示
-        asyncio.create_task(
+        _spawn(
             ew_service.send_text_message(
                 content="抱歉，在查找更多结果时遇到错误，请稍后再试。",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
         # Keep state? Or clear?
-        state_manager.update_state_and_cache_results(user_id=context_key, state=STATE_WAITING_SELECTION) # Refresh TTL for retry?
+        state_manager.refresh_ttl(ctx.key) # Refresh TTL (保留缓存结果)
 
-def _handle_reject_all(wcf: Wcf, msg: WxMsg, state_manager):
+def _handle_reject_all(wcf: Wcf, msg: WxMsg, state_manager, ctx: Optional[MsgCtx] = None):
     """处理用户选择都不满意 ('B') 的逻辑。(任务 1.7 更新)"""
-    sender_wxid = msg.sender
-    room_id = msg.roomid if msg.from_group() else None
-    receiver_id = room_id if room_id else sender_wxid
-    at_user_id = sender_wxid if room_id else None
-    context_key = f"{sender_wxid}_{room_id}" if room_id else sender_wxid
+    ctx = ctx or _ctx(msg)
 
-    logger.info(f"用户 [{context_key}] 选择都不满意 ('B')。")
+    logger.info(f"用户 [{ctx.key}] 选择都不满意 ('B')。")
     # 使用企业微信服务异步发送结束提示
-    asyncio.create_task(
+    _spawn(
         ew_service.send_text_message(
             content="好的，已了解。如果您需要新的查询，请重新发送指令。",
-            user_ids=[receiver_id],
-            tag_ids=[at_user_id] if at_user_id else None
+            user_ids=[ctx.receiver],
+            tag_ids=[ctx.at_user] if ctx.at_user else None
+        )
+    )
+    state_manager.clear_state(ctx.key)
+    logger.info(f"用户 [{ctx.key}] 完成 'B' 操作，状态已清除。")
+
+@_refresh_ttl_on_exit
+def _handle_invalid_command(wcf: Wcf, msg: WxMsg, content: str, ctx: Optional[MsgCtx] = None):
+    """回复无法识别的指令并给出格式提示；缓存数据保持不变。"""
+    logger.info(f"用户 [{ctx.key}] 输入无效指令: {content}")
+    # 异步发送帮助提示
+    _spawn(
+        ew_service.send_text_message(
+            content="无法识别您的指令。请使用以下格式回复：\n - 简历 X\n - 信息 X\n - 联系 X\n - A (更多)\n - B (结束)",
+            user_ids=[ctx.receiver],
+            tag_ids=[ctx.at_user] if ctx.at_user else None
         )
     )
-    state_manager.clear_state(context_key)
-    logger.info(f"用户 [{context_key}] 完成 'B' 操作，状态已清除。")
 
 # --- Main Handler Function ---
 
@@ -506,40 +572,36 @@ def handle_user_response(wcf: Wcf, msg: Any, state_manager):
          logger.warning("handle_user_response 收到非 WxMsg 对象")
          return
 
-    sender_wxid = msg.sender
-    room_id = msg.roomid if msg.from_group() else None
-    context_key = f"{sender_wxid}_{room_id}" if room_id else sender_wxid
-    receiver_id = room_id if room_id else sender_wxid # Target for replies
-    at_user_id = sender_wxid if room_id else None # Who to @ in group replies
+    ctx = _ctx(msg) # 回复目标与状态键只计算一次，传给各处理函数
 
     content = msg.content.strip()
-    logger.info(f"处理用户 [{context_key}] 的等待回复: {content}")
+    logger.info(f"处理用户 [{ctx.key}] 的等待回复: {content}")
 
-    cached_results = state_manager.get_last_results(context_key)
+    cached_results = state_manager.get_last_results(ctx.key)
     if cached_results is None:
         # This can happen if state expired between core_processor check and handler execution
-        logger.warning(f"用户 [{context_key}] 处于等待状态，但找不到缓存结果，可能已超时。")
-        asyncio.create_task(
+        logger.warning(f"用户 [{ctx.key}] 处于等待状态，但找不到缓存结果，可能已超时。")
+        _spawn(
             ew_service.send_text_message(
                 content="抱歉，您的操作已超时或状态已丢失，请重新发起查询。",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
-        state_manager.clear_state(context_key)
+        state_manager.clear_state(ctx.key)
         return
 
     max_index = len(cached_results)
     if max_index == 0:
-        logger.error(f"逻辑错误：用户 [{context_key}] 处于等待状态，但缓存结果列表为空。")
-        asyncio.create_task(
+        logger.error(f"逻辑错误：用户 [{ctx.key}] 处于等待状态，但缓存结果列表为空。")
+        _spawn(
             ew_service.send_text_message(
                 content="抱歉，处理您的请求时遇到内部状态错误。",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
+                user_ids=[ctx.receiver],
+                tag_ids=[ctx.at_user] if ctx.at_user else None
             )
         )
-        state_manager.clear_state(context_key)
+        state_manager.clear_state(ctx.key)
         return
 
     # --- Parse user command --- 
@@ -547,40 +609,17 @@ def handle_user_response(wcf: Wcf, msg: Any, state_manager):
     indices = []
 
     # Try matching specific commands first (A, B)
-    if content.upper() == 'A':
+    content_upper = content.upper()
+    if content_upper == 'A':
         command = 'A'
-    elif content.upper() == 'B':
+    elif content_upper == 'B':
         command = 'B'
     else:
         # Try matching "简历 X,Y", "信息 X", "联系 X"
-        match_resume = re.match(r"^简历\s*([\d\s]+)$", content, re.IGNORECASE)
-        match_info = re.match(r"^信息\s*([\d\s]+)$", content, re.IGNORECASE)
-        match_contact = re.match(r"^联系\s*(\d+)$", content, re.IGNORECASE)
-
-        if match_resume:
-            command = "简历"
-            try:
-                indices_str = match_resume.group(1).split()
-                indices = [int(i.strip()) for i in indices_str if i.strip().isdigit()]
-            except ValueError:
-                 logger.warning(f"用户 [{context_key}] 输入简历指令，但序号格式错误: {content}")
-                 command = "无效"
-        elif match_info:
-            command = "信息"
-            try:
-                indices_str = match_info.group(1).split()
-                indices = [int(i.strip()) for i in indices_str if i.strip().isdigit()]
-            except ValueError:
-                 logger.warning(f"用户 [{context_key}] 输入信息指令，但序号格式错误: {content}")
-                 command = "无效"
-        elif match_contact:
-            command = "联系"
-            try:
-                indices = [int(match_contact.group(1).strip())]
-            except ValueError:
-                 # Should not happen with regex, but safeguard
-                 logger.warning(f"用户 [{context_key}] 输入联系指令，但序号格式错误: {content}")
-                 command = "无效"
+        match_cmd = _RE_CMD.match(content)
+        if match_cmd:
+            command = match_cmd.group("cmd")
+            indices = [int(i) for i in _RE_IDX_SEP.split(match_cmd.group("idx")) if i]
         else:
             # Try matching just numbers (assume it means '信息')
             try:
@@ -588,7 +627,7 @@ def handle_user_response(wcf: Wcf, msg: Any, state_manager):
                 indices = [int(i.strip()) for i in indices_str if i.strip().isdigit()]
                 if indices and len(indices_str) == len(indices): # Ensure all parts were numbers
                     command = "信息" # Default action for just numbers
-                    logger.debug(f"用户 [{context_key}] 输入数字 {indices}，默认为请求信息。")
+                    logger.debug(f"用户 [{ctx.key}] 输入数字 {indices}，默认为请求信息。")
                 else:
                     command = "无效"
             except ValueError:
@@ -596,91 +635,65 @@ def handle_user_response(wcf: Wcf, msg: Any, state_manager):
 
     # --- Execute command --- 
     if command == 'A':
-        _handle_more_results(wcf, msg, state_manager)
+        _handle_more_results(wcf, msg, state_manager, ctx=ctx)
     elif command == 'B':
-        _handle_reject_all(wcf, msg, state_manager)
+        _handle_reject_all(wcf, msg, state_manager, ctx=ctx)
     elif command in ["简历", "信息", "联系"]:
         if not _validate_indices(indices, max_index):
-            logger.warning(f"用户 [{context_key}] 输入指令 '{command}'，但序号无效或超出范围 (1-{max_index}): {indices}")
-            asyncio.create_task(
+            logger.warning(f"用户 [{ctx.key}] 输入指令 '{command}'，但序号无效或超出范围 (1-{max_index}): {indices}")
+            _spawn(
                 ew_service.send_text_message(
                     content=f"请输入有效的候选人序号 (1 到 {max_index})。例如：信息 1 或 简历 1,3",
-                    user_ids=[receiver_id],
-                    tag_ids=[at_user_id] if at_user_id else None
+                    user_ids=[ctx.receiver],
+                    tag_ids=[ctx.at_user] if ctx.at_user else None
                 )
             )
-            state_manager.update_state_and_cache_results(user_id=context_key, state=STATE_WAITING_SELECTION) # Refresh TTL
+            state_manager.refresh_ttl(ctx.key) # Refresh TTL (保留缓存结果)
         else:
             selected_candidates = _get_candidates_by_indices(indices, cached_results)
             if not selected_candidates:
-                 logger.error(f"逻辑错误：用户 [{context_key}] 输入有效序号 {indices}，但未能从缓存 {cached_results} 中获取候选人。")
-                 asyncio.create_task(
+                 logger.error(f"逻辑错误：用户 [{ctx.key}] 输入有效序号 {indices}，但未能从缓存 {cached_results} 中获取候选人。")
+                 _spawn(
                      ew_service.send_text_message(
                          content="抱歉，获取所选候选人信息时出错。",
-                         user_ids=[receiver_id],
-                         tag_ids=[at_user_id] if at_user_id else None
+                         user_ids=[ctx.receiver],
+                         tag_ids=[ctx.at_user] if ctx.at_user else None
                      )
                  )
-                 state_manager.update_state_and_cache_results(user_id=context_key, state=STATE_WAITING_SELECTION) # Refresh TTL
+                 state_manager.refresh_ttl(ctx.key) # Refresh TTL (保留缓存结果)
             else:
                 if command == "简历":
-                    if msg.from_group():
-                         asyncio.create_task(
+                    if ctx.room_id:
+                         _spawn(
                              ew_service.send_text_message(
                                  content="抱歉，无法在群聊中直接发送简历文件。",
-                                 user_ids=[receiver_id],
-                                 tag_ids=[at_user_id] if at_user_id else None
+                                 user_ids=[ctx.receiver],
+                                 tag_ids=[ctx.at_user] if ctx.at_user else None
                              )
                          )
-                         state_manager.update_state_and_cache_results(user_id=context_key, state=STATE_WAITING_SELECTION) # Refresh TTL
+                         state_manager.refresh_ttl(ctx.key) # Refresh TTL (保留缓存结果)
                     else:
-                         _get_resume(wcf, msg, selected_candidates, state_manager)
+                         _get_resume(wcf, msg, selected_candidates, state_manager, ctx=ctx)
                          # _get_resume now handles TTL refresh internally
                 elif command == "信息":
-                    _get_details(wcf, msg, selected_candidates, state_manager)
+                    _get_details(wcf, msg, selected_candidates, state_manager, ctx=ctx)
                     # _get_details now handles TTL refresh internally
                 elif command == "联系":
                     if len(indices) > 1:
-                         logger.warning(f"用户 [{context_key}] 尝试一次联系多个候选人: {indices}")
-                         asyncio.create_task(
+                         logger.warning(f"用户 [{ctx.key}] 尝试一次联系多个候选人: {indices}")
+                         _spawn(
                              ew_service.send_text_message(
                                  content="抱歉，一次只能联系一位候选人。请使用 '联系 X' 指令，只指定一个序号。",
-                                 user_ids=[receiver_id],
-                                 tag_ids=[at_user_id] if at_user_id else None
+                                 user_ids=[ctx.receiver],
+                                 tag_ids=[ctx.at_user] if ctx.at_user else None
                              )
                          )
-                         state_manager.update_state_and_cache_results(user_id=context_key, state=STATE_WAITING_SELECTION) # Refresh TTL
+                         state_manager.refresh_ttl(ctx.key) # Refresh TTL (保留缓存结果)
                     else:
-                         _contact_candidate(wcf, msg, selected_candidates, state_manager)
+                         _contact_candidate(wcf, msg, selected_candidates, state_manager, ctx=ctx)
                          # _contact_candidate handles state clearing or TTL refresh internally
     else: # command == "无效"
-        logger.info(f"用户 [{context_key}] 输入无效指令: {content}")
-        # 异步发送帮助提示
-        asyncio.create_task(
-            ew_service.send_text_message(
-                content="无法识别您的指令。请使用以下格式回复：\n - 简历 X\n - 信息 X\n - 联系 X\n - A (更多)\n - B (结束)",
-                user_ids=[receiver_id],
-                tag_ids=[at_user_id] if at_user_id else None
-            )
-        )
-
-        # --- v1.2.3 Fix: Refresh TTL safely without clearing data ---
-        existing_data = state_manager._get_user_data(context_key) # Use internal getter
-        if existing_data:
-            # Call update_state_and_cache_results passing all existing data to prevent reset
-            state_manager.update_state_and_cache_results(
-                user_id=context_key,
-                state=STATE_WAITING_SELECTION, # Ensure state remains waiting
-                results=existing_data.get("last_results"),
-                query_criteria=existing_data.get("query_criteria"),
-                parsed_query_data=existing_data.get("parsed_query_data"),
-                current_offset=existing_data.get("query_offset"),
-                has_more=existing_data.get("has_more")
-            )
-            logger.debug(f"TTL refreshed for {context_key} after invalid command without data loss.")
-        else:
-            logger.warning(f"Tried to refresh TTL for {context_key} after invalid command, but user data not found (likely expired anyway). State won't be refreshed.")
-        # --- End Fix ---
+        _handle_invalid_command(wcf, msg, content, ctx=ctx)
 
 # if __name__ == '__main__':
 #     # Add minimal testing code here if needed
@@ -0,0 +1,132 @@
+# src/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src import config_ew
+from .logger import logger
+
+# Default cache settings (can be overridden by config_ew)
+DEFAULT_CACHE_PATH = ".llm_cache.db"
+DEFAULT_CACHE_TTL = 7 * 24 * 3600   # 响应缓存有效期 (秒), 7天
+DEFAULT_PURGE_INTERVAL = 3600       # 后台清理过期条目的间隔 (秒)
+SUMMARY_CACHE_TTL = 24 * 3600       # 候选人对比摘要缓存有效期 (秒), 1天
+
+
+def make_cache_key(model: str, temperature: float, messages: list, response_format: Optional[dict] = None) -> str:
+    """根据模型、温度、输出格式与消息内容计算确定性的 SHA256 缓存键。"""
+    messages_json = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    raw = f"{model}\x00{temperature}\x00{messages_json}"
+    if response_format:
+        raw += "\x00" + json.dumps(response_format, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def make_summary_fingerprint(query_criteria: dict, candidates_info: list) -> str:
+    """根据查询条件与候选人姓名列表计算对比摘要的缓存键。"""
+    criteria_json = json.dumps(query_criteria, sort_keys=True, ensure_ascii=False, default=str)
+    names = ",".join(str(c.get("name", "")) for c in candidates_info)
+    return hashlib.sha256(f"{criteria_json}|{names}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    基于 SQLite 的 LLM 响应精确匹配缓存。
+    同一份简历或查询重复处理时直接返回上次的响应，省去网络往返与 token 消耗。
+    """
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[int] = None,
+                 purge_interval: int = DEFAULT_PURGE_INTERVAL, table: str = "cache"):
+        self.db_path = db_path or DEFAULT_CACHE_PATH
+        self.table = table # 不同用途的缓存各用一张表，互不影响各自的 TTL 清理
+        self.ttl = ttl_seconds if ttl_seconds is not None else DEFAULT_CACHE_TTL
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            db_dir = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(db_dir, exist_ok=True)
+            # 多个工作线程共享同一连接，由 self._lock 串行化访问
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            with self._lock:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table}(key TEXT PRIMARY KEY, value TEXT, created_at INTEGER)"
+                )
+                self._conn.commit()
+            logger.info(f"LLMCache 初始化成功 (路径={self.db_path}, 表={self.table}, TTL={self.ttl}s)。")
+        except sqlite3.Error as e:
+            logger.error(f"LLMCache 初始化失败，将不使用响应缓存: {e}")
+            self._conn = None
+            return
+
+        if purge_interval > 0:
+            self._purge_interval = purge_interval
+            threading.Thread(target=self._purge_loop, name=f"llm-cache-purge-{self.table}", daemon=True).start()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存响应，不存在或已过期返回 None。"""
+        if self._conn is None:
+            return None
+        min_created_at = int(time.time()) - self.ttl
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    f"SELECT value FROM {self.table} WHERE key = ? AND created_at >= ?", (key, min_created_at)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取 LLM 响应缓存失败: {e}")
+            return None
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        """写入缓存响应。"""
+        if self._conn is None or value is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table}(key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, int(time.time())),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入 LLM 响应缓存失败: {e}")
+
+    def purge_expired(self) -> int:
+        """删除过期条目，返回删除数量。"""
+        if self._conn is None:
+            return 0
+        min_created_at = int(time.time()) - self.ttl
+        try:
+            with self._lock:
+                cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (min_created_at,))
+                self._conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"清理 LLM 响应缓存失败: {e}")
+            return 0
+
+    def _purge_loop(self):
+        """后台线程：定期清理过期条目。"""
+        while True:
+            time.sleep(self._purge_interval)
+            removed = self.purge_expired()
+            if removed:
+                logger.debug(f"已清理 {removed} 条过期的 LLM 响应缓存。")
+
+
+# 创建全局 LLMCache 实例
+llm_cache = LLMCache(
+    db_path=config_ew.LLM_CACHE_PATH,
+    ttl_seconds=config_ew.LLM_CACHE_TTL_SECONDS,
+)
+
+# 候选人对比摘要缓存：同一查询条件下的同一批候选人 (如翻页返回) 直接复用上次生成的摘要
+summary_cache = LLMCache(
+    db_path=config_ew.LLM_CACHE_PATH,
+    ttl_seconds=SUMMARY_CACHE_TTL,
+    table="summary_cache",
+)
@@ -1,11 +1,138 @@
 from openai import OpenAI, APIError, RateLimitError, APITimeoutError, APIConnectionError, AuthenticationError
+import importlib.util
+import itertools
 import json
+import logging
+import random
+import threading
 import time
-from typing import List, Dict
+from typing import Any, Callable, List, Dict, Optional
 import re
 
+import httpx
+
+try:
+    import orjson # 可选依赖：C 实现的 JSON 解析，比标准库快数倍
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec # 可选依赖：C 实现的 JSON 解码器，解码同时校验 UTF-8 与语法
+    _msgspec_decode = msgspec.json.Decoder().decode
+except ImportError:
+    msgspec = None
+
 from src import config_ew # 修改导入
+from src.utils.rate_limiter import TokenBucket
 from .logger import logger # 假设 logger 在同级目录的 logger.py 中，或者调整为 from src.logger import logger
+from .llm_cache import llm_cache, make_cache_key, summary_cache, make_summary_fingerprint
+from .llm_prompts import (
+    _QUERY_SYSTEM_PROMPT,
+    _RESUME_SYSTEM_PROMPT,
+    _RESUME_USER_PREFIX,
+    _SUMMARY_SYSTEM_PROMPT,
+)
+
+LLM_TEMPERATURE = 0.1 # 可以调整 temperature 以获得更确定性的输出
+
+# --- HTTP Connection Pool ---
+# 所有 LLM 请求共享连接池，复用 TCP/TLS 连接；安装了 h2 时启用 HTTP/2 多路复用
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# --- Retry / Rate Limiting ---
+MAX_DELAY = 30.0 # 单次重试等待的上限 (秒)
+
+
+def _backoff_sleep_time(delay: float, error: Exception | None = None) -> float:
+    """
+    计算本次重试的等待时间：优先采用服务端 Retry-After，并叠加随机抖动，
+    避免多个并发调用在同一时刻集中重试。
+    """
+    wait = delay
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            wait = float(retry_after)
+        except ValueError:
+            pass
+    return min(wait, MAX_DELAY) * random.uniform(0.5, 1.0)
+
+
+# 对发往 LLM API 的请求做预限流，使 RateLimitError 很少发生
+_rate_limiter = TokenBucket(config_ew.LLM_RATE_LIMIT_PER_SEC)
+
+# 进程级在途请求上限。调用来自多个工作线程 (核心处理器线程池、简历解析线程池)，使用线程信号量共享同一额度。
+_inflight = threading.BoundedSemaphore(config_ew.LLM_MAX_IN_FLIGHT)
+
+# JSON 模式：要求模型只输出合法的 JSON 对象
+_JSON_MODE = {"type": "json_object"}
+
+# 去除旧模型 (不支持 JSON 模式) 偶尔包裹在输出外层的 markdown 代码块标记
+_FENCE_RE = re.compile(r"\A\s*```(?:json)?\s*|\s*```\s*\Z", re.DOTALL)
+
+# 简历常见的分节标题，用于超长简历的分节裁剪
+_RESUME_SECTION_RE = re.compile(r"(工作经[历验]|教育|技能|证书)")
+
+# --- Summary Prompt Helpers ---
+_ELLIPSIS = "..."
+_WS_TRANS = str.maketrans("\n\r\t", "   ") # 候选人姓名中的换行/制表符替换为空格
+
+
+def _ellipsis(s: str, n: int = 100) -> str:
+    """超过 n 个字符时截断并追加省略号。"""
+    return s if len(s) <= n else s[:n] + _ELLIPSIS
+
+
+class _JsonObjectTracker:
+    """
+    增量扫描流式输出，判断顶层 JSON 对象的花括号是否已闭合。
+    会跳过字符串内部 (含转义) 的花括号，避免误判。
+    """
+    __slots__ = ("depth", "seen_open", "in_string", "escape")
+
+    def __init__(self):
+        self.depth = 0
+        self.seen_open = False
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text: str) -> bool:
+        """送入新片段，返回顶层对象是否已闭合。"""
+        for ch in text:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+                self.seen_open = True
+            elif ch == "}":
+                self.depth -= 1
+        return self.seen_open and self.depth == 0
+
+
+def _json_loads(text: str):
+    """
+    解析 JSON，依次优先使用 msgspec、orjson，最后回退到标准库。
+    解码失败统一抛出 json.JSONDecodeError (orjson 的异常本身即为其子类)。
+    """
+    if msgspec is not None:
+        try:
+            return _msgspec_decode(text.encode("utf-8"))
+        except msgspec.DecodeError as e:
+            raise json.JSONDecodeError(str(e), text, 0) from e
+    if orjson is not None:
+        return orjson.loads(text.encode("utf-8"))
+    return json.loads(text)
+
 
 class LLMClient:
     """封装对 DeepSeek LLM API 的调用。"""
@@ -22,42 +149,104 @@ class LLMClient:
             self.client = None
         else:
             try:
-                self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+                self._http = httpx.Client(http2=_HTTP2_AVAILABLE, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+                self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, http_client=self._http)
                 logger.info(f"LLMClient 初始化成功，API Base: {self.base_url}, Models: query='{self.query_model}', resume='{self.resume_model}', summary='{self.summary_model}'")
             except Exception as e:
                 logger.critical(f"初始化 OpenAI 客户端失败: {e}", exc_info=True)
                 self.client = None
 
-    def _call_llm(self, model: str, messages: list, max_retries: int = 3, initial_delay: float = 1.0) -> str | None:
-        """调用 LLM API 的私有方法，包含重试逻辑。"""
+    @staticmethod
+    def _read_json_stream(response) -> str:
+        """
+        读取流式响应；顶层 JSON 对象闭合且可以解析时立即关闭连接并返回，
+        否则读完整个流后返回全部内容。
+        """
+        tracker = _JsonObjectTracker()
+        parts: List[str] = []
+        try:
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                if tracker.feed(delta):
+                    buf = "".join(parts)
+                    try:
+                        _json_loads(buf)
+                        return buf
+                    except json.JSONDecodeError:
+                        pass # 继续读取剩余内容
+        finally:
+            response.close()
+        return "".join(parts)
+
+    def _call_llm(self, model: str, messages: list, max_retries: int = 3, initial_delay: float = 1.0,
+                  response_format: dict | None = None, stream: bool = False,
+                  parse: Callable[[str], Any] | None = None) -> Any:
+        """
+        调用 LLM API 的私有方法，包含重试逻辑。
+        response_format 传入 {"type": "json_object"} 时启用 JSON 模式，模型保证只输出 JSON。
+        stream=True 时以流式读取，JSON 对象完整后提前结束 (仅用于 JSON 输出)。
+        传入 parse 时返回 parse(响应文本) 的结果，且只有结果不为 None 时才写入响应缓存，
+        避免一次无法解析或校验未通过的输出在缓存有效期内被反复返回。
+        """
         if not self.client:
             logger.error("LLM Client 未初始化，无法调用 API。")
             return None
 
+        # 先查响应缓存，命中时直接返回，省去网络往返；缓存的响应解析失败时视为未命中
+        cache_key = make_cache_key(model, LLM_TEMPERATURE, messages, response_format)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            result = cached if parse is None else parse(cached)
+            if result is not None:
+                logger.debug(f"模型 '{model}' 的请求命中响应缓存。")
+                return result
+
+        extra_kwargs = {"response_format": response_format} if response_format else {}
         retries = 0
         delay = initial_delay
         while retries < max_retries:
+            wait = _rate_limiter.reserve()
+            if wait:
+                time.sleep(wait)
             try:
-                logger.debug(f"向模型 '{model}' 发送请求: {messages}")
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    stream=False, # PRD 要求结构化数据，非流式更方便
-                    temperature=0.1, # 可以调整 temperature 以获得更确定性的输出
-                )
-                content = response.choices[0].message.content
-                logger.debug(f"收到模型 '{model}' 的响应: {content}")
-                return content
+                # 消息中包含数 KB 的系统提示词，仅在 DEBUG 级别下才格式化
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("向模型 '%s' 发送请求: %s", model, messages)
+                with _inflight:
+                    response = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        stream=stream,
+                        temperature=LLM_TEMPERATURE,
+                        **extra_kwargs,
+                    )
+                    if stream:
+                        content = self._read_json_stream(response)
+                    else:
+                        content = response.choices[0].message.content
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("收到模型 '%s' 的响应: %s", model, content)
+                result = content if parse is None else parse(content)
+                if content and result is not None:
+                    llm_cache.set(cache_key, content)
+                return result
             except RateLimitError as e:
                 retries += 1
-                logger.warning(f"API 速率限制，第 {retries}/{max_retries} 次重试将在 {delay:.2f} 秒后进行... Error: {e}")
-                time.sleep(delay)
-                delay *= 2 # 指数退避
+                wait = _backoff_sleep_time(delay, e)
+                logger.warning(f"API 速率限制，第 {retries}/{max_retries} 次重试将在 {wait:.2f} 秒后进行... Error: {e}")
+                time.sleep(wait)
+                delay = min(delay * 2, MAX_DELAY) # 指数退避
             except (APITimeoutError, APIConnectionError) as e:
                 retries += 1
-                logger.warning(f"API 连接或超时错误，第 {retries}/{max_retries} 次重试将在 {delay:.2f} 秒后进行... Error: {e}")
-                time.sleep(delay)
-                delay *= 2
+                wait = _backoff_sleep_time(delay)
+                logger.warning(f"API 连接或超时错误，第 {retries}/{max_retries} 次重试将在 {wait:.2f} 秒后进行... Error: {e}")
+                time.sleep(wait)
+                delay = min(delay * 2, MAX_DELAY)
             except AuthenticationError as e:
                 logger.error(f"API 认证失败: {e}")
                 return None
@@ -71,145 +260,23 @@ class LLMClient:
         logger.error(f"调用 LLM API 达到最大重试次数 ({max_retries}) 后仍然失败。")
         return None
 
-    def parse_query_intent(self, user_query: str) -> dict | None:
-        """
-        使用 LLM 解析用户查询意图，提取结构化信息。
-
-        Args:
-            user_query (str): 用户的原始查询文本。
-
-        Returns:
-            dict | None: 包含提取信息的字典，如果解析失败则返回 None。
-                         预期字典结构: {
-                             "position": "xxx",
-                             "experience_years_min": 5,
-                             "experience_years_max": 10,
-                             "skills": ["a", "b"],
-                             "location": "xxx",
-                             "education": "xxx",
-                             "certifications": [{"name": "xxx", "level_keyword": "xxx", "modifier": "xxx"}, ...]
-                         }
-                         (具体字段根据 Prompt 设计)
-        """
-        # --- New Enhanced Prompt (v3.2 for v1.2 common level update) ---
-        # Use triple quotes instead of parentheses for the multi-line string
-        system_prompt = """你是一个智能招聘助手，负责解析招聘人员输入的自然语言查询指令。
-
-任务：从用户输入的消息中，提取招聘职位的关键要求，并以 JSON 格式返回。你需要识别以下字段：
-- position: 职位名称 (字符串)。如果未明确提及，返回 null。
-- experience_years_min: 最低工作年限要求 (整数)。如果未提及，返回 null。
-- experience_years_max: 最高工作年限要求 (整数)。如果未提及，返回 null。
-- skills: 技能关键词列表 (字符串列表)。如果未提及，返回空列表 []。
-- location: 工作地点 (字符串)。如果未提及，返回 null。
-- education_levels: 学历要求列表 (字符串列表)。可能的学历等级（从低到高）：大专, 本科, 硕士, 博士。
-  - 如果用户指定单个等级（如"硕士"），列表中只包含该等级 ["硕士"]。
-  - 如果用户指定范围（如"本科及以上"、"至少本科"），则包含所有符合条件的等级，例如 ["本科", "硕士", "博士"]。
-  - 如果用户指定范围（如"硕士及以下"），则包含所有符合条件的等级，例如 ["大专", "本科", "硕士"]。
-  - 如果未提及，返回空列表 []。
-- certifications: 要求的资格证书列表 (**对象列表**)。每个对象应包含:
-    - 'name': 证书的**基础名称** (字符串, 例如 "工程师", "建造师", "PMP")。
-    - 'level_keyword': **等级关键词** (字符串, 例如 "中级", "二级", "高级", "助理")。如果证书没有明确的等级或无法识别，返回 null。
-    - 'modifier': **等级范围修饰符** (字符串: 'ge' 表示 >=, 'gt' 表示 >, 'eq' 表示 ==)。如果用户未明确指定等级范围或证书无等级，通常返回 'eq' 或 null。
-  如果未提及任何证书，返回空列表 []。
-- previous_companies: 曾在哪些公司工作过 (字符串列表)。如果未提及，返回空列表 []。
-- design_category: 设计专业领域 (字符串)。请识别用户是否明确提到了 ['建筑设计', '电气设计', '给排水设计'] 中的一个。如果提及，返回对应的类别名称；如果没有提及，返回 null。
-
-**重要提示关于证书解析：**
-*   请尽力将证书名称拆分为 **基础名称** 和 **等级关键词**。例如，"中级建筑师" 应该解析为 `name: "建筑师", level_keyword: "中级"`。
-*   如果证书名称本身不包含明确的等级关键词（如 "PMP", "注册安全工程师"），则 `level_keyword` 应为 `null`。
-*   常见的等级关键词包括：助理, 初级, 中级, 高级, 一级, 二级, 三级。
-
-- previous_companies: 曾在哪些公司工作过 (字符串列表)。如果未提及，返回空列表 []。
-- design_category: 设计专业领域 (字符串)。请识别用户是否明确提到了 ['建筑设计', '电气设计', '给排水设计'] 中的一个。如果提及，返回对应的类别名称；如果没有提及，返回 null。
-
-请严格按照以下 JSON 格式输出，即使某个字段未提取到，也要保留该字段，值为 null 或 []。
-{
-  "position": "...",
-  "experience_years_min": ...,
-  "experience_years_max": ...,
-  "skills": [...],
-  "location": "...",
-  "education_levels": [...],
-  "certifications": [{"name": "...", "level_keyword": "...", "modifier": "..."}, ...],
-  "previous_companies": [...],
-  "design_category": "..."
-}
-
-只输出 JSON 对象，不要包含任何额外的解释或说明文字。
-
-下面是一些例子：
-
-用户输入: "找一个上海地区的 Java 开发，至少 3 年经验，要会 Spring Boot 和 MySQL，有 PMP 证书优先"
-助手输出:
-{
-  "position": "Java 开发",
-  "experience_years_min": 3,
-  "experience_years_max": null,
-  "skills": ["Spring Boot", "MySQL"],
-  "location": "上海",
-  "education_levels": [],
-  "certifications": [{"name": "PMP", "level_keyword": null, "modifier": "eq"}],
-  "previous_companies": [],
-  "design_category": null
-}
-
-用户输入: "有没有 5 到 8 年经验的 UI 设计师，北京的，本科以上，需要注册设计师证"
-助手输出:
-{
-  "position": "UI 设计师",
-  "experience_years_min": 5,
-  "experience_years_max": 8,
-  "skills": [],
-  "location": "北京",
-  "education_levels": ["本科", "硕士", "博士"],
-  "certifications": [{"name": "注册设计师证", "level_keyword": null, "modifier": "eq"}],
-  "previous_companies": [],
-  "design_category": null
-}
-
-用户输入: "硕士学历，做过恒大项目的电气工程师，要求中级工程师及以上"
-助手输出:
-{
-  "position": "电气工程师",
-  "experience_years_min": null,
-  "experience_years_max": null,
-  "skills": [],
-  "location": null,
-  "education_levels": ["硕士"],
-  "certifications": [{"name": "工程师", "level_keyword": "中级", "modifier": "ge"}],
-  "previous_companies": ["恒大"],
-  "design_category": "电气设计"
-}
-
-用户输入: "帮我找个建筑设计的，三年以上经验，要一级建造师"
-助手输出:
-{
-  "position": null,
-  "experience_years_min": 3,
-  "experience_years_max": null,
-  "skills": [],
-  "location": null,
-  "education_levels": [],
-  "certifications": [{"name": "建造师", "level_keyword": "一级", "modifier": "eq"}],
-  "previous_companies": [],
-  "design_category": "建筑设计"
-}
-""" # End triple quotes
-
+    def _build_query_messages(self, user_query: str) -> list:
+        """构建查询意图解析的请求消息。"""
         messages = [
-            {"role": "system", "content": system_prompt},
-            # Add the user query placeholder to the prompt itself for clarity
+            {"role": "system", "content": _QUERY_SYSTEM_PROMPT},
+            # 用户查询只放在 user 消息中，system 消息保持不变
             {"role": "user", "content": f"用户输入: {user_query}\n助手输出:"}
         ]
+        return messages
 
-        response_content = self._call_llm(self.query_model, messages)
-
+    def _parse_query_response(self, user_query: str, response_content: str | None) -> dict | None:
+        """解析查询意图的 LLM 响应。"""
         if not response_content:
             return None
 
         try:
             # 尝试解析 JSON
-            parsed_json = json.loads(response_content)
+            parsed_json = _json_loads(response_content)
             # 基本校验：确保是字典，且包含预期的键 (或者为空字典)
             if not isinstance(parsed_json, dict):
                  logger.error(f"LLM 返回的不是有效的 JSON 对象: {response_content}")
@@ -230,6 +297,125 @@ class LLMClient:
              logger.error(f"处理 LLM 响应时发生错误: {e}", exc_info=True)
              return None
 
+    @staticmethod
+    def _trim_resume(text: str, max_chars: int | None = None) -> str:
+        """
+        将超长简历裁剪到字符预算内，减少 prefill token。
+        按分节标题切分后，开头部分 (通常含联系方式) 优先完整保留，
+        剩余预算在各分节间均分，保证末尾的技能、证书等分节也能保留开头内容。
+        """
+        max_chars = max_chars or config_ew.LLM_RESUME_MAX_CHARS
+        if len(text) <= max_chars:
+            return text
+
+        starts = [m.start() for m in _RESUME_SECTION_RE.finditer(text)]
+        if not starts:
+            # 无可识别的分节：保留开头与结尾
+            head = max_chars * 2 // 3
+            trimmed = text[:head] + "\n...\n" + text[-(max_chars - head):]
+        else:
+            bounds = [0] + starts + [len(text)]
+            pieces = [text[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+            header, sections = pieces[0], pieces[1:]
+            if starts[0] == 0: # 文本以分节标题开头，没有单独的开头部分
+                header, sections = "", pieces
+            header = header[:max_chars]
+            remaining = max_chars - len(header)
+            allowance = [0] * len(sections)
+            pending = list(range(len(sections)))
+            # 水位填充：短分节完整保留，多出的预算继续分给长分节
+            while pending and remaining > 0:
+                share = max(1, remaining // len(pending))
+                next_pending = []
+                for i in pending:
+                    grant = min(share, len(sections[i]) - allowance[i], remaining)
+                    allowance[i] += grant
+                    remaining -= grant
+                    if allowance[i] < len(sections[i]):
+                        next_pending.append(i)
+                    if remaining <= 0:
+                        break
+                pending = next_pending
+            trimmed = header + "".join(sec[:n] for sec, n in zip(sections, allowance) if n)
+
+        logger.warning(f"简历文本过长 ({len(text)} 字符)，已裁剪至 {len(trimmed)} 字符后再发送给 LLM。")
+        return trimmed
+
+    def _build_resume_messages(self, resume_text: str) -> list:
+        """构建简历解析的请求消息。"""
+        messages = [
+            {"role": "system", "content": _RESUME_SYSTEM_PROMPT},
+            # 不拆成两条连续的 user 消息 (部分 DeepSeek 模型不支持)，固定前缀与简历文本合并为一条
+            {"role": "user", "content": _RESUME_USER_PREFIX + self._trim_resume(resume_text)}
+        ]
+        return messages
+
+    @staticmethod
+    def _validate_resume_json(parsed_json, cleaned_content: str) -> dict | None:
+        """校验单份简历的解析结果：必须是字典，且包含有效的姓名与手机号。"""
+        # Basic validation (ensure it's a dictionary)
+        if not isinstance(parsed_json, dict):
+             logger.error(f"LLM 返回的不是有效的 JSON 对象 (清理后): {cleaned_content}")
+             return None
+
+        # Crucial check: Ensure name and phone are extracted
+        # This check might be redundant if validator handles it, but good for early exit
+        name = parsed_json.get("name")
+        phone = parsed_json.get("phone")
+        if not name or not isinstance(name, str) or not name.strip() \
+           or not phone or not isinstance(phone, str) or not phone.strip():
+             logger.warning(f"LLM 解析结果缺少有效的姓名或手机号。Name: '{name}', Phone: '{phone}'. 原始响应 (清理后): {cleaned_content}")
+             # Return None to indicate failure to the pipeline trigger
+             return None
+
+        logger.info(f"成功解析简历。姓名: {name}") # Use extracted name
+        return parsed_json
+
+    def _parse_resume_response(self, response_content: str | None) -> dict | None:
+        """清理并解析简历解析的 LLM 响应，校验姓名与手机号。"""
+        if not response_content:
+            return None
+
+        cleaned_content = response_content
+        try:
+            try:
+                parsed_json = _json_loads(cleaned_content)
+            except json.JSONDecodeError:
+                # 兼容不支持 JSON 模式的模型：去除 markdown 代码块标记后重试
+                cleaned_content = _FENCE_RE.sub("", response_content)
+                parsed_json = _json_loads(cleaned_content)
+            return self._validate_resume_json(parsed_json, cleaned_content)
+        except json.JSONDecodeError as e:
+            logger.error(f"无法解析 LLM 返回的 JSON (清理后): {cleaned_content}。错误: {e}")
+            return None
+        except Exception as e:
+             logger.error(f"处理 LLM 简历响应时发生错误: {e}", exc_info=True)
+             return None
+
+    def parse_query_intent(self, user_query: str) -> dict | None:
+        """
+        使用 LLM 解析用户查询意图，提取结构化信息。
+
+        Args:
+            user_query (str): 用户的原始查询文本。
+
+        Returns:
+            dict | None: 包含提取信息的字典，如果解析失败则返回 None。
+                         预期字典结构: {
+                             "position": "xxx",
+                             "experience_years_min": 5,
+                             "experience_years_max": 10,
+                             "skills": ["a", "b"],
+                             "location": "xxx",
+                             "education": "xxx",
+                             "certifications": [{"name": "xxx", "level_keyword": "xxx", "modifier": "xxx"}, ...]
+                         }
+                         (具体字段根据 Prompt 设计)
+        """
+        messages = self._build_query_messages(user_query)
+        return self._call_llm(self.query_model, messages, response_format=_JSON_MODE, stream=True,
+                              parse=lambda content: self._parse_query_response(user_query, content))
+
     def parse_resume(self, resume_text: str) -> dict | None:
         """
         使用 LLM 从简历文本中提取结构化信息。
@@ -256,258 +442,64 @@ class LLMClient:
                          }
                          (具体字段根据 Prompt 设计)
         """
-        # --- New Enhanced Resume Parsing Prompt --- 
-        # --- Prompt v2 for v1.2 common level update ---
-        # Use triple quotes for easier multi-line string definition
-        system_prompt = """你是一个高度精确的简历解析引擎。你的任务是从提供的简历文本中提取详细的结构化信息，并严格按照指定的 JSON 格式返回。
-
-**首要目标：** 提取候选人的核心信息和详细履历。
-**新增目标：** 根据简历内容判断候选人的主要专业领域，具体分类为 '建筑设计', '电气设计', '给排水设计'。
-
-**输出 JSON 结构：**
-请务必按照以下结构组织你的输出。如果某项信息在简历中未找到，请将对应字段的值设为 `null` (对于字符串/对象) 或空列表 `[]` (对于数组)。
-
-{
-  "name": "...",           // 字符串，候选人姓名。必须提取。找不到则为 null。
-  "phone": "...",          // 字符串，候选人手机号码。必须提取。找不到则为 null。
-  "email": "...",          // 字符串，候选人邮箱。找不到则为 null。
-  "design_category": "...", // 新增: 字符串，候选人主要专业领域。请从 ['建筑设计', '电气设计', '给排水设计'] 中选择一个。如果无法判断或不属于这三类，返回 null。
-  "extracted_info": {
-    "summary": "...",      // 字符串，个人评价、职业目标或技能总结。找不到则为 null。
-    "current_location": "...", // 新增：字符串，候选人当前所在城市或地址。找不到则为 null。
-    "experience": [        // JSON 数组，包含所有工作经历。找不到则为 []。
-      {
-        "company": "...",  // 字符串，公司名称。
-        "title": "...",    // 字符串，职位名称。
-        "start_date": "...", // 字符串，开始日期。优先使用 YYYY-MM 格式。若只有年份，使用 YYYY。找不到则为 null。
-        "end_date": "...",   // 字符串，结束日期。优先使用 YYYY-MM 格式。若只有年份，使用 YYYY。如果写的是"至今"或类似，也返回 "至今"。找不到则为 null。
-        "description": "..." // 字符串，工作职责描述。
-      }
-      // ... 更多工作经历对象
-    ],
-    "education": [         // JSON 数组，包含所有教育背景。找不到则为 []。
-      {
-        "school": "...",   // 字符串，学校名称。
-        "degree": "...",   // 字符串，学位 (例如 "本科", "硕士", "博士")。
-        "major": "...",    // 字符串，专业名称。
-        "start_date": "...", // 字符串，开始日期。优先使用 YYYY-MM 格式。若只有年份，使用 YYYY。找不到则为 null。
-        "end_date": "..."    // 字符串，结束日期。优先使用 YYYY-MM 格式。若只有年份，使用 YYYY。找不到则为 null。
-      }
-      // ... 更多教育背景对象
-    ],
-    "skills": [...],        // 字符串数组，包含简历中明确提到的所有技能关键词。找不到则为 []。
-    "certifications": [    // **v1.2 修改**: 对象数组，包含证书基础名称和等级关键词。
-      {
-        "name": "...",       // 字符串，证书的**基础名称** (例如 "工程师", "建造师", "PMP")。
-        "level_keyword": "..." // 字符串，识别出的**等级关键词** (例如 "中级", "二级", "高级")。如果无等级或无法识别，为 null。
-      }
-      // ... 更多证书对象
-    ]
-    // 可以考虑未来增加其他字段，如 "projects", "languages", "awards" 等
-  }
-}
-
-**重要指令：**
-1. **姓名 (`name`) 和手机号 (`phone`) 是最关键的信息，必须尽力提取。**
-2. 当前地址 (`current_location`) 请提取简历中明确提到的候选人所在地信息，通常是城市。
-3. **资格证书 (`certifications`)**: 请尽力将每个证书拆分为 **基础名称 (`name`)** 和 **等级关键词 (`level_keyword`)**。如果证书本身不包含等级（如 PMP）或无法识别等级，`level_keyword` 应为 `null`。常见的等级关键词有：助理, 初级, 中级, 高级, 一级, 二级, 三级。
-4. 日期尽量标准化为 "YYYY-MM" 或 "YYYY"。对于当前仍在进行的工作或学习，结束日期用 "至今"。
-5. 工作经历和教育背景应包含所有在简历中找到的条目。
-6. 技能列表应包含所有明确提及的技术、工具、语言或其他专业技能。
-7. **只输出 JSON 对象，不要包含任何 JSON 代码块标记 (```json ... ```) 或其他解释性文字。**
-
-**示例：**
-
-**输入简历片段:**
-```
-王五
-联系电话: 13912345678
-邮箱: wangwu@email.com
-
-教育背景
-2010年9月 - 2014年6月  XX大学  计算机科学与技术  学士
-
-工作经验
-2017.03 - 至今  ABC 科技有限公司  高级后端开发工程师
-负责支付网关开发，使用 Python (Flask), Docker, MySQL。
-持有 PMP 证书。
-
-2014/07 - 2017/02  DEF 软件公司  软件工程师 (中级)
-参与开发 CRM 系统，技术栈 Java, Spring。
-
-技能: Python, Flask, Docker, MySQL, Java, Spring, Git
-证书: PMP, 中级软件工程师认证
-```
-
-**助手输出:**
-```json
-{
-  "name": "王五",
-  "phone": "13912345678",
-  "email": "wangwu@email.com",
-  "design_category": null, // 假设无法判断
-  "extracted_info": {
-    "summary": null,
-    "current_location": null, // 假设简历未提供
-    "experience": [
-      {
-        "company": "ABC 科技有限公司",
-        "title": "高级后端开发工程师", // 职位名称保持原文
-        "start_date": "2017-03",
-        "end_date": "至今",
-        "description": "负责支付网关开发，使用 Python (Flask), Docker, MySQL。持有 PMP 证书。"
-      },
-      {
-        "company": "DEF 软件公司",
-        "title": "软件工程师 (中级)", // 职位名称保持原文
-        "start_date": "2014-07",
-        "end_date": "2017-02",
-        "description": "参与开发 CRM 系统，技术栈 Java, Spring。"
-      }
-    ],
-    "education": [
-      {
-        "school": "XX大学",
-        "degree": "学士",
-        "major": "计算机科学与技术",
-        "start_date": "2010-09",
-        "end_date": "2014-06"
-      }
-    ],
-    "skills": ["Python", "Flask", "Docker", "MySQL", "Java", "Spring", "Git"],
-    "certifications": [
-      {"name": "PMP", "level_keyword": null},
-      {"name": "软件工程师认证", "level_keyword": "中级"} // LLM 尝试拆分
-    ]
-  }
-}
-```
-
-**现在，请处理以下简历文本：**
-"""
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": resume_text} # Pass the resume text directly
-        ]
-
-        response_content = self._call_llm(self.resume_model, messages)
-
-        if not response_content:
-            return None
-
-        # --- Added cleanup for potential markdown code block --- 
-        cleaned_content = response_content.strip()
-        if cleaned_content.startswith("```json"):
-            # Remove ```json prefix
-            cleaned_content = cleaned_content[len("```json"):].strip()
-        if cleaned_content.startswith("```"):
-            # Remove ``` prefix (in case language wasn't specified)
-            cleaned_content = cleaned_content[len("```"):].strip()
-        if cleaned_content.endswith("```"):
-            # Remove ``` suffix
-            cleaned_content = cleaned_content[:-len("```")].strip()
-        # --- End cleanup --- 
-            
-        try:
-            # Parse the cleaned content
-            parsed_json = json.loads(cleaned_content)
-            
-            # Basic validation (ensure it's a dictionary)
-            if not isinstance(parsed_json, dict):
-                 logger.error(f"LLM 返回的不是有效的 JSON 对象 (清理后): {cleaned_content}")
-                 return None
-            
-            # Crucial check: Ensure name and phone are extracted
-            # This check might be redundant if validator handles it, but good for early exit
-            name = parsed_json.get("name")
-            phone = parsed_json.get("phone")
-            if not name or not isinstance(name, str) or not name.strip() \
-               or not phone or not isinstance(phone, str) or not phone.strip():
-                 logger.warning(f"LLM 解析结果缺少有效的姓名或手机号。Name: '{name}', Phone: '{phone}'. 原始响应 (清理后): {cleaned_content}")
-                 # Return None to indicate failure to the pipeline trigger
-                 return None 
-
-            logger.info(f"成功解析简历。姓名: {name}") # Use extracted name
-            return parsed_json
-        except json.JSONDecodeError as e:
-            logger.error(f"无法解析 LLM 返回的 JSON (清理后): {cleaned_content}。错误: {e}")
-            return None
-        except Exception as e:
-             logger.error(f"处理 LLM 简历响应时发生错误: {e}", exc_info=True)
-             return None
+        messages = self._build_resume_messages(resume_text)
+        return self._call_llm(self.resume_model, messages, response_format=_JSON_MODE, stream=True,
+                              parse=self._parse_resume_response)
 
     # --- New method for Brief Comparison Summary --- 
-    def get_brief_comparison_summary(self, query_criteria: dict, candidates_info: List[Dict]) -> str | None:
-        """
-        为当前批次的候选人生成简要的对比分析摘要。
-
-        Args:
-            query_criteria (dict): 用户原始查询解析后的条件。
-            candidates_info (List[Dict]): 候选人关键信息列表 (例如，从 extracted_info 中提取)。
-
-        Returns:
-            str | None: 生成的摘要文本，如果失败则返回 None。
-        """
-        if not self.client:
-            logger.error("LLM Client 未初始化，无法生成摘要。")
-            return None
-        if not candidates_info:
-            logger.info("候选人列表为空，无需生成摘要。")
-            return ""
-
+    def _build_summary_messages(self, query_criteria: dict, candidates_info: List[Dict]) -> list:
+        """构建候选人对比摘要的请求消息。"""
         # 构建 Prompt
         # Example: query_criteria might be {'position': '软件工程师', 'skills': ['Python', 'FastAPI']}
         # Example: candidates_info might be [{'name':'张三', 'summary':'经验丰富...'}, {'name':'李四', 'summary':'技术栈匹配...'}]
         
-        query_details = f"招聘目标：\n"
+        # 各行先收集到列表中，最后一次性 join，避免字符串反复 += 拼接
+        qd: List[str] = ["招聘目标：\n"]
         if query_criteria.get('position'):
-            query_details += f"  职位: {query_criteria.get('position')}\n"
+            qd.append(f"  职位: {query_criteria.get('position')}\n")
         if query_criteria.get('experience_years_min') is not None:
-            query_details += f"  最低经验: {query_criteria.get('experience_years_min')}年\n"
+            qd.append(f"  最低经验: {query_criteria.get('experience_years_min')}年\n")
         if query_criteria.get('skills'):
-            query_details += f"  关键技能: {', '.join(query_criteria.get('skills'))}\n"
+            qd.append(f"  关键技能: {', '.join(query_criteria.get('skills'))}\n")
         if query_criteria.get('education_levels'):
-            query_details += f"  学历要求: {', '.join(query_criteria.get('education_levels'))}\n"
+            qd.append(f"  学历要求: {', '.join(query_criteria.get('education_levels'))}\n")
         if query_criteria.get('certifications'):
             certs = [c.get('name','') + (' (' + c.get('level_keyword','') + ')' if c.get('level_keyword') else '') 
                      for c in query_criteria.get('certifications')]
-            query_details += f"  证书要求: {', '.join(filter(None, certs))}\n"
+            qd.append(f"  证书要求: {', '.join(filter(None, certs))}\n")
         if query_criteria.get('previous_companies'):
-            query_details += f"  公司经验: {', '.join(query_criteria.get('previous_companies'))}\n"
+            qd.append(f"  公司经验: {', '.join(query_criteria.get('previous_companies'))}\n")
+        query_details = "".join(qd)
 
-        candidates_summary_text = "\n候选人列表：\n"
+        cs: List[str] = ["\n候选人列表：\n"]
         for i, candidate in enumerate(candidates_info, 1):
             # 安全获取候选人基本信息
-            cand_name = candidate.get('name', f'候选人{i}')
+            cand_name = str(candidate.get('name', f'候选人{i}')).translate(_WS_TRANS)
             info = candidate.get('extracted_info') or {}  # 避免 None 导致的属性错误
             cand_summary = info.get('summary') or '暂无摘要'
             cand_skills = info.get('skills') or []
-            cand_experience_detail = info.get('experience') or []
-            total_experience_years = 0 # This would need a utility to calculate from experience list
-            # For simplicity, we might just list titles or key experiences here
-            
-            candidates_summary_text += f"{i}. {cand_name}:\n"
-            candidates_summary_text += f"   摘要: {cand_summary[:100] + '...' if len(cand_summary) > 100 else cand_summary}\n" # 限制摘要长度
+            # 总工作年限在简历入库时已计算并存于 query_tags.min_experience_years，由调用方传入
+            total_experience_years = candidate.get('experience_years')
+
+            cs.append(f"{i}. {cand_name}:\n   摘要: {_ellipsis(cand_summary)}\n") # 限制摘要长度
+            if total_experience_years is not None:
+                cs.append(f"   总经验: {total_experience_years}年\n")
             if cand_skills:
-                candidates_summary_text += f"   技能: {', '.join(cand_skills[:5])}\n" # 最多显示5个技能
+                cs.append(f"   技能: {', '.join(itertools.islice(cand_skills, 5))}\n") # 最多显示5个技能
             # Add more relevant fields if needed
+        candidates_summary_text = "".join(cs)
 
-        system_prompt = """你是一位资深的招聘顾问。
-你的任务是根据招聘目标和候选人列表，为招聘人员提供一份简明扼要的对比分析摘要。
-请重点突出每位候选人与招聘目标的核心匹配点或显著差异。
-摘要应该帮助招聘人员快速判断哪些候选人值得优先关注。
-语言风格应专业、客观、精炼。总字数控制在200字以内。"""
-        
         user_content = f"{query_details}\n{candidates_summary_text}\n请为以上候选人生成一份对比分析摘要："
 
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": _SUMMARY_SYSTEM_PROMPT},
             {"role": "user", "content": user_content}
         ]
+        return messages
 
-        summary_text = self._call_llm(self.summary_model, messages) # 使用 summary_model
-
+    @staticmethod
+    def _finish_summary(summary_text: str | None) -> str:
+        """整理摘要响应，失败时返回兜底文案。"""
         if summary_text:
             logger.info(f"成功为查询生成了对比分析摘要。")
             return summary_text.strip()
@@ -515,6 +507,36 @@ class LLMClient:
             logger.warning(f"未能为查询生成对比分析摘要。")
             return "无法自动生成候选人对比摘要。"
 
+    def get_brief_comparison_summary(self, query_criteria: dict, candidates_info: List[Dict]) -> str | None:
+        """
+        为当前批次的候选人生成简要的对比分析摘要。
+
+        Args:
+            query_criteria (dict): 用户原始查询解析后的条件。
+            candidates_info (List[Dict]): 候选人关键信息列表 (例如，从 extracted_info 中提取)。
+
+        Returns:
+            str | None: 生成的摘要文本，如果失败则返回 None。
+        """
+        if not self.client:
+            logger.error("LLM Client 未初始化，无法生成摘要。")
+            return None
+        if not candidates_info:
+            logger.info("候选人列表为空，无需生成摘要。")
+            return ""
+
+        fingerprint = make_summary_fingerprint(query_criteria, candidates_info)
+        cached = summary_cache.get(fingerprint)
+        if cached is not None:
+            logger.debug("候选人对比摘要命中缓存。")
+            return cached
+
+        messages = self._build_summary_messages(query_criteria, candidates_info)
+        summary_text = self._call_llm(self.summary_model, messages) # 使用 summary_model
+        if summary_text:
+            summary_cache.set(fingerprint, summary_text.strip())
+        return self._finish_summary(summary_text)
+
 # 创建全局 LLMClient 实例
 llm_client = LLMClient()
 
@@ -1,12 +1,33 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from .config import get_logging_config, get_paths_config
 
 # v1.2.1 Define a custom filter for new certificate warnings
 class NewCertificateFilter(logging.Filter):
     def filter(self, record):
-        # Only allow log records containing this specific phrase
-        return "发现待审核证书" in record.getMessage()
+        # Only allow records tagged by the call site: logger.warning(..., extra={"new_cert": True})
+        # 只检查属性，不对每条日志做消息格式化
+        return getattr(record, "new_cert", False)
+
+# 文件写入在后台监听线程中完成，业务线程只负责把日志记录放入队列
+_queue_listeners = []
+
+def _queued(*handlers):
+    """为给定的处理器创建 QueueHandler，并启动对应的 QueueListener 在后台线程写入。"""
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _queue_listeners.append(listener)
+    return logging.handlers.QueueHandler(log_queue)
+
+@atexit.register
+def _stop_queue_listeners():
+    """进程退出时停止监听线程，确保队列中剩余的日志写入文件。"""
+    while _queue_listeners:
+        _queue_listeners.pop().stop()
 
 def setup_logger(name="hr_bot"):
     """
@@ -41,11 +62,13 @@ def setup_logger(name="hr_bot"):
         ch = logging.StreamHandler()
         ch.setLevel(log_level)
         ch.setFormatter(formatter)
-        logger.addHandler(ch)
+        # 控制台输出同样经队列在后台线程写入，避免在事件循环中阻塞于 stderr
+        cqh = _queued(ch)
+        logger.addHandler(cqh)
         # Also add console handler to root logger to capture logs from all modules
         root_logger = logging.getLogger()
         root_logger.setLevel(log_level)
-        root_logger.addHandler(ch)
+        root_logger.addHandler(cqh)
 
         # Create file handler if log file is specified
         if log_file_name:
@@ -62,12 +85,16 @@ def setup_logger(name="hr_bot"):
                     # Optionally fall back to logging only to console
                     return logger # Return logger with console handler only
 
-            fh = logging.FileHandler(log_file_path, encoding='utf-8')
+            # delay=True: 首次写入时才打开文件
+            fh = logging.handlers.RotatingFileHandler(
+                log_file_path, maxBytes=10_000_000, backupCount=5, encoding='utf-8', delay=True
+            )
             fh.setLevel(log_level)
             fh.setFormatter(formatter)
-            logger.addHandler(fh)
+            fqh = _queued(fh)
+            logger.addHandler(fqh)
             # Also add file handler to root logger
-            root_logger.addHandler(fh)
+            root_logger.addHandler(fqh)
 
         # v1.2.1 Add a dedicated handler for new certificate warnings
         new_cert_log_file = "logs/new_certificates.log" # Store in logs subdirectory
@@ -93,12 +120,16 @@ def setup_logger(name="hr_bot"):
         # Check again if dir exists before creating handler, in case of creation failure
         if os.path.exists(new_cert_log_dir):
             try:
-                nch = logging.FileHandler(new_cert_log_path, encoding='utf-8')
+                nch = logging.FileHandler(new_cert_log_path, encoding='utf-8', delay=True)
                 nch.setLevel(logging.WARNING) # Only capture WARNING level and above
                 nch.setFormatter(formatter) # Use the same format
                 # Add the custom filter
                 nch.addFilter(NewCertificateFilter())
-                logger.addHandler(nch)
+                ncqh = _queued(nch)
+                # 队列端同样设置级别与过滤器：不相关的记录在调用线程中直接丢弃，不再经 QueueHandler.prepare 复制与格式化
+                ncqh.setLevel(logging.WARNING)
+                ncqh.addFilter(NewCertificateFilter())
+                logger.addHandler(ncqh)
                 logger.info(f"已配置待审核证书日志记录到: {new_cert_log_path}")
             except Exception as e:
                 logger.error(f"配置待审核证书日志处理器失败: {e}")
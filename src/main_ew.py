@@ -1,7 +1,10 @@
-from fastapi import FastAPI, Request, HTTPException, Query, BackgroundTasks
+from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 import logging
 import uvicorn
 import asyncio
+import importlib.util
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 # import sys # 不再需要
@@ -21,6 +24,16 @@ except ImportError as e:
         pass
     WXBizMsgCrypt = None # 确保后续检查 WXBizMsgCrypt 时不会因 NameError 而崩溃
 
+# 可选依赖：lxml 的 C 解析器比 Expat + xmltodict 构建字典更快；未安装时回退到 xmltodict
+import xmltodict
+from xml.parsers.expat import ExpatError
+try:
+    from lxml import etree
+    _XML_PARSE_ERRORS = (ExpatError, etree.XMLSyntaxError)
+except ImportError:
+    etree = None
+    _XML_PARSE_ERRORS = (ExpatError,)
+
 from . import config_ew # 导入配置模块 # Relative import
 from .enterprise_wechat_service import EnterpriseWeChatService
 from .core_processor_ew import CoreProcessor
@@ -29,51 +42,126 @@ from src.resume_pipeline.trigger import run_pipeline
 app = FastAPI(
     title=f"{config_ew.BOT_NAME} - 企业微信API",
     description="接收企业微信回调，并处理相关业务逻辑。",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson 在 C/Rust 层完成序列化；未安装时 ORJSONResponse 无法渲染，回退到标准库 json
+    default_response_class=ORJSONResponse if importlib.util.find_spec("orjson") else JSONResponse
 )
 
+class _CallbackExemptGZipMiddleware(GZipMiddleware):
+    """对 JSON 接口启用 gzip 压缩，但企业微信回调路由 ("/") 始终原样返回纯文本。"""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/":
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(_CallbackExemptGZipMiddleware, minimum_size=1024) # 小于 1KB 的响应不压缩
+
 # 配置日志
 logging.basicConfig(level=config_ew.LOG_LEVEL.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-# TODO: 初始化一个更完善的日志系统，可以从 logger.py 模块导入
-print(f"日志级别设置为: {config_ew.LOG_LEVEL}") # 临时打印
+# 处理器由 logger.py 挂在根日志器上 (经 QueueHandler 在后台线程写入)，这里的日志记录会传播过去
+logger.info(f"日志级别设置为: {config_ew.LOG_LEVEL}")
 
 # 校验配置是否加载正确
 try:
     config_ew.validate_config() # 应用启动时校验一次核心配置
 except ValueError as e:
-    # logger.critical(f"核心配置校验失败，应用无法启动: {e}")
-    print(f"核心配置校验失败，应用可能无法正常工作: {e}") # 临时打印
+    logger.critical(f"核心配置校验失败，应用可能无法正常工作: {e}")
     # 在生产环境中，这里可能需要更强的错误处理，例如退出应用
 
 # 初始化企业微信服务和核心处理器实例
 _ew_service = EnterpriseWeChatService()
 _processor = CoreProcessor(_ew_service)
 
+# 回调加解密实例只创建一次 (构造时会解码 AESKey)；其内部在初始化后不再修改状态，可被并发请求共享
+_wxcpt = None
+if WXBizMsgCrypt is not None:
+    try:
+        _wxcpt = WXBizMsgCrypt(
+            sToken=config_ew.WECOM_CALLBACK_TOKEN,
+            sEncodingAESKey=config_ew.WECOM_CALLBACK_AES_KEY,
+            sReceiveId=config_ew.WECOM_CORP_ID  # 通常是 CorpID，对于ISV是suiteid/corpid
+        )
+    except Exception as e:
+        logger.error(f"初始化 WXBizMsgCrypt 失败，回调消息将无法解密，请检查 WECOM_CALLBACK_AES_KEY 配置: {e}")
+
+    # 记录回调解密所用的 AES 实现 (pycryptodome 的 C 实现，CPU 支持时走 AES-NI 指令)
+    try:
+        import Crypto
+        from Crypto.Util._cpu_features import have_aes_ni
+        logger.info(f"回调解密使用 pycryptodome {Crypto.__version__}，AES-NI: {'启用' if have_aes_ni() else '不可用'}")
+    except Exception as e:
+        logger.warning(f"无法检测 AES 加速支持: {e}")
+
+# --- 回调消息队列 ---
+# 回调处理器只负责入队并立即回复；固定数量的 worker 协程从队列取出消息交给 CoreProcessor，
+# 突发流量下积压的消息数有上限，不会无限创建后台任务
+_message_queue: asyncio.Queue = None
+_message_workers = []
+
+async def _message_worker(worker_id: int):
+    """从回调消息队列中取出消息并交给 CoreProcessor 处理。"""
+    while True:
+        msg_dict = await _message_queue.get()
+        try:
+            await _processor.handle_ew_message(msg_dict)
+        except Exception as e:
+            logger.exception(f"消息处理 worker {worker_id} 处理消息时发生异常: {e}")
+        finally:
+            _message_queue.task_done()
+
 # 初始化 APScheduler
-scheduler = AsyncIOScheduler()
+# 同步任务耗时较长，禁止同一任务并发运行，错过的多次触发合并为一次执行，避免任务堆积抢占事件循环和数据库连接
+SYNC_JOB_MISFIRE_GRACE_SECONDS = 300
+scheduler = AsyncIOScheduler(job_defaults={'coalesce': True, 'max_instances': 1})
+
+# 需要定时同步的 HR 用户列表在导入时确定 (config_ew 中已去除空白与空项)，每次触发不再重复处理
+_SYNC_HR_USERIDS = tuple(config_ew.SYNC_HR_USERIDS)
 
 async def scheduled_sync_external_contacts():
-    """定时任务：为配置的HR用户执行外部联系人同步"""
-    if not config_ew.SYNC_HR_USERIDS:
+    """定时任务：为配置的HR用户并发执行外部联系人同步"""
+    if not _SYNC_HR_USERIDS:
         logger.info("定时同步任务：未配置 SYNC_HR_USERIDS，跳过执行。")
         return
 
-    logger.info(f"定时同步任务：开始为 HR 用户列表 {config_ew.SYNC_HR_USERIDS} 执行外部联系人同步。")
-    for hr_userid in config_ew.SYNC_HR_USERIDS:
-        if hr_userid.strip(): #确保用户ID有效
-            logger.info(f"定时同步任务：正在为 HR 用户 {hr_userid.strip()} 创建同步子任务。")
-            try:
-                # 直接调用 CoreProcessor 中持有的 SyncProcessor 实例的方法
-                # SyncProcessor 的 run_sync_for_hr 已经是异步的，并且内部会处理通知
-                await _processor.sync_processor.run_sync_for_hr(hr_userid=hr_userid.strip(), triggered_by_manual_command=False)
-                logger.info(f"定时同步任务：为 HR 用户 {hr_userid.strip()} 的同步任务已提交执行。")
-            except Exception as e:
-                logger.error(f"定时同步任务：为 HR 用户 {hr_userid.strip()} 创建同步子任务时发生错误: {e}")
+    logger.info(f"定时同步任务：开始为 HR 用户列表 {list(_SYNC_HR_USERIDS)} 执行外部联系人同步。")
+    # 直接调用 CoreProcessor 中持有的 SyncProcessor 实例的方法
+    # 各 HR 用户的同步互不依赖，等待企业微信 API 的时间可以重叠
+    results = await asyncio.gather(
+        *(_processor.sync_processor.run_sync_for_hr(hr_userid=hr_userid, triggered_by_manual_command=False)
+          for hr_userid in _SYNC_HR_USERIDS),
+        return_exceptions=True
+    )
+    for hr_userid, result in zip(_SYNC_HR_USERIDS, results):
+        if isinstance(result, Exception):
+            logger.error(f"定时同步任务：为 HR 用户 {hr_userid} 执行同步时发生错误: {result}")
     logger.info("定时同步任务：所有配置的HR用户的同步任务已处理完毕。")
 
+def _element_to_dict(element) -> dict:
+    """将 XML 元素的子节点转换为字典，结构与 xmltodict.parse(...)['xml'] 一致 (企业微信消息不含属性)。"""
+    return {
+        child.tag: _element_to_dict(child) if len(child) else child.text
+        for child in element
+    }
+
+def _parse_wecom_xml(xml_bytes: bytes) -> dict:
+    """解析解密后的企业微信消息 XML (原始字节，解析器自行识别编码)，返回 <xml> 节点下的字段字典。"""
+    if etree is not None:
+        return _element_to_dict(etree.fromstring(xml_bytes))
+    # xmltodict 内部已设置 parser.buffer_text = True (Expat 在 C 层合并连续文本)，
+    # 不能再作为关键字参数传入，否则会被转交给 _DictSAXHandler 而报 TypeError
+    return xmltodict.parse(xml_bytes)['xml'] # 企业微信消息通常在外层有个 <xml> 标签
+
 @app.on_event("startup")
 async def startup_event():
+    global _message_queue
+    _message_queue = asyncio.Queue(maxsize=config_ew.WECOM_MESSAGE_QUEUE_MAXSIZE)
+    # worker 数与 CoreProcessor 线程池大小一致，每个 worker 同一时间只占用一个处理线程
+    for worker_id in range(config_ew.WECOM_CORE_PROCESSOR_MAX_WORKERS):
+        _message_workers.append(asyncio.create_task(_message_worker(worker_id)))
+    logger.info(f"已启动 {len(_message_workers)} 个消息处理 worker，队列上限: {config_ew.WECOM_MESSAGE_QUEUE_MAXSIZE}")
+
     logger.info("应用启动事件：开始配置定时任务...")
     if config_ew.SYNC_SCHEDULE_CRON and config_ew.SYNC_HR_USERIDS:
         try:
@@ -82,7 +170,10 @@ async def startup_event():
                 CronTrigger.from_crontab(config_ew.SYNC_SCHEDULE_CRON),
                 id="sync_external_contacts_job", 
                 name="定时同步外部联系人",
-                replace_existing=True
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+                misfire_grace_time=SYNC_JOB_MISFIRE_GRACE_SECONDS
             )
             scheduler.start()
             logger.info(f"定时同步外部联系人任务已启动，CRON表达式: {config_ew.SYNC_SCHEDULE_CRON}")
@@ -93,138 +184,131 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for task in _message_workers:
+        task.cancel()
+    _message_workers.clear()
     if scheduler.running:
         scheduler.shutdown()
         logger.info("APScheduler 已关闭。")
 
-@app.get("/", tags=["企业微信回调"], summary="企业微信回调URL验证")
-async def verify_wecom_callback(
-    msg_signature: str = Query(..., description="企业微信加密签名"),
-    timestamp: str = Query(..., description="时间戳"),
-    nonce: str = Query(..., description="随机数"),
-    echostr: str = Query(..., description="加密的随机字符串，解密后原样返回")
-):
+def _callback_query_params(request: Request, *names: str) -> list:
+    """
+    直接从 request.query_params 读取回调参数，不经过 FastAPI 的 Query 参数校验。
+    参数的真实性由 WXBizMsgCrypt 的签名校验保证，这里只检查是否缺失。
+    """
+    query_params = request.query_params
+    values = [query_params.get(name) for name in names]
+    if None in values:
+        missing = [name for name, value in zip(names, values) if value is None]
+        raise HTTPException(status_code=400, detail=f"缺少回调参数: {', '.join(missing)}")
+    return values
+
+# 企业微信回调要求原样返回纯文本 (解密后的 echostr 或空字符串)，不经过 JSON 序列化
+@app.get("/", tags=["企业微信回调"], summary="企业微信回调URL验证", response_class=PlainTextResponse)
+async def verify_wecom_callback(request: Request):
     """
     处理企业微信服务器发送的URL验证请求 (GET)。
-    企业微信在配置回调URL时，会向填写的URL发送一个GET请求，
+    企业微信在配置回调URL时，会向填写的URL发送一个GET请求 (参数: msg_signature, timestamp, nonce, echostr)，
     开发者需要解密`echostr`参数并原样返回，以验证URL的有效性。
     """
-    # logger.info(
-    #     f"收到企业微信URL验证请求: msg_signature={msg_signature}, timestamp={timestamp}, nonce={nonce}, echostr长度={len(echostr)}"
-    # )
-    print(f"收到企业微信URL验证请求: msg_signature={msg_signature}, timestamp={timestamp}, nonce={nonce}, echostr长度={len(echostr)}") # 临时
+    msg_signature, timestamp, nonce, echostr = _callback_query_params(
+        request, "msg_signature", "timestamp", "nonce", "echostr"
+    )
+    # 回调路径上的调试日志先判断级别，未开启 DEBUG 时不做字符串格式化
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        logger.debug(f"收到企业微信URL验证请求: msg_signature={msg_signature}, timestamp={timestamp}, nonce={nonce}, echostr长度={len(echostr)}")
     
+    if _wxcpt is None:
+        raise HTTPException(status_code=500, detail="服务器内部错误: WXBizMsgCrypt 未初始化")
     try:
-        wxcpt = WXBizMsgCrypt(
-            sToken=config_ew.WECOM_CALLBACK_TOKEN,
-            sEncodingAESKey=config_ew.WECOM_CALLBACK_AES_KEY,
-            sReceiveId=config_ew.WECOM_CORP_ID  # 通常是 CorpID，对于ISV是suiteid/corpid
-        )
-        ret, s_echo_str_bytes = wxcpt.VerifyURL(sMsgSignature=msg_signature, sTimeStamp=timestamp, sNonce=nonce, sEchoStr=echostr)
+        ret, s_echo_str_bytes = _wxcpt.VerifyURL(sMsgSignature=msg_signature, sTimeStamp=timestamp, sNonce=nonce, sEchoStr=echostr)
         
         if ret != 0:
-            # logger.error(f"企业微信回调URL验证失败，错误码: {ret}, 返回的 echostr: {s_echo_str_bytes.decode('utf-8') if s_echo_str_bytes else 'N/A'}")
-            print(f"企业微信回调URL验证失败，错误码: {ret}") # 临时
+            logger.error(f"企业微信回调URL验证失败，错误码: {ret}")
             raise HTTPException(status_code=400, detail=f"URL验证失败，错误码: {ret}")
         
         s_echo_str = s_echo_str_bytes.decode('utf-8')
-        # logger.info(f"企业微信回调URL验证成功，返回解密后的 echostr: {s_echo_str}")
-        print(f"企业微信回调URL验证成功，返回解密后的 echostr: {s_echo_str}") # 临时
+        logger.info("企业微信回调URL验证成功。")
+        if debug_enabled:
+            logger.debug(f"返回解密后的 echostr: {s_echo_str}")
         
-        # 根据企业微信文档，直接返回解密后的字符串内容作为响应体
-        # FastAPI会自动处理Content-Type为text/plain
+        # 根据企业微信文档，直接返回解密后的字符串内容作为响应体 (PlainTextResponse, Content-Type 为 text/plain)
         # 注意：某些旧文档或实现可能要求返回整数，但新版通常是字符串
         # 确保企业微信后台配置时，能接收到这个字符串。
         return s_echo_str
     except Exception as e:
-        # logger.exception("企业微信回调URL验证过程中发生内部异常")
-        print(f"企业微信回调URL验证过程中发生内部异常: {e}") # 临时
+        logger.exception(f"企业微信回调URL验证过程中发生内部异常: {e}")
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
 
-@app.post("/", tags=["企业微信回调"], summary="企业微信消息接收与处理")
-async def receive_wecom_message(
-    request: Request, # FastAPI的Request对象，用于获取请求体
-    msg_signature: str = Query(..., description="企业微信加密签名"),
-    timestamp: str = Query(..., description="时间戳"),
-    nonce: str = Query(..., description="随机数")
-):
+@app.post("/", tags=["企业微信回调"], summary="企业微信消息接收与处理", response_class=PlainTextResponse)
+async def receive_wecom_message(request: Request): # FastAPI的Request对象，用于获取请求体和查询参数
     """
-    接收并处理企业微信服务器推送的加密消息 (POST)。
+    接收并处理企业微信服务器推送的加密消息 (POST，参数: msg_signature, timestamp, nonce)。
     """
-    # logger.info(f"收到企业微信POST消息回调: msg_signature={msg_signature}, timestamp={timestamp}, nonce={nonce}")
-    print(f"收到企业微信POST消息回调: msg_signature={msg_signature}, timestamp={timestamp}, nonce={nonce}") # 临时
+    msg_signature, timestamp, nonce = _callback_query_params(request, "msg_signature", "timestamp", "nonce")
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        logger.debug(f"收到企业微信POST消息回调: msg_signature={msg_signature}, timestamp={timestamp}, nonce={nonce}")
     try:
+        # 请求体与解密结果都以字节形式交给 XML 解析器，不做整段 UTF-8 解码；仅在记录日志时解码前若干字节
         body_bytes = await request.body()
-        encrypted_xml_msg = body_bytes.decode('utf-8')
-        # logger.debug(f"收到的加密XML消息体: {encrypted_xml_msg}")
-        print(f"收到的加密XML消息体 (前200字符): {encrypted_xml_msg[:200]}") # 临时
+        if debug_enabled:
+            logger.debug(f"收到的加密XML消息体 (前200字节): {body_bytes[:200].decode('utf-8', 'replace')}")
 
-        wxcpt = WXBizMsgCrypt(
-            sToken=config_ew.WECOM_CALLBACK_TOKEN,
-            sEncodingAESKey=config_ew.WECOM_CALLBACK_AES_KEY,
-            sReceiveId=config_ew.WECOM_CORP_ID
-        )
+        if _wxcpt is None:
+            logger.error("WXBizMsgCrypt 未初始化，无法解密消息。")
+            return ""
 
-        ret, decrypted_xml_msg_bytes = wxcpt.DecryptMsg(
-            sPostData=encrypted_xml_msg, 
+        ret, decrypted_xml_msg_bytes = _wxcpt.DecryptMsg(
+            sPostData=body_bytes, 
             sMsgSignature=msg_signature, 
             sTimeStamp=timestamp, 
             sNonce=nonce
         )
 
         if ret != 0:
-            # logger.error(f"企业微信消息解密失败，错误码: {ret}。密文: {encrypted_xml_msg[:200]}...")
-            print(f"企业微信消息解密失败，错误码: {ret}。密文 (前200字符): {encrypted_xml_msg[:200]}...") # 临时
+            logger.error(f"企业微信消息解密失败，错误码: {ret}。密文 (前200字节): {body_bytes[:200].decode('utf-8', 'replace')}...")
             # 企业微信要求即使解密失败也要回复空字符串或"success"
             # 通常回复空字符串以避免企微持续重试错误的消息
             return "" 
 
-        decrypted_xml_msg = decrypted_xml_msg_bytes.decode('utf-8')
-        # logger.info(f"成功解密消息: {decrypted_xml_msg}")
-        print(f"成功解密消息 (XML): {decrypted_xml_msg[:300]}") # 临时
+        if debug_enabled:
+            logger.debug(f"成功解密消息 (XML): {decrypted_xml_msg_bytes[:300].decode('utf-8', 'replace')}")
 
-        # 1. 解析XML消息 (使用 xmltodict)
-        import xmltodict # 在函数内部导入，或者在文件顶部导入
+        # 1. 解析XML消息 (优先使用 lxml，未安装时使用 xmltodict)
         try:
-            parsed_msg_dict = xmltodict.parse(decrypted_xml_msg)['xml'] # 企业微信消息通常在外层有个 <xml> 标签
-            # logger.info(f"解析后的消息字典: {parsed_msg_dict}")
-            print(f"解析后的消息字典: {parsed_msg_dict}") # 临时
-            
-            # 提取关键信息示例 (后续将传递给 CoreProcessor)
-            msg_type = parsed_msg_dict.get('MsgType')
-            from_user_id = parsed_msg_dict.get('FromUserName')
-            agent_id = parsed_msg_dict.get('AgentID') # 确认与配置的 AgentID 一致
-            # logger.info(f"消息类型: {msg_type}, 发送者: {from_user_id}, AgentID: {agent_id}")
-            print(f"消息类型: {msg_type}, 发送者: {from_user_id}, AgentID: {agent_id}")
-
-            if msg_type == 'text':
-                content = parsed_msg_dict.get('Content')
-                # logger.info(f"文本内容: {content}")
-                print(f"文本内容: {content}")
-            elif msg_type == 'event':
-                event = parsed_msg_dict.get('Event')
-                # logger.info(f"事件类型: {event}")
-                print(f"事件类型: {event}")
-            # 可以根据需要处理更多消息类型 (image, file, voice, video, location, link, etc.)
-
-        except xmltodict.expat.ExpatError as e:
-            # logger.error(f"XML消息解析失败 (xmltodict.expat.ExpatError): {e}. XML内容: {decrypted_xml_msg[:300]}")
-            print(f"XML消息解析失败 (xmltodict.expat.ExpatError): {e}. XML内容 (前300字符): {decrypted_xml_msg[:300]}")
+            parsed_msg_dict = _parse_wecom_xml(decrypted_xml_msg_bytes)
+            if debug_enabled:
+                logger.debug(f"解析后的消息字典: {parsed_msg_dict}")
+                # 提取关键信息 (消息本身由 CoreProcessor 处理)
+                msg_type = parsed_msg_dict.get('MsgType')
+                from_user_id = parsed_msg_dict.get('FromUserName')
+                agent_id = parsed_msg_dict.get('AgentID') # 确认与配置的 AgentID 一致
+                logger.debug(f"消息类型: {msg_type}, 发送者: {from_user_id}, AgentID: {agent_id}")
+                if msg_type == 'text':
+                    logger.debug(f"文本内容: {parsed_msg_dict.get('Content')}")
+                elif msg_type == 'event':
+                    logger.debug(f"事件类型: {parsed_msg_dict.get('Event')}")
+
+        except _XML_PARSE_ERRORS as e:
+            logger.error(f"XML消息解析失败: {e}. XML内容 (前300字节): {decrypted_xml_msg_bytes[:300].decode('utf-8', 'replace')}")
             # 即使解析失败，也应回复空字符串
             return ""
         except Exception as e:
-            # logger.exception(f"消息字典处理过程中发生未知异常. XML内容: {decrypted_xml_msg[:300]}")
-            print(f"消息字典处理过程中发生未知异常. XML内容 (前300字符): {decrypted_xml_msg[:300]}, 错误: {e}")
+            logger.exception(f"消息字典处理过程中发生未知异常. XML内容 (前300字节): {decrypted_xml_msg_bytes[:300].decode('utf-8', 'replace')}, 错误: {e}")
             return ""
 
-        # 将解析后的消息 (parsed_msg_dict) 传递给 CoreProcessor 进行异步处理
-        asyncio.create_task(_processor.handle_ew_message(parsed_msg_dict))
+        # 将解析后的消息 (parsed_msg_dict) 放入队列，由 worker 交给 CoreProcessor 进行异步处理
+        try:
+            _message_queue.put_nowait(parsed_msg_dict)
+        except asyncio.QueueFull:
+            logger.warning(f"待处理消息队列已满 ({_message_queue.maxsize})，丢弃来自 {parsed_msg_dict.get('FromUserName')} 的消息。")
         # 企业微信要求在5秒内响应，对于耗时操作应异步处理，并立即回复。
         # 回复空字符串表示成功处理。
         return ""
     except Exception as e:
-        # logger.exception("处理企业微信POST消息时发生内部异常")
-        print(f"处理企业微信POST消息时发生内部异常: {e}") # 临时
+        logger.exception(f"处理企业微信POST消息时发生内部异常: {e}")
         # 即使发生异常，也应尝试回复空字符串或 "success"，以避免企业微信重试
         return "" 
 
@@ -242,9 +326,19 @@ async def health_check():
     return {"status": "healthy", "bot_name": config_ew.BOT_NAME}
 
 if __name__ == "__main__":
-    # logger.info(f"启动 {config_ew.BOT_NAME} 企业微信回调服务器...")
-    print(f"启动 {config_ew.BOT_NAME} 企业微信回调服务器...") # 临时
+    logger.info(f"启动 {config_ew.BOT_NAME} 企业微信回调服务器...")
     # 启动Uvicorn服务器
     # host="0.0.0.0" 允许外部访问，port=8502 (或从配置读取)
     # reload=True 用于开发时代码热重载
-    uvicorn.run(app, host="0.0.0.0", port=8503, log_level=config_ew.LOG_LEVEL.lower()) 
\ No newline at end of file
+    # 显式使用 uvloop 事件循环与 httptools 解析器 (uvicorn[standard] 提供；Windows 上无 uvloop，回退到默认实现)
+    # 注意：保持单进程运行。用户会话状态 (StateManager) 与定时任务都在进程内存中，多 worker 会导致状态不一致。
+    loop_impl = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http_impl = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8503,
+        loop=loop_impl,
+        http=http_impl,
+        log_level=config_ew.LOG_LEVEL.lower(),
+    ) 
\ No newline at end of file
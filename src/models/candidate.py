@@ -1,11 +1,11 @@
 from typing import List, Dict, Optional, Any
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from pydantic import BaseModel, Field, Extra
+from pydantic import BaseModel, Field, ConfigDict
 
 # 注意：以下模型是基础版本，字段可能需要在后续开发中根据 LLM 提取能力和具体需求进行调整。
 
-@dataclass
+@dataclass(slots=True)
 class Experience:
     """Represents a single work experience entry."""
     company: Optional[str] = None
@@ -14,7 +14,7 @@ class Experience:
     end_date: Optional[str] = None
     description: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class Education:
     """Represents a single education entry."""
     school: Optional[str] = None
@@ -35,8 +35,7 @@ class ExtractedInfo(BaseModel):
     # Consider adding other potential fields like projects, languages, awards here
     # if the resume parsing prompt is updated to extract them.
 
-    class Config:
-        extra = Extra.allow # Allow extra fields from LLM not explicitly defined
+    model_config = ConfigDict(extra='allow') # Allow extra fields from LLM not explicitly defined
 
 # New dataclass for query tags, aligned with validator output
 class QueryTags(BaseModel):
@@ -52,12 +51,11 @@ class QueryTags(BaseModel):
     # e.g., education_level_normalized: Optional[str] = None
     #       schools: List[str] = Field(default_factory=list)
 
-    class Config:
-        extra = Extra.allow
+    model_config = ConfigDict(extra='allow')
 
-@dataclass
+@dataclass(slots=True)
 class Candidate:
-    """Main dataclass representing a candidate in the database."""
+    """Main dataclass representing a candidate in the database. (slots: 无 __dict__，省内存且属性访问更快)"""
     # 关键识别信息
     name: Optional[str] = None # 姓名 (关键字段)
     phone: Optional[str] = None # 手机号 (关键字段)
@@ -81,49 +79,37 @@ class Candidate:
     # MongoDB 自动管理的字段 (Optional, as it's managed by DB)
     _id: Optional[str] = None # MongoDB ObjectId (usually managed by MongoDB)
 
+    # 查询时计算的匹配总分，不存入数据库 (slots 类没有 __dict__，不能再动态 setattr 新属性)
+    score: Optional[float] = None
+
     # Helper methods remain largely the same, handling dicts for nested fields
     def to_dict(self) -> Dict:
         """将 Candidate 对象转换为可存储到 MongoDB 的字典。"""
+        # 单次遍历字段并移除值为 None 的字段，避免存入数据库 (extracted_info / query_tags 以 dict 形式存储)
         data = {
-            "name": self.name,
-            "phone": self.phone,
-            "email": self.email,
-            "wxid": self.wxid,
-            "external_wecom_id": self.external_wecom_id,
-            "resume_pdf_path": self.resume_pdf_path,
-            "source_file_original_name": self.source_file_original_name,
-            "extracted_info": self.extracted_info, # Store as dict
-            "query_tags": self.query_tags,       # Store as dict
-            "last_processed_time": self.last_processed_time,
+            k: v for k, v in ((f.name, getattr(self, f.name)) for f in fields(self) if f.name not in _NON_STORED_FIELDS)
+            if v is not None
         }
         # Add _id only if it exists (useful if updating based on existing obj)
         if self._id:
             data['_id'] = self._id
-        # 移除值为 None 的字段，避免存入数据库
-        return {k: v for k, v in data.items() if v is not None}
+        return data
 
     @staticmethod
     def from_dict(data: Dict) -> 'Candidate':
         """从字典创建 Candidate 对象。"""
+        # 按字段声明顺序一次性取值 (map + dict.get 在 C 层完成，缺失字段为 None)，批量加载时省去逐字段的方法调用
+        # extracted_info / query_tags 直接使用字典
+        candidate = Candidate(*map(data.get, _CANDIDATE_FIELDS))
         # Handle potential ObjectId if using pymongo directly elsewhere
-        object_id = data.get('_id')
-        _id_str = str(object_id) if object_id else None
-
-        candidate = Candidate(
-            _id=_id_str,
-            name=data.get('name'),
-            phone=data.get('phone'),
-            email=data.get('email'),
-            wxid=data.get('wxid'),
-            external_wecom_id=data.get('external_wecom_id'),
-            resume_pdf_path=data.get('resume_pdf_path'),
-            source_file_original_name=data.get('source_file_original_name'),
-            extracted_info=data.get('extracted_info'), # Get the dict directly
-            query_tags=data.get('query_tags'),       # Get the dict directly
-            last_processed_time=data.get('last_processed_time')
-        )
+        candidate._id = str(candidate._id) if candidate._id else None
         return candidate
 
+# Candidate 的字段名，按声明顺序 (与位置参数顺序一致)
+_CANDIDATE_FIELDS = tuple(f.name for f in fields(Candidate))
+# to_dict 不写出的字段：_id 单独处理，score 仅在查询时使用
+_NON_STORED_FIELDS = frozenset({'_id', 'score'})
+
 if __name__ == '__main__':
     # Updated example usage (optional)
     # Create example nested dictionaries
@@ -1,152 +1,358 @@
 import logging
 import asyncio
-import re # <--- 新增导入
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 
 from src.enterprise_wechat_service import EnterpriseWeChatService
 from src.db_interface import DBInterface
 from src import config_ew
+from src.utils.rate_limiter import TokenBucket
 # from src.llm_client import LLMClient # SyncProcessor 可能不需要 LLMClient，暂时注释
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG) # <--- 强制设置模块级日志级别为DEBUG
+
+# 联系人缺少 external_contact / follow_info 时共用的空字典 (只读，从不修改)，避免逐个联系人分配新的空字典
+_EMPTY: Dict[str, Any] = {}
+
+# 分页获取外部联系人 API 的进程级限流 (多个 HR 同时同步时共享额度)；未超出速率时不等待
+_page_rate_limiter = TokenBucket(config_ew.SYNC_PAGE_RATE_LIMIT_PER_SEC)
+# 同步只用到候选人的 _id、name 与 external_wecom_id，按手机号查询时只取这些字段，不传输 extracted_info 等大字段
+_SYNC_CANDIDATE_PROJECTION = {"_id": 1, "name": 1, "external_wecom_id": 1}
+
+def _is_cn_mobile(s) -> bool:
+    """整串校验是否为11位手机号 (1 开头、第二位 3-9，等价于正则 1[3-9]\\d{9} 的完整匹配)，用字符串方法代替正则引擎。"""
+    return isinstance(s, str) and len(s) == 11 and s[0] == '1' and '3' <= s[1] <= '9' and s[2:].isdecimal()
 
 class SyncProcessor:
     def __init__(self, ew_service: EnterpriseWeChatService, db_interface: DBInterface, llm_client=None): # llm_client 设为可选
         self.ew_service = ew_service
         self.db_interface = db_interface
-        # 手机号提取的正则表达式，匹配11位数字，常见的号段开头
-        self.phone_regex = re.compile(r"1[3-9]\d{9}")
+        # 同步专用的数据库线程池，与 asyncio.to_thread 使用的默认线程池隔离；大小与同时处理的联系人数一致
+        self._db_executor = ThreadPoolExecutor(max_workers=config_ew.SYNC_CONCURRENCY, thread_name_prefix="sync-db")
         # self.llm_client = llm_client # 如果需要
         logger.info("SyncProcessor 初始化完成。")
 
+    async def aclose(self):
+        """关闭同步专用的数据库线程池 (不等待，正在执行的数据库调用会在后台完成)。"""
+        self._db_executor.shutdown(wait=False)
+        logger.info("SyncProcessor 已关闭。")
+
     def _extract_phone_from_remark(self, remark: Optional[str]) -> Optional[str]:
-        """从备注中提取第一个匹配的手机号码。"""
-        if not remark:
+        """
+        从备注中提取第一个匹配的手机号码 (等价于正则 1[3-9]\\d{9} 的 search)。
+        用 str.find 跳到下一个 '1' 再校验其后10位，不进入正则引擎；剩余长度不足11位时提前结束。
+        """
+        if not remark or len(remark) < 11:
             return None
-        match = self.phone_regex.search(remark)
-        return match.group(0) if match else None
+        i, n = 0, len(remark)
+        while True:
+            j = remark.find('1', i, n - 10)
+            if j < 0:
+                return None
+            window = remark[j:j + 11]
+            if '3' <= window[1] <= '9' and window[2:].isdecimal():
+                return window
+            i = j + 1
+
+    def _select_contacts_for_sync(self, hr_userid: str, contacts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        任务 3.3: 筛选联系人。跳过已打同步成功标签或提取不到有效手机号的联系人，
+        返回需要处理的联系人 (提取到的手机号记录在 '_extracted_phone_for_sync' 中)。
+        """
+        selected_contacts: List[Dict[str, Any]] = []
+        sync_tag = config_ew.TAG_ID_SYNC_SUCCESS # 循环外取一次，避免逐个联系人访问模块属性
+        debug_enabled = logger.isEnabledFor(logging.DEBUG) # 每页判断一次，DEBUG 关闭时不格式化逐个联系人的调试日志
+        for contact_data in contacts:
+            external_contact_info = contact_data.get("external_contact") or _EMPTY
+            follow_info = contact_data.get("follow_info") or _EMPTY
+
+            external_userid = external_contact_info.get("external_userid")
+            if not external_userid:
+                if debug_enabled:
+                    logger.debug(f"HR {hr_userid}: 跳过一个没有 external_userid 的联系人记录: {contact_data}")
+                continue
+
+            # 1. 检查是否已打成功同步标签
+            existing_tags = follow_info.get("tag_id")
+            if sync_tag and isinstance(existing_tags, list) and sync_tag in existing_tags:
+                if debug_enabled:
+                    logger.debug(f"HR {hr_userid}: 外部联系人 {external_userid} 已有同步成功标签，跳过处理。")
+                continue
+
+            # 2. 提取手机号：优先顺序 external_contact.mobile -> follow_info.remark_mobiles[0] -> 从 follow_info.remark 提取
+            # 前两者只做整串校验，只有都无效时才扫描一次备注文本
+            remark_text: Optional[str] = follow_info.get("remark") # remark_text 定义移到这里，避免重复获取
+            mobile_from_profile = external_contact_info.get("mobile")
+            remark_mobiles_list = follow_info.get("remark_mobiles")
+            if _is_cn_mobile(mobile_from_profile):
+                contact_phone, extracted_phone_source = mobile_from_profile, "external_contact.mobile"
+            elif isinstance(remark_mobiles_list, list) and remark_mobiles_list and _is_cn_mobile(remark_mobiles_list[0]):
+                contact_phone, extracted_phone_source = remark_mobiles_list[0], "follow_info.remark_mobiles[0]"
+            else:
+                contact_phone, extracted_phone_source = self._extract_phone_from_remark(remark_text), "follow_info.remark (提取)"
+
+            if contact_phone:
+                if debug_enabled:
+                    logger.debug(f"HR {hr_userid}: 外部联系人 {external_userid} 提取到手机号 {contact_phone} (来源: {extracted_phone_source})。备注: '{remark_text}'")
+                contact_data['_extracted_phone_for_sync'] = contact_phone
+                selected_contacts.append(contact_data)
+                continue
+
+            if debug_enabled:
+                logger.debug(f"HR {hr_userid}: 外部联系人 {external_userid} (备注: '{remark_text}') 未找到有效手机号 (检查了 profile.mobile, remark_mobiles, remark提取)，跳过同步。")
+        return selected_contacts
+
+    async def _sync_one_contact(self, hr_userid: str, contact_to_process: Dict[str, Any],
+                                phone_map: Dict[str, Any], sem: asyncio.Semaphore) -> Optional[Dict[str, str]]:
+        """
+        为单个外部联系人匹配DB候选人 (phone_map 为预先批量查出的 手机号 -> 候选人) 并更新 external_wecom_id。
+        匹配成功返回 None (随后由 _sync_page 批量打同步成功标签)，失败返回失败详情 (remark_or_name, external_id, reason)。
+        """
+        async with sem:
+            external_userid = (contact_to_process.get("external_contact") or _EMPTY).get("external_userid")
+            phone_to_match = contact_to_process.get('_extracted_phone_for_sync')
+            contact_remark = (contact_to_process.get("follow_info") or _EMPTY).get("remark", "无备注")
+
+            if not external_userid or not phone_to_match:
+                logger.warning(f"HR {hr_userid}: 联系人数据不完整，跳过。External ID: {external_userid}, Phone: {phone_to_match}")
+                return {
+                    'remark_or_name': contact_remark or external_userid,
+                    'external_id': external_userid or "N/A",
+                    'reason': '外部联系人ID或提取的手机号为空'
+                }
+
+            logger.debug(f"HR {hr_userid}: 尝试为外部联系人 {external_userid} (手机号: {phone_to_match}) 匹配DB候选人。")
+            candidate_in_db = phone_map.get(phone_to_match)
+
+            if candidate_in_db:
+                logger.info(f"HR {hr_userid}: 匹配成功！外部联系人 {external_userid} (手机: {phone_to_match}) -> DB候选人 {candidate_in_db.name} (ID: {candidate_in_db._id})。")
+
+                # 任务 3.5: 更新候选人记录 (如果企业微信的 external_userid 尚未记录)
+                # 假设 Candidate模型有一个字段如 external_wecom_id 来存储 external_userid
+                if not getattr(candidate_in_db, 'external_wecom_id', None) or candidate_in_db.external_wecom_id != external_userid:
+                    update_data = {"external_wecom_id": external_userid}
+                    # 如果企业微信备注中有更通用或更新的信息，也可以考虑更新DB中的某些字段
+                    # 例如：企业微信的 external_contact.name, external_contact.corp_name 等
+                    # remark_name = contact_to_process.get("external_contact", {}).get("name")
+                    # if remark_name and remark_name != candidate_in_db.name: # 简单的例子
+                    #     update_data["name_from_wecom_external"] = remark_name
+
+                    # 使用正确的 ID 字段 candidate_in_db._id
+                    updated_db_entry = await asyncio.get_running_loop().run_in_executor(
+                        self._db_executor,
+                        self.db_interface.update_candidate_by_id, 
+                        candidate_in_db._id,  # <--- 使用 _id
+                        update_data
+                    )
+                    if updated_db_entry:
+                        logger.info(f"HR {hr_userid}: 已更新DB中候选人 {candidate_in_db.name} (ID: {candidate_in_db._id}) 的 external_wecom_id 为 {external_userid}。")
+                    else:
+                        logger.error(f"HR {hr_userid}: 更新DB中候选人 {candidate_in_db.name} (ID: {candidate_in_db._id}) 的 external_wecom_id 失败。")
+                        # 即使更新失败，也可能继续尝试打标签，取决于策略
+
+                return None
+            else:
+                logger.info(f"HR {hr_userid}: 未在数据库中找到手机号为 {phone_to_match} (来自外部联系人 {external_userid}) 的候选人记录。")
+                return {
+                    "remark_or_name": contact_remark or external_userid,
+                    "external_id": external_userid,
+                    "reason": "DB中未找到匹配手机号"
+                }
+
+    async def _sync_page(self, hr_userid: str, selected_contacts: List[Dict[str, Any]],
+                         phone_map: Dict[str, Any], sem: asyncio.Semaphore) -> List[Optional[Dict[str, str]]]:
+        """
+        处理一页筛选后的联系人：并发匹配/更新DB，再为匹配成功的联系人批量打同步成功标签 (模块 4)。
+        返回与 selected_contacts 一一对应的结果 (None 表示同步成功，或失败详情 / 异常)。
+        """
+        results: List[Any] = await asyncio.gather(
+            *(self._sync_one_contact(hr_userid, contact_to_process, phone_map, sem) for contact_to_process in selected_contacts),
+            return_exceptions=True
+        )
+        matched_indexes = [i for i, result in enumerate(results) if result is None]
+        if not matched_indexes:
+            return results
+
+        # 模块 4: 调用企业微信API打标签
+        sync_tag = config_ew.TAG_ID_SYNC_SUCCESS
+        if not sync_tag:
+            logger.warning(f"HR {hr_userid}: 未配置 TAG_ID_SYNC_SUCCESS，跳过为 {len(matched_indexes)} 个匹配成功的外部联系人打标签。")
+        else:
+            # 本页匹配成功的联系人一起打标签，共用一个连接池并发调用 mark_tag
+            external_userids = [selected_contacts[i]["external_contact"]["external_userid"] for i in matched_indexes]
+            logger.debug(f"HR {hr_userid}: 尝试为 {len(external_userids)} 个外部联系人打上同步成功标签 {sync_tag}。操作者: {hr_userid}")
+            tag_results = await self.ew_service.mark_external_contact_tags_many(
+                operator_userid=hr_userid,
+                jobs=[(external_userid, [sync_tag]) for external_userid in external_userids],
+                max_connections=config_ew.SYNC_CONCURRENCY
+            )
+        for n, i in enumerate(matched_indexes):
+            contact_to_process = selected_contacts[i]
+            external_userid = contact_to_process["external_contact"]["external_userid"]
+            contact_remark = (contact_to_process.get("follow_info") or _EMPTY).get("remark", "无备注")
+            if not sync_tag:
+                # 如果不打标签，但匹配并更新了DB，是否算成功同步？取决于定义
+                # 假设这种情况不算完全的"同步成功并标记"
+                results[i] = {
+                    "remark_or_name": contact_remark or external_userid,
+                    "external_id": external_userid,
+                    "reason": "未配置成功标签ID"
+                }
+            elif tag_results[n]:
+                logger.info(f"HR {hr_userid}: 成功为外部联系人 {external_userid} 打上同步成功标签。")
+            else:
+                logger.error(f"HR {hr_userid}: 为外部联系人 {external_userid} 打同步成功标签失败。")
+                results[i] = {
+                    "remark_or_name": contact_remark or external_userid,
+                    "external_id": external_userid,
+                    "reason": "打标签失败"
+                }
+        return results
+
+    async def _fetch_contacts_page(self, hr_userid: str, cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+        """获取一页外部联系人数据。发出请求前经过令牌桶限流，防止频率超限。"""
+        wait = _page_rate_limiter.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        # 详细记录API调用前的参数
+        api_call_params = {
+            "userid_list": [hr_userid],
+            "cursor": cursor,
+            "limit": 100
+        }
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"HR {hr_userid}: 调用 batch_get_external_contacts API，参数: {api_call_params}")
+        return await self.ew_service.batch_get_external_contacts(
+            userid_list=[hr_userid], # batch_get_external_contacts 期望 userid_list
+            cursor=cursor,
+            limit=100 # API 最大限制
+        )
 
     async def run_sync_for_hr(self, hr_userid: str, triggered_by_manual_command: bool = False):
         logger.info(f"开始为 HR 用户 {hr_userid} 执行外部联系人同步。手动触发: {triggered_by_manual_command}")
         
-        all_external_contacts: List[Dict[str, Any]] = []
+        total_fetched_count = 0
         current_cursor: Optional[str] = None
         page_count = 0
         MAX_PAGES_TO_FETCH = 100 # 安全上限，防止无限循环
+        fetch_failed = False
 
-        try:
-            while page_count < MAX_PAGES_TO_FETCH:
-                page_count += 1
-                logger.info(f"HR {hr_userid}: 获取第 {page_count} 页外部联系人数据，cursor: {current_cursor}")
-                print(f"SYNC_PROCESSOR_DEBUG: Just after logger.info for page {page_count}") # <--- 新增 print
-                
-                # 详细记录API调用前的参数
-                api_call_params = {
-                    "userid_list": [hr_userid],
-                    "cursor": current_cursor,
-                    "limit": 100
-                }
-                print(f"SYNC_PROCESSOR_DEBUG: api_call_params prepared: {api_call_params}") # <--- 新增 print
-                logger.debug(f"HR {hr_userid}: 调用 batch_get_external_contacts API，参数: {api_call_params}")
-
-                response_data = await self.ew_service.batch_get_external_contacts(
-                    userid_list=[hr_userid], # batch_get_external_contacts 期望 userid_list
-                    cursor=current_cursor,
-                    limit=100 # API 最大限制
-                )
-
-                # 详细记录API的原始响应
-                logger.debug(f"HR {hr_userid}: batch_get_external_contacts API 原始响应: {response_data}")
-
-                if response_data and response_data.get("errcode") == 0:
-                    contacts_on_page = response_data.get("external_contact_list", [])
-                    # 记录当页获取的联系人数量和 next_cursor
-                    next_cursor_from_api = response_data.get("next_cursor")
-                    logger.info(f"HR {hr_userid}: 第 {page_count} 页API调用成功。获取联系人: {len(contacts_on_page)}。Next_cursor: '{next_cursor_from_api}'")
-                    
-                    if contacts_on_page:
-                        all_external_contacts.extend(contacts_on_page)
-                        logger.info(f"HR {hr_userid}: 第 {page_count} 页获取到 {len(contacts_on_page)} 个外部联系人。累计: {len(all_external_contacts)}")
-                    
-                    current_cursor = next_cursor_from_api # 更新 current_cursor
-                    if not current_cursor:
-                        logger.info(f"HR {hr_userid}: 已获取所有外部联系人数据 (API返回的 next_cursor 为空/None)。总计: {len(all_external_contacts)}")
-                        break 
-                else:
-                    logger.error(f"HR {hr_userid}: 获取外部联系人数据失败或API返回错误。响应: {response_data}")
-                    # 此处可以决定是否发送错误通知给用户
-                    if triggered_by_manual_command:
-                        await self.ew_service.send_text_message(
-                            content=f"为用户 {hr_userid} 获取外部联系人列表时出错，请检查日志或联系管理员。",
-                            user_ids=[hr_userid] # 假设 hr_userid 就是发起命令的用户
-                        )
-                    return # 提前退出同步过程
-                
-                await asyncio.sleep(0.2) # API 调用之间短暂延时，防止频率超限 (根据实际情况调整)
+        # 逐页流水线处理：分页获取 (生产者) 与筛选、DB匹配、打标签 (消费者) 通过有界队列衔接，
+        # 不再先把全部联系人收集到一个列表，第一页到达后即可开始处理
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        filtered_contacts_for_processing: List[Dict[str, Any]] = []
+        page_tasks: List[asyncio.Task] = []
+        # 已查询过的手机号 -> DB候选人 (跨页累积)；多个联系人共用同一手机号时只查询一次
+        phone_map: Dict[str, Any] = {}
+        looked_up_phones: set = set()
+        # 各联系人的 DB 匹配、更新与打标签互不依赖，并发执行以重叠网络/数据库等待时间；信号量限制同时在途的联系人数
+        sem = asyncio.Semaphore(config_ew.SYNC_CONCURRENCY)
 
-            if page_count >= MAX_PAGES_TO_FETCH:
-                logger.warning(f"HR {hr_userid}: 获取外部联系人数据达到最大页数限制 ({MAX_PAGES_TO_FETCH})，可能仍有数据未获取。")
+        async def fetch_pages():
+            """生产者：分页获取外部联系人，逐页放入队列，结束时放入 None。"""
+            nonlocal total_fetched_count, current_cursor, page_count, fetch_failed
+            # 流水线分页：拿到当前页的 next_cursor 后立即发出下一页请求，在其等待网络期间处理当前页
+            next_page_task: Optional[asyncio.Task] = asyncio.create_task(self._fetch_contacts_page(hr_userid, current_cursor))
+            put_sentinel = True
+            try:
+                while page_count < MAX_PAGES_TO_FETCH:
+                    page_count += 1
+                    logger.info(f"HR {hr_userid}: 获取第 {page_count} 页外部联系人数据，cursor: {current_cursor}")
 
-            logger.info(f"HR {hr_userid}: 共获取到 {len(all_external_contacts)} 个外部联系人进行处理。")
+                    response_data = await next_page_task
+                    next_page_task = None
 
-            # 任务 3.3: 筛选联系人
-            filtered_contacts_for_processing: List[Dict[str, Any]] = []
-            for contact_data in all_external_contacts:
-                external_contact_info = contact_data.get("external_contact", {})
-                follow_info = contact_data.get("follow_info", {})
+                    # 详细记录API的原始响应 (整页响应较大，仅在 DEBUG 级别启用时才格式化)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"HR {hr_userid}: batch_get_external_contacts API 原始响应: {response_data}")
 
-                external_userid = external_contact_info.get("external_userid")
-                if not external_userid:
-                    logger.debug(f"HR {hr_userid}: 跳过一个没有 external_userid 的联系人记录: {contact_data}")
-                    continue
+                    if response_data and response_data.get("errcode") == 0:
+                        contacts_on_page = response_data.get("external_contact_list", [])
+                        # 记录当页获取的联系人数量和 next_cursor
+                        next_cursor_from_api = response_data.get("next_cursor")
+                        if next_cursor_from_api and page_count < MAX_PAGES_TO_FETCH:
+                            # 先发出下一页请求 (经令牌桶限流，防止频率超限)，再处理当前页
+                            next_page_task = asyncio.create_task(
+                                self._fetch_contacts_page(hr_userid, next_cursor_from_api)
+                            )
+                        logger.info(f"HR {hr_userid}: 第 {page_count} 页API调用成功。获取联系人: {len(contacts_on_page)}。Next_cursor: '{next_cursor_from_api}'")
 
-                # 1. 检查是否已打成功同步标签
-                existing_tags = follow_info.get("tag_id", [])
-                if config_ew.TAG_ID_SYNC_SUCCESS and isinstance(existing_tags, list) and config_ew.TAG_ID_SYNC_SUCCESS in existing_tags:
-                    logger.debug(f"HR {hr_userid}: 外部联系人 {external_userid} 已有同步成功标签，跳过处理。")
-                    continue
+                        if contacts_on_page:
+                            total_fetched_count += len(contacts_on_page)
+                            logger.info(f"HR {hr_userid}: 第 {page_count} 页获取到 {len(contacts_on_page)} 个外部联系人。累计: {total_fetched_count}")
+                            await page_queue.put(contacts_on_page)
 
-                # 2. 提取手机号：优先顺序 external_contact.mobile -> follow_info.remark_mobiles[0] -> 从 follow_info.remark 提取
-                contact_phone: Optional[str] = None
-                extracted_phone_source = "未提取到"
-
-                # 尝试从 external_contact.mobile
-                mobile_from_profile = external_contact_info.get("mobile")
-                if mobile_from_profile and self.phone_regex.fullmatch(mobile_from_profile):
-                    contact_phone = mobile_from_profile
-                    extracted_phone_source = "external_contact.mobile"
-                
-                # 如果上面没有，尝试从 follow_info.remark_mobiles
-                if not contact_phone:
-                    remark_mobiles_list = follow_info.get("remark_mobiles")
-                    if remark_mobiles_list and isinstance(remark_mobiles_list, list) and len(remark_mobiles_list) > 0:
-                        first_remark_mobile = remark_mobiles_list[0]
-                        if first_remark_mobile and self.phone_regex.fullmatch(first_remark_mobile):
-                            contact_phone = first_remark_mobile
-                            extracted_phone_source = "follow_info.remark_mobiles[0]"
-
-                # 如果上面都没有，尝试从 follow_info.remark 提取
-                remark_text: Optional[str] = follow_info.get("remark") # remark_text 定义移到这里，避免重复获取
-                if not contact_phone:
-                    phone_from_remark_text = self._extract_phone_from_remark(remark_text)
-                    if phone_from_remark_text:
-                        contact_phone = phone_from_remark_text
-                        extracted_phone_source = "follow_info.remark (提取)"
-                
-                if contact_phone:
-                    logger.debug(f"HR {hr_userid}: 外部联系人 {external_userid} 提取到手机号 {contact_phone} (来源: {extracted_phone_source})。备注: '{remark_text}'")
-                    contact_data['_extracted_phone_for_sync'] = contact_phone
-                    filtered_contacts_for_processing.append(contact_data)
+                        current_cursor = next_cursor_from_api # 更新 current_cursor
+                        if not current_cursor:
+                            logger.info(f"HR {hr_userid}: 已获取所有外部联系人数据 (API返回的 next_cursor 为空/None)。总计: {total_fetched_count}")
+                            break
+                    else:
+                        logger.error(f"HR {hr_userid}: 获取外部联系人数据失败或API返回错误。响应: {response_data}")
+                        fetch_failed = True
+                        break
+            except asyncio.CancelledError:
+                # 仅在消费者已退出时才会被取消，此时无人读取队列，队列满时 put 会永久阻塞
+                put_sentinel = False
+                raise
+            finally:
+                # 提前退出或出错时，取消尚未使用的预取请求
+                if next_page_task is not None and not next_page_task.done():
+                    next_page_task.cancel()
+                if put_sentinel:
+                    await page_queue.put(None)
+
+        async def process_pages():
+            """消费者：逐页筛选联系人，批量匹配DB候选人后立即派发本页的处理任务。"""
+            while True:
+                contacts_on_page = await page_queue.get()
+                if contacts_on_page is None:
+                    break
+                selected_contacts = self._select_contacts_for_sync(hr_userid, contacts_on_page)
+                if not selected_contacts:
                     continue
-                
-                logger.debug(f"HR {hr_userid}: 外部联系人 {external_userid} (备注: '{remark_text}') 未找到有效手机号 (检查了 profile.mobile, remark_mobiles, remark提取)，跳过同步。")
+                filtered_contacts_for_processing.extend(selected_contacts)
+                # 一次 $in 查询取回本页待处理手机号对应的DB候选人，代替逐个联系人查询；
+                # 手机号先去重，并跳过之前页已查询过的手机号
+                phones_to_match = [
+                    phone for phone in dict.fromkeys(c['_extracted_phone_for_sync'] for c in selected_contacts)
+                    if phone not in looked_up_phones
+                ]
+                if phones_to_match:
+                    looked_up_phones.update(phones_to_match)
+                    phone_map.update(await asyncio.get_running_loop().run_in_executor(
+                        self._db_executor, self.db_interface.find_candidates_by_phones, phones_to_match, _SYNC_CANDIDATE_PROJECTION
+                    ))
+                page_tasks.append(asyncio.create_task(self._sync_page(hr_userid, selected_contacts, phone_map, sem)))
+
+        try:
+            producer = asyncio.create_task(fetch_pages())
+            try:
+                await process_pages()
+                await producer # 传播分页过程中的异常
+
+                # 已派发的联系人处理任务 (任务 3.4 匹配、3.5 更新、模块 4 打标签) 全部完成后再统计
+                results = [result for page_results in await asyncio.gather(*page_tasks) for result in page_results]
+            finally:
+                # 出错或被取消时，取消生产者及尚未完成的页处理任务，并等待它们结束
+                unfinished = [task for task in (producer, *page_tasks) if not task.done()]
+                for task in unfinished:
+                    task.cancel()
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+            if fetch_failed:
+                # 此处可以决定是否发送错误通知给用户
+                if triggered_by_manual_command:
+                    await self.ew_service.send_text_message(
+                        content=f"为用户 {hr_userid} 获取外部联系人列表时出错，请检查日志或联系管理员。",
+                        user_ids=[hr_userid] # 假设 hr_userid 就是发起命令的用户
+                    )
+                return # 提前退出同步过程
 
-            logger.info(f"HR {hr_userid}: 经过初步筛选 (有效手机号且未打同步成功标签)，有 {len(filtered_contacts_for_processing)} 个联系人需要进一步处理。")
+            if page_count >= MAX_PAGES_TO_FETCH:
+                logger.warning(f"HR {hr_userid}: 获取外部联系人数据达到最大页数限制 ({MAX_PAGES_TO_FETCH})，可能仍有数据未获取。")
+
+            logger.info(f"HR {hr_userid}: 共获取到 {total_fetched_count} 个外部联系人，经过初步筛选 (有效手机号且未打同步成功标签)，有 {len(filtered_contacts_for_processing)} 个联系人需要进一步处理。")
 
-            # 任务 3.4: 匹配数据库候选人记录
-            # 任务 3.5: 更新候选人记录 (如果需要)
-            # 模块 4: 调用企业微信API打标签
             # 模块 5: 准备并发送最终通知
             
             # 为模块5准备统计数据
@@ -154,108 +360,44 @@ class SyncProcessor:
             failed_to_sync_count = 0
             # 示例: failed_contacts_details = [{'remark': '张三备注', 'ext_id': 'ext_userid_123', 'reason': '未找到DB记录'}]
             failed_contacts_processing_details: List[Dict[str, str]] = []
+            FAILED_DETAILS_DISPLAY_LIMIT = 5 # 通知中最多展示的失败详情条数；只保留这么多条，其余只计数
 
-            for contact_to_process in filtered_contacts_for_processing:
-                external_userid = contact_to_process.get("external_contact", {}).get("external_userid")
-                phone_to_match = contact_to_process.get('_extracted_phone_for_sync')
-                contact_remark = contact_to_process.get("follow_info", {}).get("remark", "无备注")
-
-                if not external_userid or not phone_to_match:
-                    logger.warning(f"HR {hr_userid}: 联系人数据不完整，跳过。External ID: {external_userid}, Phone: {phone_to_match}")
-                    failed_to_sync_count += 1
-                    failed_contacts_processing_details.append({
-                        'remark_or_name': contact_remark or external_userid,
-                        'external_id': external_userid or "N/A",
-                        'reason': '外部联系人ID或提取的手机号为空'
-                    })
+            for contact_to_process, result in zip(filtered_contacts_for_processing, results):
+                if result is None:
+                    successfully_synced_count += 1
                     continue
-
-                logger.debug(f"HR {hr_userid}: 尝试为外部联系人 {external_userid} (手机号: {phone_to_match}) 匹配DB候选人。")
-                candidate_in_db = await asyncio.to_thread(self.db_interface.find_candidate_by_phone, phone_to_match)
-
-                if candidate_in_db:
-                    logger.info(f"HR {hr_userid}: 匹配成功！外部联系人 {external_userid} (手机: {phone_to_match}) -> DB候选人 {candidate_in_db.name} (ID: {candidate_in_db._id})。")
-                    
-                    # 任务 3.5: 更新候选人记录 (如果企业微信的 external_userid 尚未记录)
-                    # 假设 Candidate模型有一个字段如 external_wecom_id 来存储 external_userid
-                    if not getattr(candidate_in_db, 'external_wecom_id', None) or candidate_in_db.external_wecom_id != external_userid:
-                        update_data = {"external_wecom_id": external_userid}
-                        # 如果企业微信备注中有更通用或更新的信息，也可以考虑更新DB中的某些字段
-                        # 例如：企业微信的 external_contact.name, external_contact.corp_name 等
-                        # remark_name = contact_to_process.get("external_contact", {}).get("name")
-                        # if remark_name and remark_name != candidate_in_db.name: # 简单的例子
-                        #     update_data["name_from_wecom_external"] = remark_name
-                        
-                        # 使用正确的 ID 字段 candidate_in_db._id
-                        updated_db_entry = await asyncio.to_thread(
-                            self.db_interface.update_candidate_by_id, 
-                            candidate_in_db._id,  # <--- 使用 _id
-                            update_data
-                        )
-                        if updated_db_entry:
-                            logger.info(f"HR {hr_userid}: 已更新DB中候选人 {candidate_in_db.name} (ID: {candidate_in_db._id}) 的 external_wecom_id 为 {external_userid}。")
-                        else:
-                            logger.error(f"HR {hr_userid}: 更新DB中候选人 {candidate_in_db.name} (ID: {candidate_in_db._id}) 的 external_wecom_id 失败。")
-                            # 即使更新失败，也可能继续尝试打标签，取决于策略
-                    
-                    # 模块 4: 调用企业微信API打标签
-                    if config_ew.TAG_ID_SYNC_SUCCESS:
-                        logger.debug(f"HR {hr_userid}: 尝试为外部联系人 {external_userid} 打上同步成功标签 {config_ew.TAG_ID_SYNC_SUCCESS}。操作者: {hr_userid}")
-                        tag_added = await self.ew_service.mark_external_contact_tags(
-                            operator_userid=hr_userid, 
-                            external_userid=external_userid, 
-                            add_tag_ids=[config_ew.TAG_ID_SYNC_SUCCESS]
-                        )
-                        if tag_added:
-                            logger.info(f"HR {hr_userid}: 成功为外部联系人 {external_userid} 打上同步成功标签。")
-                            successfully_synced_count += 1
-                        else:
-                            logger.error(f"HR {hr_userid}: 为外部联系人 {external_userid} 打同步成功标签失败。")
-                            failed_to_sync_count += 1
-                            failed_contacts_processing_details.append({
-                                "remark_or_name": contact_remark or external_userid,
-                                "external_id": external_userid,
-                                "reason": "打标签失败"
-                            })
-                    else:
-                        logger.warning(f"HR {hr_userid}: 未配置 TAG_ID_SYNC_SUCCESS，跳过为 {external_userid} 打标签。")
-                        # 如果不打标签，但匹配并更新了DB，是否算成功同步？取决于定义
-                        # 假设这种情况不算完全的"同步成功并标记"
-                        failed_to_sync_count += 1 # 或者定义一个新的计数器
-                        failed_contacts_processing_details.append({
-                            "remark_or_name": contact_remark or external_userid,
-                            "external_id": external_userid,
-                            "reason": "未配置成功标签ID"
-                        })
-                else:
-                    logger.info(f"HR {hr_userid}: 未在数据库中找到手机号为 {phone_to_match} (来自外部联系人 {external_userid}) 的候选人记录。")
-                    failed_to_sync_count += 1
-                    failed_contacts_processing_details.append({
-                        "remark_or_name": contact_remark or external_userid,
-                        "external_id": external_userid,
-                        "reason": "DB中未找到匹配手机号"
-                    })
-
-                await asyncio.sleep(0.1) # 每个联系人处理之间短暂延时
+                failed_to_sync_count += 1
+                if isinstance(result, Exception):
+                    external_userid = (contact_to_process.get("external_contact") or _EMPTY).get("external_userid")
+                    logger.error(f"HR {hr_userid}: 处理外部联系人 {external_userid} 时发生异常: {result}")
+                    if len(failed_contacts_processing_details) >= FAILED_DETAILS_DISPLAY_LIMIT:
+                        continue
+                    result = {
+                        "remark_or_name": (contact_to_process.get("follow_info") or _EMPTY).get("remark") or external_userid or "N/A",
+                        "external_id": external_userid or "N/A",
+                        "reason": "处理过程中发生异常"
+                    }
+                if len(failed_contacts_processing_details) < FAILED_DETAILS_DISPLAY_LIMIT:
+                    failed_contacts_processing_details.append(result)
 
             logger.info(f"HR {hr_userid}: 外部联系人与DB匹配处理完成。成功同步数: {successfully_synced_count}, 失败数: {failed_to_sync_count}")
 
             # 模块 5: 准备并发送最终通知
             total_checked_for_processing = len(filtered_contacts_for_processing)
             completion_message = f"""HR 用户 {hr_userid} 的外部联系人同步任务已完成。
-总共获取外部联系人数: {len(all_external_contacts)}。
+总共获取外部联系人数: {total_fetched_count}。
 筛选后待处理数 (有手机号且未标记): {total_checked_for_processing}。
 成功同步并标记数: {successfully_synced_count}。
 处理失败或未匹配数: {failed_to_sync_count}。"""
             if failed_to_sync_count > 0 and failed_contacts_processing_details:
                 # 正确的 f-string 格式化，确保括号和引号正确配对和转义
                 details_strings = []
-                for item in failed_contacts_processing_details[:5]:
+                for item in failed_contacts_processing_details:
                     details_strings.append(f" - \"{item['remark_or_name']}\" (ID: {item['external_id']}): {item['reason']}")
-                failed_list_str = "\n失败/未匹配详情 (最多显示5条):\n" + "\n".join(details_strings)
+                failed_list_str = f"\n失败/未匹配详情 (最多显示{FAILED_DETAILS_DISPLAY_LIMIT}条):\n" + "\n".join(details_strings)
                 completion_message += failed_list_str
-                if len(failed_contacts_processing_details) > 5:
-                    completion_message += f"\n  ...等另外 {len(failed_contacts_processing_details) - 5} 条记录。"
+                if failed_to_sync_count > len(failed_contacts_processing_details):
+                    completion_message += f"\n  ...等另外 {failed_to_sync_count - len(failed_contacts_processing_details)} 条记录。"
             elif total_checked_for_processing > 0 and successfully_synced_count == total_checked_for_processing:
                 completion_message += "所有符合条件的联系人均已成功同步并标记。"
             elif total_checked_for_processing == 0:
@@ -1,14 +1,47 @@
 import logging
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any
-import os
+from typing import Dict, Any, List, Optional, Tuple
 
 from src.db_interface import db_interface # Import the instance
 from src.models.candidate import Candidate # Assuming Candidate model is needed for type hinting or validation
 
 logger = logging.getLogger(__name__)
 
+_DESIGN_CATEGORIES = ("建筑设计", "电气设计", "给排水设计")
+
+def _build_query_tags(candidate_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    根据候选人数据生成 query_tags (纯函数，不修改输入)。
+    在已有 query_tags 的基础上补充职位/技能/经验占位标签，并设置设计类别与学历标签。
+    """
+    query_tags = dict(candidate_data.get('query_tags') or {})
+    ei = candidate_data.get('extracted_info') or {}
+    experience = ei.get('experience') or ()
+
+    # Add/Update query tags (this logic might be better placed in validator_standardizer)
+    # --- Placeholder: Actual tag generation logic should be implemented ---
+    # Example based on first found job title and skills
+    if not query_tags.get('positions') and experience:
+        first_title = experience[0].get('title')
+        if first_title:
+            query_tags['positions'] = [first_title] # Simple tagging
+    if not query_tags.get('skills_normalized') and ei.get('skills'):
+        query_tags['skills_normalized'] = [s.lower() for s in ei['skills'] if isinstance(s, str)]
+    # Example: calculate min experience (very basic, needs refinement)
+    # This needs a proper date parsing library and logic; placeholder value when experience exists
+    if not query_tags.get('min_experience_years') and experience:
+        query_tags['min_experience_years'] = 1 # Placeholder
+    # --- End Placeholder ---
+
+    # 1. 设计类别 (从顶级获取)；不是预设的三个类别或为 null 时设置为 null，以便查询时可以区分未分类和特定分类
+    design_category = candidate_data.get('design_category')
+    query_tags['design_category'] = design_category if design_category in _DESIGN_CATEGORIES else None
+
+    # 2. 学历标签 (从 extracted_info.education 提取并标准化)
+    query_tags['degrees'] = list({edu['degree'].lower() for edu in ei.get('education') or () if edu.get('degree')})
+    return query_tags
+
 class DbUpdater:
     """Handles updating the candidate database with processed resume information."""
 
@@ -24,61 +57,22 @@ class DbUpdater:
             logger.critical("DbUpdater initialized but database is not connected!")
             # Decide handling: raise error or allow continuation with failures
 
-    def upsert_candidate(self, candidate_data: Dict[str, Any], processed_pdf_path: Path) -> bool:
+    def _build_candidate_doc(self, candidate_data: Dict[str, Any], processed_pdf_path: Path) -> Optional[Dict[str, Any]]:
         """
-        Updates or inserts a candidate record in the database based on extracted data.
-
-        Uses 'name' and 'phone' as the primary keys for the upsert operation.
-
-        Args:
-            candidate_data: Dictionary containing extracted info (should have name, phone).
-            processed_pdf_path: The final path of the processed resume PDF file
-                                  in the 'processed_resumes' directory.
+        Builds the MongoDB document (including query_tags) for one processed resume.
 
         Returns:
-            True if the upsert operation was successful, False otherwise.
+            The document to upsert, or None if name or phone is missing.
         """
-        if not self.db_interface.is_connected():
-            logger.error("Database not connected, cannot upsert candidate.")
-            return False
-
         # Ensure essential keys are present (could be done in validator too)
         name = candidate_data.get('name')
         phone = candidate_data.get('phone')
         if not name or not phone:
             logger.error(f"Cannot upsert candidate due to missing name ('{name}') or phone ('{phone}'). Data: {candidate_data}")
-            return False
-
-        # Add/Update the resume path
-        candidate_data['resume_pdf_path'] = str(processed_pdf_path)
+            return None
 
         # Add/Update query tags (this logic might be better placed in validator_standardizer)
-        # Example: simple position and skill tagging
-        query_tags = candidate_data.get('query_tags', {})
-        # --- Placeholder: Actual tag generation logic should be implemented --- 
-        # Example based on first found job title and skills
-        if not query_tags.get('positions') and candidate_data.get('extracted_info', {}).get('experience'):
-             first_exp = candidate_data['extracted_info']['experience'][0]
-             if first_exp.get('title'):
-                 query_tags['positions'] = [first_exp['title']] # Simple tagging
-        if not query_tags.get('skills_normalized') and candidate_data.get('extracted_info', {}).get('skills'):
-             query_tags['skills_normalized'] = [s.lower() for s in candidate_data['extracted_info']['skills'] if isinstance(s, str)]
-        # Example: calculate min experience (very basic, needs refinement)
-        if not query_tags.get('min_experience_years') and candidate_data.get('extracted_info', {}).get('experience'):
-             try:
-                 total_years = 0
-                 # Very naive calculation: sum durations assuming YYYY-MM format or YYYY
-                 # This needs a proper date parsing library and logic
-                 # for exp in candidate_data['extracted_info']['experience']:
-                 #     start = exp.get('start_date')
-                 #     end = exp.get('end_date')
-                 #     # ... complex date diff logic ...
-                 # Placeholder: use a fixed value or leave null if complex logic not implemented
-                 if len(candidate_data['extracted_info']['experience']) > 0:
-                      query_tags['min_experience_years'] = 1 # Placeholder
-             except Exception as e:
-                 logger.warning(f"Failed to calculate min_experience_years: {e}")
-        # --- End Placeholder ---
+        query_tags = _build_query_tags(candidate_data)
         candidate_data['query_tags'] = query_tags
 
         # 构建要插入/更新到 MongoDB 的文档
@@ -90,33 +84,39 @@ class DbUpdater:
             # "email": parsed_data.get("email"),
             **candidate_data, # 直接解包 LLM 返回的字典，因为它的结构就是我们想要的
             "resume_pdf_path": str(processed_pdf_path), # 添加处理后的 PDF 路径 (转换为字符串)
-            "last_processed_time": datetime.utcnow(),
-            "source_file_original_name": os.path.basename(str(processed_pdf_path)) # 保留原始文件名 (转换为字符串)
+            "last_processed_time": datetime.now(timezone.utc),
+            "source_file_original_name": processed_pdf_path.name # 保留原始文件名 (Path.name，无需先转字符串)
         }
         
-        # 确保 query_tags 存在 (即使为空)
-        if 'query_tags' not in candidate_doc or not isinstance(candidate_doc['query_tags'], dict):
-            candidate_doc['query_tags'] = {}
-            
-        # --- 新增：准备 query_tags --- 
-        # 1. 设计类别 (从 parsed_data 的顶级获取)
-        design_category = candidate_data.get('design_category')
-        if design_category in ["建筑设计", "电气设计", "给排水设计"]:
-            candidate_doc['query_tags']['design_category'] = design_category
-        else:
-            # 如果不是预设的三个类别或为 null，则在 query_tags 中也设为 null 或不设置
-            # 这里选择设置为 null，以便查询时可以区分未分类和特定分类
-            candidate_doc['query_tags']['design_category'] = None
+        return candidate_doc
 
-        # 2. 学历标签 (从 extracted_info.education 提取并标准化)
-        degrees = set()
-        if candidate_data.get('extracted_info', {}).get('education'):
-            for edu in candidate_data['extracted_info']['education']:
-                if edu.get('degree'):
-                    degrees.add(edu['degree'].lower())
-        candidate_doc['query_tags']['degrees'] = list(degrees)
+    def upsert_candidate(self, candidate_data: Dict[str, Any], processed_pdf_path: Path) -> bool:
+        """
+        Updates or inserts a candidate record in the database based on extracted data.
 
-        logger.debug(f"Attempting to upsert candidate '{name}' with data: {candidate_doc}")
+        Uses 'name' and 'phone' as the primary keys for the upsert operation.
+
+        Args:
+            candidate_data: Dictionary containing extracted info (should have name, phone).
+            processed_pdf_path: The final path of the processed resume PDF file
+                                  in the 'processed_resumes' directory.
+
+        Returns:
+            True if the upsert operation was successful, False otherwise.
+        """
+        if not self.db_interface.is_connected():
+            logger.error("Database not connected, cannot upsert candidate.")
+            return False
+
+        candidate_doc = self._build_candidate_doc(candidate_data, processed_pdf_path)
+        if candidate_doc is None:
+            return False
+        name = candidate_doc['name']
+        phone = candidate_doc['phone']
+
+        # Formatting the whole document is expensive; only do it when DEBUG is actually enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Attempting to upsert candidate '{name}' with data: {candidate_doc}")
 
         # Call the db_interface method
         success = self.db_interface.upsert_candidate(candidate_doc)
@@ -128,6 +128,40 @@ class DbUpdater:
 
         return success
 
+    def upsert_candidates_bulk(self, items: List[Tuple[Dict[str, Any], Path]]) -> List[bool]:
+        """
+        Bulk version of upsert_candidate for the resume pipeline: one bulk_write per batch
+        instead of one round-trip per resume.
+
+        Args:
+            items: (candidate_data, processed_pdf_path) pairs. (name, phone) must be unique within the batch.
+
+        Returns:
+            Per-item success flags, in input order.
+        """
+        if not self.db_interface.is_connected():
+            logger.error("Database not connected, cannot upsert candidates.")
+            return [False] * len(items)
+
+        results = [False] * len(items)
+        docs: List[Dict[str, Any]] = []
+        doc_positions: List[int] = []
+        for pos, (candidate_data, processed_pdf_path) in enumerate(items):
+            try:
+                candidate_doc = self._build_candidate_doc(candidate_data, processed_pdf_path)
+            except Exception as e:
+                # 单条数据异常不影响同批其他简历
+                logger.error(f"Failed to build database document for '{candidate_data.get('name')}': {e}", exc_info=True)
+                continue
+            if candidate_doc is not None:
+                docs.append(candidate_doc)
+                doc_positions.append(pos)
+
+        for pos, success in zip(doc_positions, self.db_interface.bulk_upsert_candidates(docs)):
+            results[pos] = success
+        logger.info(f"Bulk upserted {sum(results)}/{len(items)} candidates into database.")
+        return results
+
 # Example Usage (for testing or integration)
 if __name__ == '__main__':
     # This requires a running MongoDB instance and the db_interface to be connectable
@@ -17,6 +17,10 @@ class FileManager:
 
         # Ensure target directories exist
         self._ensure_dirs_exist()
+        # 目标目录所在设备号：源文件与目标目录在同一设备时，移动只需一次 rename，无需 shutil.move 的额外 stat / 复制回退
+        self._dir_devices = {d: d.stat().st_dev for d in (self.processed_dir, self.error_dir, self.pending_dir)}
+        # (目录, 文件名主干) -> 下一个候选的冲突后缀序号，同名文件反复移入时不必从 1 开始逐个尝试
+        self._next_suffix: dict[tuple[Path, str], int] = {}
 
     def _ensure_dirs_exist(self):
         """Create the target directories if they don't exist."""
@@ -29,6 +33,56 @@ class FileManager:
             logger.error(f"Error creating directories: {e}", exc_info=True)
             raise  # Re-raise the exception as this is critical
 
+    def _same_device(self, src: Path, target_dir: Path) -> bool:
+        """Returns True if src is on the same device as the (cached) target directory."""
+        try:
+            return src.stat().st_dev == self._dir_devices.get(target_dir)
+        except OSError:
+            return False
+
+    def _fast_move(self, src: Path, dst: Path):
+        """Moves src to dst (overwriting), using a single os.replace when both are on the same device."""
+        if self._same_device(src, dst.parent):
+            os.replace(src, dst)
+        else:
+            # Use shutil.move for cross-filesystem compatibility
+            shutil.move(str(src), str(dst))
+
+    def _move_without_overwrite(self, src: Path, target_dir: Path, tag: str) -> Path:
+        """
+        Moves src into target_dir keeping its name, adding a '_{tag}_{n}' suffix if the name is taken.
+
+        On the same device the target name is claimed with os.link, which fails atomically if the name
+        already exists, so no exists() check is needed per candidate name; otherwise falls back to
+        probing with exists() and shutil.move.
+        """
+        base_name = src.stem
+        suffix = src.suffix
+        key = (target_dir, base_name)
+        counter = self._next_suffix.get(key, 0)
+        same_device = self._same_device(src, target_dir)
+        while True:
+            name = f"{base_name}{suffix}" if counter == 0 else f"{base_name}_{tag}_{counter}{suffix}"
+            target_path = target_dir / name
+            counter += 1
+            if same_device:
+                try:
+                    os.link(src, target_path)
+                except FileExistsError:
+                    continue
+                except OSError:
+                    # 文件系统不支持硬链接等情况，改用下面的通用方式
+                    same_device = False
+                    counter -= 1
+                    continue
+                os.unlink(src)
+                break
+            if not target_path.exists():
+                shutil.move(str(src), str(target_path))
+                break
+        self._next_suffix[key] = counter
+        return target_path
+
     def move_to_processed(self, original_path: Path, standardized_filename: str) -> Path | None:
         """
         Moves the file to the processed directory with the standardized filename.
@@ -42,8 +96,7 @@ class FileManager:
         """
         target_path = self.processed_dir / standardized_filename
         try:
-            # Use shutil.move for cross-filesystem compatibility if needed
-            shutil.move(str(original_path), str(target_path))
+            self._fast_move(original_path, target_path)
             logger.info(f"Successfully moved '{original_path}' to '{target_path}'")
             return target_path
         except (OSError, shutil.Error) as e:
@@ -61,17 +114,9 @@ class FileManager:
         Returns:
             The new path in the error directory if successful, None otherwise.
         """
-        target_path = self.error_dir / original_path.name
         try:
             # Avoid overwriting existing error files with the same name by adding a suffix if necessary
-            counter = 1
-            base_name = target_path.stem
-            suffix = target_path.suffix
-            while target_path.exists():
-                target_path = self.error_dir / f"{base_name}_err_{counter}{suffix}"
-                counter += 1
-
-            shutil.move(str(original_path), str(target_path))
+            target_path = self._move_without_overwrite(original_path, self.error_dir, "err")
             logger.warning(f"Moved '{original_path}' to error directory '{target_path}' due to: {reason}")
             return target_path
         except (OSError, shutil.Error) as e:
@@ -89,17 +134,9 @@ class FileManager:
         Returns:
             The new path in the pending directory if successful, None otherwise.
         """
-        target_path = self.pending_dir / original_path.name
         try:
             # Avoid overwriting existing pending files with the same name
-            counter = 1
-            base_name = target_path.stem
-            suffix = target_path.suffix
-            while target_path.exists():
-                target_path = self.pending_dir / f"{base_name}_pend_{counter}{suffix}"
-                counter += 1
-
-            shutil.move(str(original_path), str(target_path))
+            target_path = self._move_without_overwrite(original_path, self.pending_dir, "pend")
             logger.warning(f"Moved '{original_path}' to pending directory '{target_path}' for manual review due to: {reason}")
             return target_path
         except (OSError, shutil.Error) as e:
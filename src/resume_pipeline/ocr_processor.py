@@ -1,11 +1,13 @@
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 import os
 from typing import Optional
 import io
 from pathlib import Path
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from ..logger import logger
 from ..config import get_ocr_config # Import the getter
@@ -40,6 +42,25 @@ from ..config import get_ocr_config # Import the getter
 #     logger.error(f"检查 Poppler 配置时出错: {e}")
 # -----------------------------------------------------
 
+def _ocr_one_page(pdf_path: str, page_no: int, dpi: int, poppler_path: Optional[str], lang: str, output_folder: str) -> str:
+    """
+    渲染并识别单页：pdf2image 只把这一页写到临时目录，Tesseract 直接读取图片文件 (不经过 PIL 对象)，
+    识别后立即删除图片，因此同时存在的页面图片数不超过并行数。
+    pdf2image 按前缀从输出目录收集图片 (所有页共用同一临时目录)，文件名前缀定长补零并以 '_' 结尾，
+    保证任一页的前缀都不是其他页文件名的前缀 (如 "page1" 会误匹配 "page10-10.ppm")。
+    """
+    image_paths = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path,
+                                    first_page=page_no, last_page=page_no,
+                                    output_folder=output_folder, output_file=f"p{page_no:05d}_", paths_only=True)
+    try:
+        return "".join(pytesseract.image_to_string(image_path, lang=lang) for image_path in image_paths)
+    finally:
+        for image_path in image_paths:
+            try:
+                os.remove(image_path)
+            except OSError:
+                pass
+
 class OcrProcessor:
     """Handles OCR processing for PDF files using Tesseract and pdf2image."""
     def __init__(self):
@@ -48,8 +69,15 @@ class OcrProcessor:
         self.poppler_path = ocr_config.get('poppler_path') # Get poppler_path from config
         self.ocr_languages = ocr_config.get('ocr_languages', 'chi_sim+eng')
         self.ocr_dpi = ocr_config.get('ocr_dpi', 300)
+        # 各页 OCR 互不依赖，并行处理的页数 (默认 CPU 核数)
+        self.ocr_workers = ocr_config.get('ocr_workers') or os.cpu_count() or 1
         
+        self._available: Optional[bool] = None # is_available() 的缓存结果
         self._configure_tesseract()
+        # pytesseract 每页启动一个 tesseract 子进程，线程只负责等待子进程，GIL 不构成瓶颈；线程池随实例复用
+        # 限制每个 tesseract 进程的 OpenMP 线程数为 1，避免多页并行时与自身的多线程争抢 CPU
+        os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+        self._ocr_executor = ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix="ocr")
         
     def _configure_tesseract(self):
         """Configures the pytesseract command path if provided in config."""
@@ -71,7 +99,13 @@ class OcrProcessor:
                  logger.error("检查 Tesseract 版本时出错: %s", e)
 
     def is_available(self) -> bool:
-        """Checks if Tesseract seems to be configured and available."""
+        """Checks if Tesseract seems to be configured and available. (结果缓存在实例上，避免每次都启动 tesseract --version)"""
+        if self._available is None:
+            self._available = self._check_available()
+        return self._available
+
+    def _check_available(self) -> bool:
+        """实际检查 Tesseract 是否可用。"""
         try:
             # A simple check by getting the version string
             pytesseract.get_tesseract_version()
@@ -87,7 +121,7 @@ class OcrProcessor:
     def ocr_pdf(self, pdf_path: str) -> Optional[str]:
         """
         Performs OCR on a PDF file to extract text.
-        Converts PDF pages to images and then uses Tesseract.
+        Renders PDF pages to image files one page at a time and OCRs them with Tesseract in parallel.
 
         Args:
             pdf_path (str): Absolute path to the PDF file.
@@ -102,48 +136,57 @@ class OcrProcessor:
             return None
             
         extracted_text = io.StringIO()
-        images = []
         try:
             # Use configured poppler_path if available
             poppler_info = self.poppler_path or '从 PATH 查找'
-            logger.debug("尝试使用 pdf2image 将 PDF 转换为图片 (DPI: %s, Poppler: %s)...", self.ocr_dpi, poppler_info)
-            images = convert_from_path(pdf_path, dpi=self.ocr_dpi, poppler_path=self.poppler_path)
-            logger.debug("成功将 PDF 转换为 %s 张图片。", len(images))
+            page_total = int(pdfinfo_from_path(pdf_path, poppler_path=self.poppler_path).get("Pages", 0))
+            logger.debug("PDF 共 %s 页，将逐页渲染为图片 (DPI: %s, Poppler: %s)...", page_total, self.ocr_dpi, poppler_info)
 
         except Exception as e:
-            logger.error("使用 pdf2image 转换 PDF 时失败: %s。错误: %s", pdf_path, e, exc_info=True)
+            logger.error("使用 pdf2image 读取 PDF 信息时失败: %s。错误: %s", pdf_path, e, exc_info=True)
             poppler_path_msg = self.poppler_path or ''
             logger.error("请确保 Poppler 已安装并配置在系统 PATH 或 config.yaml 的 ocr.poppler_path ('%s') 中。", poppler_path_msg)
             return None
             
-        if not images:
-             logger.warning("pdf2image 未能从 %s 转换出任何图片。", pdf_path)
+        if not page_total:
+             logger.warning("pdf2image 未能从 %s 读取到任何页面。", pdf_path)
              return None
 
-        logger.debug("开始使用 Tesseract 对 %s 张图片进行 OCR (语言: %s)...", len(images), self.ocr_languages)
+        logger.debug("开始使用 Tesseract 对 %s 页进行 OCR (语言: %s, 并行数: %s)...", page_total, self.ocr_languages, self.ocr_workers)
         page_count = 0
-        try:
-            for i, image in enumerate(images):
-                page_count = i + 1
-                logger.debug("处理第 %s 页图片...", page_count)
-                # Use configured languages
-                page_text = pytesseract.image_to_string(image, lang=self.ocr_languages)
-                if page_text:
-                    extracted_text.write(page_text)
-                    extracted_text.write("\n--- OCR Page Break ---\n")
-                logger.debug("第 %s 页 OCR 完成。", page_count)
-                image.close()
-                
-        except pytesseract.TesseractNotFoundError:
-            tesseract_cmd_path = pytesseract.pytesseract.tesseract_cmd
-            logger.critical("Tesseract 未安装或未在系统 PATH ('%s') 找到！请安装 Tesseract 并配置路径。", tesseract_cmd_path)
-            return None
-        except Exception as e:
-            logger.error("执行 Tesseract OCR 时出错 (在第 %s 页): %s。错误: %s", page_count, pdf_path, e, exc_info=True)
-        finally:
-             for img in images: 
-                 try: img.close() 
-                 except: pass
+        # 渲染与识别按页流水线并行：每个任务渲染一页到临时目录后立即识别 (Use configured languages)，
+        # 不再先把整份 PDF 的页面图片全部载入内存；按页码顺序收集结果
+        with tempfile.TemporaryDirectory(prefix="ocr_") as tmp_dir:
+            futures = [
+                self._ocr_executor.submit(_ocr_one_page, pdf_path, page_no, self.ocr_dpi, self.poppler_path,
+                                          self.ocr_languages, tmp_dir)
+                for page_no in range(1, page_total + 1)
+            ]
+            try:
+                for i, future in enumerate(futures):
+                    page_count = i + 1
+                    page_text = future.result()
+                    if page_text:
+                        extracted_text.write(page_text)
+                        extracted_text.write("\n--- OCR Page Break ---\n")
+                    logger.debug("第 %s 页 OCR 完成。", page_count)
+
+            except pytesseract.TesseractNotFoundError:
+                tesseract_cmd_path = pytesseract.pytesseract.tesseract_cmd
+                logger.critical("Tesseract 未安装或未在系统 PATH ('%s') 找到！请安装 Tesseract 并配置路径。", tesseract_cmd_path)
+                return None
+            except Exception as e:
+                logger.error("执行 OCR 时出错 (在第 %s 页): %s。错误: %s", page_count, pdf_path, e, exc_info=True)
+            finally:
+                # 出错提前退出时，取消尚未开始的页面，并等待已开始的页面结束后再删除临时目录
+                for future in futures:
+                    future.cancel()
+                for future in futures:
+                    if not future.cancelled():
+                        try:
+                            future.exception()
+                        except Exception:
+                            pass
 
         ocr_result = extracted_text.getvalue()
         extracted_text.close()
@@ -1,4 +1,5 @@
 from typing import Optional, Dict, Any
+import functools
 import os # Import os for path operations in __main__
 
 from ..logger import logger
@@ -9,10 +10,11 @@ from .ocr_processor import OcrProcessor # Import the class
 # 控制是否启用 OCR 作为备选 (可以从配置读取，暂时硬编码为 True)
 ENABLE_OCR_FALLBACK = True
 
-# Create a single OcrProcessor instance for the module?
-# Or create it inside the function if config might change?
-# Let's create it inside for now, assuming config is loaded once.
-# ocr_processor_instance = OcrProcessor()
+# 模块级共用一个 OcrProcessor (首次需要 OCR 时才创建)：其初始化会读取配置并启动 tesseract 子进程检查版本，
+# 逐份简历重复创建开销明显；配置只在启动时加载一次，共用实例不影响行为
+@functools.lru_cache(maxsize=1)
+def _get_ocr() -> OcrProcessor:
+    return OcrProcessor()
 
 def parse_resume_pdf(pdf_path: str) -> Optional[Dict[str, Any]]:
     """
@@ -36,8 +38,7 @@ def parse_resume_pdf(pdf_path: str) -> Optional[Dict[str, Any]]:
         logger.warning(f"直接文本提取失败或为空，文件: {pdf_path}。")
         if ENABLE_OCR_FALLBACK:
             logger.info(f"尝试使用 OCR 提取文本: {pdf_path}")
-            # Instantiate OcrProcessor here or use a module-level instance
-            ocr_processor_instance = OcrProcessor()
+            ocr_processor_instance = _get_ocr()
             if not ocr_processor_instance.is_available():
                 logger.error(f"OCR processor is not available (Tesseract/Poppler configured?). Skipping OCR for {pdf_path}")
                 return None
@@ -60,34 +61,17 @@ def parse_resume_pdf(pdf_path: str) -> Optional[Dict[str, Any]]:
         return None
         
     logger.info(f"成功获取简历文本 (长度: {len(extracted_text)})，准备调用 LLM 解析: {pdf_path}")
-    # Corrected call based on llm_client.py inspection
-    parsed_data_str = None
+    # llm_client.parse_resume 已完成 JSON 解析 (含 markdown 代码块清理) 与姓名/手机号校验，直接返回字典，无需再次 json.loads
     try:
-        parsed_data_str = llm_client.parse_resume(extracted_text) 
+        parsed_data = llm_client.parse_resume(extracted_text)
     except Exception as e:
         # Catch potential exceptions during the LLM call itself
         logger.error(f"调用 LLM 解析简历时发生异常: {e}. 文件: {pdf_path}", exc_info=True)
         return None # Return None if LLM call fails with exception
 
-    if parsed_data_str is None:
-        logger.error(f"LLM 简历解析失败 (返回 None): {pdf_path}")
+    if parsed_data is None:
+        logger.error(f"LLM 简历解析失败或结果缺少关键信息 (姓名或手机号): {pdf_path}")
         return None
-    if not parsed_data_str.strip():
-        logger.error(f"LLM 简历解析失败 (返回空字符串): {pdf_path}")
-        return None
-
-    # Parse the JSON string returned by LLM
-    try:
-        import json
-        parsed_data = json.loads(parsed_data_str)
-    except json.JSONDecodeError as e:
-        logger.error(f"解析 LLM 返回的 JSON 时出错: {e}. LLM 返回: {parsed_data_str[:500]}... 文件: {pdf_path}")
-        return None
-
-    # Check critical keys after successful JSON parsing
-    if not parsed_data or not isinstance(parsed_data, dict) or not parsed_data.get("name") or not parsed_data.get("phone"):
-         logger.error(f"LLM 解析结果格式无效或缺少关键信息 (姓名或手机号): {pdf_path}. 数据: {parsed_data}")
-         return None 
 
     logger.info(f"成功使用 LLM 解析简历: {pdf_path}。姓名: {parsed_data.get('name')}")
     return parsed_data
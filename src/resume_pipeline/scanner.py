@@ -25,14 +25,13 @@ def scan_data_directory() -> List[str]:
 
     logger.info(f"开始扫描简历目录: {abs_data_dir}")
     try:
-        for filename in os.listdir(abs_data_dir):
-            # 检查文件是否是 PDF 文件 (忽略大小写)
-            if filename.lower().endswith(".pdf"):
-                file_path = os.path.join(abs_data_dir, filename)
-                # 确保它是一个文件而不是子目录（虽然 listdir 通常不返回 . 和 ..）
-                if os.path.isfile(file_path):
-                    pdf_files.append(file_path)
-                    logger.debug(f"找到待处理 PDF 文件: {file_path}")
+        # os.scandir 返回的 DirEntry 自带文件类型信息，is_file() 通常无需再对每个文件 stat 一次
+        with os.scandir(abs_data_dir) as entries:
+            for entry in entries:
+                # 检查文件是否是 PDF 文件 (忽略大小写)，并确保它是一个文件而不是子目录
+                if entry.name[-4:].lower() == ".pdf" and entry.is_file():
+                    pdf_files.append(entry.path)
+                    logger.debug(f"找到待处理 PDF 文件: {entry.path}")
     except OSError as e:
         logger.error(f"扫描目录 '{abs_data_dir}' 时发生 OS 错误: {e}", exc_info=True)
     except Exception as e:
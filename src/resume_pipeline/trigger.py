@@ -1,7 +1,9 @@
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import time
+from typing import Any, Dict, Optional, Tuple
 
 # Add src directory to sys.path to allow absolute imports
 # This might be necessary depending on how the script is run
@@ -20,10 +22,64 @@ from src.resume_pipeline.validator_standardizer import validate_and_standardize
 from src.resume_pipeline.file_manager import FileManager
 from src.resume_pipeline.db_updater import DbUpdater
 
+# 处理后的简历攒够一批再通过一次 bulk_write 写入数据库
+DB_UPSERT_BATCH_SIZE = 50
+# 同时进行文本提取 / OCR / LLM 解析的简历数 (各简历互不依赖；文件移动与数据库写入仍在主线程按顺序进行)
+PARSE_WORKERS = 8
+
 # Initialize logging first (this might be redundant if logger is configured elsewhere)
 # setup_logging()
 # logger = logging.getLogger(__name__)
 
+def _extract_and_parse(pdf_path: Path, llm_client: LLMClient, ocr_processor: OcrProcessor) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Runs the independent per-file stages on a worker thread: text extraction (with OCR fallback) and LLM parsing.
+
+    Returns:
+        (extracted_data, None) on success, or (None, reason) if the file should be moved to the error directory.
+    """
+    # a. Extract Text (with OCR fallback) by calling the function directly
+    text = extract_text_from_pdf(str(pdf_path)) # Pass path string to the function
+    if not text or len(text.strip()) < 50: # Basic check if text is too short
+        logger.warning(f"Text extraction yielded little/no text for {pdf_path.name}. Attempting OCR.")
+        # Ensure OCR is configured and available
+        if ocr_processor.is_available():
+             text = ocr_processor.ocr_pdf(str(pdf_path)) # ocr_pdf might expect string path
+             if not text or len(text.strip()) < 50:
+                 logger.error(f"OCR also yielded little/no text for {pdf_path.name}. Moving to error.")
+                 return None, "Text extraction and OCR failed"
+             else:
+                 logger.info(f"Successfully extracted text using OCR for {pdf_path.name}.")
+        else:
+             logger.error(f"OCR is not available or configured. Cannot process image-based PDF: {pdf_path.name}. Moving to error.")
+             return None, "OCR needed but not available"
+    else:
+        logger.info(f"Successfully extracted text from {pdf_path.name}.")
+
+    # b. Parse Resume using LLM by calling the function
+    logger.info(f"Parsing resume content for {pdf_path.name} using LLM...")
+    # Note: parse_resume_pdf internal logic handles text extraction/OCR
+    # We might need to decide if we pass the path OR the extracted text
+    # Based on resume_parser.py's function, it expects the path and handles extraction internally.
+    # However, the current trigger logic extracts text first. Let's adapt trigger for now.
+    # If text extraction failed before OCR, text will be None here.
+    # If text extraction ok, text has content.
+    # If text extraction failed -> OCR ok, text has content.
+    # If text extraction failed -> OCR failed, text is None.
+    
+    if text is None:
+         logger.error(f"Text extraction (including OCR attempt) failed for {pdf_path.name}. Cannot parse.")
+         return None, "Text extraction failed"
+     
+    # Call the LLM client directly with the extracted text
+    extracted_data = llm_client.parse_resume(text)
+    # extracted_data = parse_resume_pdf(str(pdf_path)) # Old way if parser handled extraction
+    
+    if not extracted_data:
+        logger.error(f"LLM parsing failed for {pdf_path.name}. Moving to error.")
+        return None, "LLM Parsing failed"
+    return extracted_data, None
+
 def run_pipeline():
     """Runs the full resume processing pipeline manually."""
     start_time = time.time()
@@ -51,6 +107,28 @@ def run_pipeline():
         pending_count = 0
         skipped_count = 0 # Files that might be non-PDF or already processed implicitly
 
+        # 待写入数据库的 (processed_data, processed_path, standardized_filename)，以及批内已有的 (name, phone)
+        pending_db_updates = []
+        pending_db_keys = set()
+
+        def flush_db_updates():
+            """将累积的一批已处理简历一次性写入数据库并更新计数。"""
+            nonlocal processed_count, error_count
+            if not pending_db_updates:
+                return
+            logger.info(f"Updating database for {len(pending_db_updates)} processed resumes...")
+            results = db_updater.upsert_candidates_bulk([(data, path) for data, path, _ in pending_db_updates])
+            for (_, _, standardized_filename), success in zip(pending_db_updates, results):
+                if success:
+                    logger.info(f"Database update successful for {standardized_filename}.")
+                    processed_count += 1
+                else:
+                    logger.error(f"Database update failed for {standardized_filename}. File is in processed dir, but DB entry may be missing/outdated.")
+                    # This is a critical error state - data inconsistency
+                    error_count += 1 # Count as error, needs investigation
+            pending_db_updates.clear()
+            pending_db_keys.clear()
+
         # 2. Scan for files by calling the function
         data_dir = get_paths_config().get("data_dir", "data/") # Get data_dir for logging
         logger.info(f"Scanning for PDF files in '{data_dir}'...")
@@ -64,103 +142,72 @@ def run_pipeline():
         logger.info(f"Found {len(pdf_files)} PDF files to process.")
 
         # 3. Process each file (Path object)
-        for pdf_path in pdf_files:
-            logger.info(f"--- Processing file: {pdf_path.name} ---")
-            # original_path_str = str(pdf_path) # No longer needed if pdf_path is Path
+        # 文本提取、OCR 与 LLM 解析 (耗时主要在网络等待与 OCR 子进程) 在线程池中并发进行
+        parse_executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="resume-parse")
+        parse_futures = [parse_executor.submit(_extract_and_parse, pdf_path, llm_client, ocr_processor) for pdf_path in pdf_files]
+        try:
+            for pdf_path, parse_future in zip(pdf_files, parse_futures):
+                logger.info(f"--- Processing file: {pdf_path.name} ---")
+                # original_path_str = str(pdf_path) # No longer needed if pdf_path is Path
 
-            try:
-                # a. Extract Text (with OCR fallback) by calling the function directly
-                text = extract_text_from_pdf(str(pdf_path)) # Pass path string to the function
-                if not text or len(text.strip()) < 50: # Basic check if text is too short
-                    logger.warning(f"Text extraction yielded little/no text for {pdf_path.name}. Attempting OCR.")
-                    # Ensure OCR is configured and available
-                    if ocr_processor.is_available():
-                         text = ocr_processor.ocr_pdf(str(pdf_path)) # ocr_pdf might expect string path
-                         if not text or len(text.strip()) < 50:
-                             logger.error(f"OCR also yielded little/no text for {pdf_path.name}. Moving to error.")
-                             file_manager.move_to_error(pdf_path, reason="Text extraction and OCR failed")
-                             error_count += 1
-                             continue # Skip to next file
-                         else:
-                             logger.info(f"Successfully extracted text using OCR for {pdf_path.name}.")
-                    else:
-                         logger.error(f"OCR is not available or configured. Cannot process image-based PDF: {pdf_path.name}. Moving to error.")
-                         file_manager.move_to_error(pdf_path, reason="OCR needed but not available")
-                         error_count += 1
-                         continue # Skip to next file
-                else:
-                    logger.info(f"Successfully extracted text from {pdf_path.name}.")
-
-                # b. Parse Resume using LLM by calling the function
-                logger.info(f"Parsing resume content for {pdf_path.name} using LLM...")
-                # Note: parse_resume_pdf internal logic handles text extraction/OCR
-                # We might need to decide if we pass the path OR the extracted text
-                # Based on resume_parser.py's function, it expects the path and handles extraction internally.
-                # However, the current trigger logic extracts text first. Let's adapt trigger for now.
-                # If text extraction failed before OCR, text will be None here.
-                # If text extraction ok, text has content.
-                # If text extraction failed -> OCR ok, text has content.
-                # If text extraction failed -> OCR failed, text is None.
-                
-                if text is None:
-                     logger.error(f"Text extraction (including OCR attempt) failed for {pdf_path.name}. Cannot parse.")
-                     file_manager.move_to_error(pdf_path, reason="Text extraction failed")
-                     error_count += 1
-                     continue # Skip to next file
-                 
-                # Call the LLM client directly with the extracted text
-                extracted_data = llm_client.parse_resume(text)
-                # extracted_data = parse_resume_pdf(str(pdf_path)) # Old way if parser handled extraction
-                
-                if not extracted_data:
-                    logger.error(f"LLM parsing failed for {pdf_path.name}. Moving to error.")
-                    file_manager.move_to_error(pdf_path, reason="LLM Parsing failed")
-                    error_count += 1
-                    continue
-                extracted_data['source_file_original_name'] = pdf_path.name # Add original name
-                logger.info(f"LLM parsing successful for {pdf_path.name}. Extracted keys: {list(extracted_data.keys())}")
-
-                # c. Validate and Standardize by calling the function
-                logger.info(f"Validating and standardizing data for {pdf_path.name}...")
-                is_valid, standardized_filename, processed_data, validation_reason = validate_and_standardize(extracted_data, pdf_path.name)
-
-                if not is_valid:
-                    logger.warning(f"Validation failed for {pdf_path.name}: {validation_reason}. Moving to pending.")
-                    # Pass the processed_data (with tags) to file_manager if needed for context
-                    file_manager.move_to_pending(pdf_path, reason=validation_reason)
-                    pending_count += 1
-                    continue
-                logger.info(f"Validation successful for {pdf_path.name}. Standardized filename: {standardized_filename}")
-
-                # d. Move to Processed Directory
-                logger.info(f"Moving {pdf_path.name} to processed directory as {standardized_filename}...")
-                processed_path = file_manager.move_to_processed(pdf_path, standardized_filename)
-                if not processed_path:
-                    logger.error(f"Failed to move {pdf_path.name} to processed directory. Skipping DB update.")
-                    # File might still be in data/ or partially moved. Requires manual check.
-                    error_count += 1 # Consider this an error state
-                    continue
-                logger.info(f"Successfully moved file to: {processed_path}")
-
-                # e. Update Database (use processed_data which includes query_tags)
-                logger.info(f"Updating database for {standardized_filename}...")
-                success = db_updater.upsert_candidate(processed_data, processed_path)
-                if success:
-                    logger.info(f"Database update successful for {standardized_filename}.")
-                    processed_count += 1
-                else:
-                    logger.error(f"Database update failed for {standardized_filename}. File is in processed dir, but DB entry may be missing/outdated.")
-                    # This is a critical error state - data inconsistency
-                    error_count += 1 # Count as error, needs investigation
-
-            except Exception as e:
-                logger.error(f"An unexpected error occurred while processing {pdf_path.name}: {e}", exc_info=True)
-                # Try to move the file to error directory in case of unexpected failure
                 try:
-                    file_manager.move_to_error(pdf_path, reason=f"Unexpected processing error: {e}")
-                except Exception as move_err:
-                    logger.error(f"Failed to move {pdf_path.name} to error directory after unexpected error: {move_err}", exc_info=True)
-                error_count += 1
+                    # a./b. 文本提取 (含 OCR) 与 LLM 解析已在线程池中完成，这里按原顺序取结果
+                    extracted_data, error_reason = parse_future.result()
+                    if error_reason:
+                        file_manager.move_to_error(pdf_path, reason=error_reason)
+                        error_count += 1
+                        continue # Skip to next file
+                    extracted_data['source_file_original_name'] = pdf_path.name # Add original name
+                    logger.info(f"LLM parsing successful for {pdf_path.name}. Extracted keys: {list(extracted_data.keys())}")
+
+                    # c. Validate and Standardize by calling the function
+                    logger.info(f"Validating and standardizing data for {pdf_path.name}...")
+                    is_valid, standardized_filename, processed_data, validation_reason = validate_and_standardize(extracted_data, pdf_path.name)
+
+                    if not is_valid:
+                        logger.warning(f"Validation failed for {pdf_path.name}: {validation_reason}. Moving to pending.")
+                        # Pass the processed_data (with tags) to file_manager if needed for context
+                        file_manager.move_to_pending(pdf_path, reason=validation_reason)
+                        pending_count += 1
+                        continue
+                    logger.info(f"Validation successful for {pdf_path.name}. Standardized filename: {standardized_filename}")
+
+                    # d. Move to Processed Directory
+                    logger.info(f"Moving {pdf_path.name} to processed directory as {standardized_filename}...")
+                    processed_path = file_manager.move_to_processed(pdf_path, standardized_filename)
+                    if not processed_path:
+                        logger.error(f"Failed to move {pdf_path.name} to processed directory. Skipping DB update.")
+                        # File might still be in data/ or partially moved. Requires manual check.
+                        error_count += 1 # Consider this an error state
+                        continue
+                    logger.info(f"Successfully moved file to: {processed_path}")
+
+                    # e. Update Database (use processed_data which includes query_tags)
+                    # 加入待写入批次；同一候选人 (姓名+手机号) 在一批内只能出现一次，重复时先写入当前批次
+                    db_key = (processed_data.get('name'), processed_data.get('phone'))
+                    if db_key in pending_db_keys:
+                        flush_db_updates()
+                    pending_db_updates.append((processed_data, processed_path, standardized_filename))
+                    pending_db_keys.add(db_key)
+                    if len(pending_db_updates) >= DB_UPSERT_BATCH_SIZE:
+                        flush_db_updates()
+
+                except Exception as e:
+                    logger.error(f"An unexpected error occurred while processing {pdf_path.name}: {e}", exc_info=True)
+                    # Try to move the file to error directory in case of unexpected failure
+                    try:
+                        file_manager.move_to_error(pdf_path, reason=f"Unexpected processing error: {e}")
+                    except Exception as move_err:
+                        logger.error(f"Failed to move {pdf_path.name} to error directory after unexpected error: {move_err}", exc_info=True)
+                    error_count += 1
+        finally:
+            try:
+                # 写入最后一批不足 DB_UPSERT_BATCH_SIZE 的简历。这些文件已移入 processed 目录，扫描不会再处理它们，
+                # 因此出错或被中断 (KeyboardInterrupt 等) 退出时也必须写入
+                flush_db_updates()
+            finally:
+                # 正常结束时所有解析任务均已完成；异常退出时取消尚未开始的解析任务并等待运行中的任务结束
+                parse_executor.shutdown(wait=True, cancel_futures=True)
 
     except Exception as pipeline_init_error:
         logger.critical(f"Failed to initialize or run the pipeline: {pipeline_init_error}", exc_info=True)
@@ -174,7 +174,7 @@ def _generate_query_tags(parsed_data: Dict[str, Any], original_filename: str) ->
                     if full_cert_name:
                         # Check existence using the updated function
                         if not check_certificate_exists(full_cert_name):
-                            logger.warning(f"发现待审核证书: '{full_cert_name}' (来自文件: {original_filename})")
+                            logger.warning(f"发现待审核证书: '{full_cert_name}' (来自文件: {original_filename})", extra={"new_cert": True})
                         # Add the normalized (lowercase) full name to query tags
                         normalized_certs.add(full_cert_name.lower())
                 else:
@@ -183,7 +183,7 @@ def _generate_query_tags(parsed_data: Dict[str, Any], original_filename: str) ->
                  original_cert_name = cert_obj.strip()
                  if original_cert_name:
                     if not check_certificate_exists(original_cert_name):
-                         logger.warning(f"发现待审核证书 (旧格式): '{original_cert_name}' (来自文件: {original_filename})")
+                         logger.warning(f"发现待审核证书 (旧格式): '{original_cert_name}' (来自文件: {original_filename})", extra={"new_cert": True})
                     normalized_certs.add(original_cert_name.lower())
             else:
                  logger.warning(f"在简历解析结果中跳过无效的证书对象: {cert_obj} (文件: {original_filename})")
@@ -0,0 +1,29 @@
+"""
+进程级请求限流工具。
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶，对发往外部 API 的请求做预限流。
+    reserve() 预占一个令牌并返回调用方需要等待的秒数，同步与异步调用方各自负责 sleep；
+    使用线程锁而非 asyncio 原语，因此可在各工作线程独立的事件循环之间共享。
+    """
+    def __init__(self, rate_per_sec: float):
+        self.rate = rate_per_sec
+        self.capacity = max(1.0, rate_per_sec)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0: # 未配置速率上限
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
@@ -99,6 +99,26 @@ class StateManager:
         user_data = self._get_user_data(user_id)
         return user_data.get("has_more", False) if user_data else False
 
+    def get_pagination_context(self, user_id: str) -> Dict[str, Any]:
+        """一次性获取翻页所需的查询条件、偏移量、解析数据和是否有更多标记。缺失时返回与各 get_* 方法相同的默认值。"""
+        user_data = self._get_user_data(user_id) or {}
+        return {
+            "query_criteria": user_data.get("query_criteria"),
+            "query_offset": user_data.get("query_offset", 0),
+            "parsed_query_data": user_data.get("parsed_query_data"),
+            "has_more": user_data.get("has_more", False),
+        }
+
+    def refresh_ttl(self, user_id: str) -> bool:
+        """仅刷新用户缓存数据的 TTL，不改动任何字段。用户不存在或已过期时返回 False。"""
+        with self._lock:
+            user_data = self._user_states.get(user_id)
+            if user_data is None:
+                return False
+            self._user_states[user_id] = user_data # 重新赋值即刷新 TTLCache 的过期时间
+        logger.debug(f"用户 [{user_id}] 的 TTL 已刷新。")
+        return True
+
     def clear_state(self, user_id: str):
         """清除用户的状态和所有缓存数据。"""
         with self._lock: